@@ -1,4 +1,5 @@
 import os
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -22,12 +23,181 @@ class Settings(BaseSettings):
         "MODEL_NAME", "meta-llama/llama-4-scout-17b-16e-instruct"
     )
     LOCAL_MODEL_NAME: str = os.getenv("LOCAL_MODEL_NAME", "EleutherAI/gpt-neo-125M")
+    GROQ_BASE_URL: Optional[str] = None
     EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    # torch | onnx | onnx-int8 (ONNX models come from scripts.export_embedding_model)
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_ONNX_DIR: str = os.path.join(DATA_DIR, "models", "embedding-onnx")
+    # arm64 | avx2 | avx512 | avx512_vnni
+    EMBEDDING_ONNX_QUANTIZATION: str = "avx2"
 
     RAG_DATA_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "medlineplus.csv")
     RAG_INDEX_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "medline.index")
-    RAG_METADATA_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "medline_meta.pkl")
+    RAG_DOCSTORE_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "medline_docs.bin")
+    RAG_DOCSTORE_OFFSETS_PATH: str = os.path.join(
+        KNOWLEDGE_BASE_DIR, "medline_docs_offsets.npy"
+    )
+    RAG_DOCSTORE_IDS_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "medline_docs_ids.npy")
+    RAG_MANIFEST_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "medline_manifest.json")
+    RAG_INDEX_PARAMS_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "medline_index.json")
+    RAG_BM25_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "medline_bm25")
+    RAG_XML_CACHE_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "mplus_topics.xml")
+    RAG_XML_CACHE_META_PATH: str = os.path.join(
+        KNOWLEDGE_BASE_DIR, "mplus_topics_cache.json"
+    )
+    JAILBREAK_CORPUS_PATH: str = os.path.join(
+        BASE_DIR, "app", "domain", "jailbreaks.txt"
+    )
+    JAILBREAK_INDEX_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "jailbreaks.index")
+    JAILBREAK_PATTERNS_PATH: str = os.path.join(
+        KNOWLEDGE_BASE_DIR, "jailbreaks.json"
+    )
+    # How often guard_input checks the jailbreak index for a newer build
+    JAILBREAK_RELOAD_INTERVAL_SECONDS: float = 10.0
     DISEASES_DATA_PATH: str = os.path.join(KNOWLEDGE_BASE_DIR, "diseases.csv")
+
+    RAG_INDEX_MMAP: bool = True
+
+    # MedlinePlus ETL: topics per CSV chunk, HTML-cleaning processes (0 = cpu count)
+    ETL_CHUNK_SIZE: int = 500
+    ETL_WORKERS: int = 0
+
+    # Index build: texts per encode batch, encode processes (0 = cpu count),
+    # and the dtype the embedding matrix is held in until indexing
+    # (float32 | float16; float16 halves it, at a small precision cost)
+    RAG_EMBED_BATCH_SIZE: int = 64
+    RAG_EMBED_WORKERS: int = 0
+    RAG_EMBED_DTYPE: str = "float32"
+
+    # flat | hnsw | ivf_flat | ivf_pq
+    RAG_INDEX_TYPE: str = "flat"
+    RAG_HNSW_M: int = 32
+    RAG_HNSW_EF_CONSTRUCTION: int = 200
+    RAG_HNSW_EF_SEARCH: int = 64
+    RAG_IVF_NLIST: int = 0
+    RAG_IVF_NPROBE: int = 8
+    RAG_PQ_M: int = 16
+    RAG_PQ_NBITS: int = 8
+
+    # Descriptions are indexed as overlapping passages of PASSAGE_WORDS words;
+    # RAG.query fetches FETCH_FACTOR passages per requested topic and merges
+    # up to PASSAGES_PER_TOPIC of them per topic
+    RAG_PASSAGE_WORDS: int = 120
+    RAG_PASSAGE_OVERLAP_WORDS: int = 30
+    RAG_PASSAGE_FETCH_FACTOR: int = 4
+    RAG_PASSAGES_PER_TOPIC: int = 3
+
+    # Cosine similarity cut-offs applied to RAG.query results
+    RAG_MIN_SIMILARITY: float = 0.3
+    RAG_MAX_SCORE_GAP: float = 0.15
+
+    # dense | hybrid (dense + BM25 over the full description, fused with
+    # reciprocal-rank fusion). CANDIDATES hits per retriever are fused.
+    RAG_RETRIEVAL_MODE: str = "hybrid"
+    RAG_HYBRID_CANDIDATES: int = 50
+    RAG_RRF_K: int = 60
+    RAG_BM25_K1: float = 1.2
+    RAG_BM25_B: float = 0.75
+    # Lexical-only hybrid hits need this fraction of the query's best possible
+    # BM25 score (dense hits are already held to RAG_MIN_SIMILARITY).
+    RAG_BM25_MIN_SCORE: float = 0.5
+
+    # Optional cross-encoder re-ranking of the top RERANK_CANDIDATES hits, at
+    # most RERANK_TOP_K kept. Only as many uncached pairs as fit in
+    # RERANK_BUDGET_MS are scored; below RERANK_TOP_K the stage is skipped.
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL_NAME: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_MAX_LENGTH: int = 256
+    RERANK_CANDIDATES: int = 20
+    RERANK_TOP_K: int = 3
+    RERANK_BUDGET_MS: float = 150.0
+    RERANK_CACHE_SIZE: int = 8192
+
+    # Concurrent query encodes are batched: wait up to MAX_WAIT_MS for up to
+    # MAX_SIZE texts per forward pass (MAX_SIZE <= 1 disables batching)
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 2.0
+
+    # In-process LRU caches for query embeddings and search hits (0 disables)
+    RAG_EMBEDDING_CACHE_SIZE: int = 2048
+    RAG_RETRIEVAL_CACHE_SIZE: int = 2048
+    RAG_CACHE_TTL_SECONDS: float = 3600.0
+
+    # Semantic cache of first-turn follow-up questions (see response_cache.py)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_THRESHOLD: float = 0.95
+    RESPONSE_CACHE_SIZE: int = 1000
+    RESPONSE_CACHE_TTL_SECONDS: float = 6 * 3600
+
+    # RAG context packing (see context_packer.py). Budgets are in tokens of
+    # the model the prompt goes to, counted with its HF tokenizer (mapped in
+    # CONTEXT_TOKENIZERS, else the model name itself) preloaded at startup;
+    # chars / 4 if it was not loaded.
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {
+        "meta-llama/llama-4-scout-17b-16e-instruct": 2000,
+        "EleutherAI/gpt-neo-125M": 1000,
+    }
+    CONTEXT_DEFAULT_TOKEN_BUDGET: int = 2000
+    CONTEXT_TOKENIZERS: Dict[str, str] = {
+        "meta-llama/llama-4-scout-17b-16e-instruct": "unsloth/Llama-4-Scout-17B-16E-Instruct",
+    }
+    # Candidates fetched per requested doc, MMR relevance/diversity trade-off,
+    # and the per-doc cap above which docs are trimmed to ~PASSAGE_TOKENS passages
+    CONTEXT_CANDIDATE_FACTOR: int = 2
+    CONTEXT_MMR_LAMBDA: float = 0.7
+    CONTEXT_MAX_DOC_TOKENS: int = 600
+    CONTEXT_PASSAGE_TOKENS: int = 80
+
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_CONNECTIONS: int = 200
+    # httpcore re-scans every idle connection against the whole pool on each
+    # request it schedules; past ~30 idle connections that bookkeeping
+    # stalls the event loop under bursts.
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+
+    # Shared thread pool for tool implementations; per-tool timeouts live in TOOLS
+    TOOL_MAX_WORKERS: int = 8
+    TOOL_DEFAULT_TIMEOUT_SECONDS: float = 3.0
+
+    # Conversation-aware retrieval: patient messages fold into a running query
+    # vector (older turns decay, a message weighs min(1, content words /
+    # FULL_WEIGHT_TOKENS)); a turn only searches again once the vector moves
+    # more than REQUERY_DRIFT (1 - cosine) from the one the context came from.
+    CONVERSATION_RETRIEVAL_ENABLED: bool = True
+    CONVERSATION_VECTOR_DECAY: float = 0.7
+    CONVERSATION_FULL_WEIGHT_TOKENS: int = 4
+    CONVERSATION_REQUERY_DRIFT: float = 0.08
+    CONVERSATION_QUERY_MESSAGES: int = 6
+
+    # Uploaded images: read in chunks up to MAX_UPLOAD_BYTES, turned upright,
+    # downscaled to MAX_DIMENSION px on the long side and re-encoded as
+    # FORMAT (JPEG | WEBP) at QUALITY before going to the vision model.
+    # Encoded results are cached by content hash.
+    IMAGE_MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    IMAGE_READ_CHUNK_BYTES: int = 256 * 1024
+    IMAGE_MAX_DIMENSION: int = 1024
+    IMAGE_FORMAT: str = "JPEG"
+    IMAGE_QUALITY: int = 85
+    IMAGE_CACHE_SIZE: int = 128
+    IMAGE_CACHE_TTL_SECONDS: float = 3600.0
+
+    # Server-side chat sessions: memory (per process, LRU) | redis (shared).
+    # Only created when a request sets `new_session`. Sessions expire TTL
+    # seconds after their last turn and keep at most MAX_MESSAGES messages;
+    # the memory store also evicts past MAX_BYTES of history and state.
+    SESSION_BACKEND: str = "memory"
+    SESSION_REDIS_URL: str = "redis://localhost:6379/0"
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_TTL_SECONDS: float = 3600.0
+    SESSION_MAX_MESSAGES: int = 50
+    SESSION_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Startup warm-up (see app/services/warmup.py and GET /ready)
+    PRELOAD_ENABLED: bool = True
+    PRELOAD_PARALLEL: bool = True
+    PRELOAD_LOCAL_MODEL: bool = False
+
     LOG_PATH: str = os.path.join(DATA_DIR, "api.log")
     RAPORT_FILE_PATH: str = os.path.join(DATA_DIR, "report.md")
 
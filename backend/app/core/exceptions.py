@@ -34,3 +34,13 @@ class InvalidHistoryFormatError(HTTPException):
 class ImageProcessingError(HTTPException):
     def __init__(self, detail="Failed to process uploaded image"):
         super().__init__(status_code=422, detail=detail)
+
+
+class ImageTooLarge(HTTPException):
+    def __init__(self, detail="Uploaded image exceeds the size limit"):
+        super().__init__(status_code=413, detail=detail)
+
+
+class SessionNotFound(HTTPException):
+    def __init__(self, detail="Session not found or expired"):
+        super().__init__(status_code=404, detail=detail)
@@ -1,21 +1,43 @@
-import base64
 import json
+import asyncio
 
+from contextlib import asynccontextmanager
 from json import JSONDecodeError
-from typing import Optional, List, Dict, Any, Annotated
+from typing import Optional, List, Dict, Any, Annotated, Tuple
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.exceptions import (
     ToolError,
     ToolTimeout,
     InvalidHistoryFormatError,
     ImageProcessingError,
+    ImageTooLarge,
     SecurityBlocked,
+    SessionNotFound,
     ValidationError,
 )
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Response
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse
 from app.utils.guardrails import guard_input, scrub_output
-from app.services.llm_service import run_with_retry_chat, ChatMessage
+from app.utils.tools import tool_metrics, shutdown_tool_executor
+from app.services.llm_service import (
+    run_with_response_cache,
+    retrieve_context,
+    stream_with_response_cache,
+    close_groq_client,
+    ChatMessage,
+)
+from app.services.rag_service import EmbeddingContext, cache_stats
+from app.services.conversation_retrieval import (
+    ConversationRetrieval,
+    conversation_stats,
+)
+from app.services.response_cache import get_response_cache
+from app.services.session_store import get_session_store
+from app.services.image_pipeline import read_upload, prepare_image, image_stats
+from app.services.warmup import readiness, preload_components, preload_component_names
+from app.utils.timing import StageTimings
+from app.core.config import settings
 from app.core.logging import logger
 
 
@@ -30,6 +52,21 @@ tags_metadata = [
     },
 ]
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.PRELOAD_ENABLED:
+        # Mark components pending before serving, then load them off the event
+        # loop so / keeps answering while /ready reports 503.
+        readiness.reset(preload_component_names())
+        app.state.preload_task = asyncio.create_task(
+            asyncio.to_thread(preload_components)
+        )
+    yield
+    await close_groq_client()
+    shutdown_tool_executor()
+
+
 app = FastAPI(
     title="SmartSelect Health Backend",
     description="""
@@ -41,6 +78,7 @@ app = FastAPI(
         * Hybrid Engine: Switches between Groq (Cloud) and Local LLMs.
     """,
     openapi_tags=tags_metadata,
+    lifespan=lifespan,
 )
 
 
@@ -65,6 +103,62 @@ MAX_HISTORY_LENGTH = 10000
 MAX_K_RETRIEVAL = 10
 
 
+MessageForm = Annotated[
+    str,
+    Form(
+        min_length=1,
+        max_length=MAX_MESSAGE_LENGTH,
+        description="The user's current symptom description.",
+    ),
+]
+HistoryForm = Annotated[
+    str,
+    Form(
+        max_length=MAX_HISTORY_LENGTH,
+        description="Previous chat history as a JSON string (list of messages).",
+    ),
+]
+SessionForm = Annotated[
+    Optional[str],
+    Form(
+        max_length=64,
+        description="Server-side session id returned by a previous turn. When set, `history` is ignored.",
+    ),
+]
+NewSessionForm = Annotated[
+    bool,
+    Form(
+        description="Start a server-side session with this turn; its id is returned as `session_id`.",
+    ),
+]
+ImagesForm = Annotated[
+    Optional[List[UploadFile]],
+    File(
+        description="Optional list of image files (e.g., photos of visible symptoms) for visual analysis.",
+    ),
+]
+RetrievalKForm = Annotated[
+    int,
+    Form(
+        ge=1,
+        le=MAX_K_RETRIEVAL,
+        description="Number of medical documents to retrieve from the RAG Knowledge Base.",
+    ),
+]
+ModeForm = Annotated[
+    str,
+    Form(
+        description="Inference mode: 'api' (Groq Cloud - High Perf) or 'local' (Offline - Fallback).",
+    ),
+]
+UseFunctionsForm = Annotated[
+    bool,
+    Form(
+        description="Enable/Disable tool use (Function Calling). If False, model will just chat.",
+    ),
+]
+
+
 @app.get("/", tags=["Health"])
 def root():
     return {
@@ -74,6 +168,25 @@ def root():
     }
 
 
+@app.get("/ready", tags=["Health"])
+def ready():
+    report = readiness.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
+@app.get("/metrics", tags=["Health"])
+def metrics():
+    response_cache = get_response_cache()
+    return {
+        **cache_stats(),
+        "response_cache": response_cache.stats() if response_cache else None,
+        "tools": tool_metrics.snapshot(),
+        "sessions": get_session_store().stats(),
+        "conversation_retrieval": conversation_stats(),
+        "images": image_stats(),
+    }
+
+
 @app.post(
     "/ask",
     summary="Submit patient symptoms",
@@ -81,41 +194,15 @@ def root():
     response_description="Returns a chat response or a final medical report.",
 )
 async def ask(
-    message: Annotated[
-        str,
-        Form(
-            min_length=1,
-            max_length=MAX_MESSAGE_LENGTH,
-            description="The user's current symptom description.",
-        ),
-    ],
-    history: Annotated[
-        str,
-        Form(
-            max_length=MAX_HISTORY_LENGTH,
-            description="Previous chat history as a JSON string (list of messages).",
-        ),
-    ] = "[]",
-    images: Optional[List[UploadFile]] = File(
-        None,
-        description="Optional list of image files (e.g., photos of visible symptoms) for visual analysis.",
-    ),
-    k: Annotated[
-        int,
-        Form(
-            ge=1,
-            le=MAX_K_RETRIEVAL,
-            description="Number of medical documents to retrieve from the RAG Knowledge Base.",
-        ),
-    ] = 5,
-    mode: str = Form(
-        "api",
-        description="Inference mode: 'api' (Groq Cloud - High Perf) or 'local' (Offline - Fallback).",
-    ),
-    use_functions: bool = Form(
-        True,
-        description="Enable/Disable tool use (Function Calling). If False, model will just chat.",
-    ),
+    response: Response,
+    message: MessageForm,
+    history: HistoryForm = "[]",
+    images: ImagesForm = None,
+    k: RetrievalKForm = 5,
+    mode: ModeForm = "api",
+    use_functions: UseFunctionsForm = True,
+    session_id: SessionForm = None,
+    new_session: NewSessionForm = False,
 ):
     """
     **Main interaction endpoint.**
@@ -124,30 +211,61 @@ async def ask(
 
     - **Logic**: It first checks the RAG index, then uses the LLM to decide whether to ask a follow-up question or provide a final report.
     - **Security**: Inputs are scanned for injection attacks.
+    - **Sessions**: With `new_session=true` the response carries a `session_id`. Send it back instead of `history` to continue the conversation.
     """
 
     logger.info("Endpoint ask called")
+    timings = StageTimings()
     try:
-        processed_images = await _process_uploaded_images(images)
+        chat_history = await _load_history(history, session_id)
+        conversation = await _load_conversation(session_id, new_session, chat_history)
 
-        chat_history = _parse_chat_history(history)
+        embedding = EmbeddingContext(message)
 
-        await run_in_threadpool(guard_input, message)
+        processed_images, rag_context = await _prepare_request(
+            message, images, k, mode, embedding, timings, conversation
+        )
+
+        result = await timings.track(
+            "llm",
+            run_with_response_cache(
+                current_message=message,
+                use_functions=use_functions,
+                history=chat_history,
+                api_mode=mode,
+                images_list=processed_images,
+                k=k,
+                embedding=embedding,
+                rag_context=rag_context,
+            ),
+        )
 
-        result = await run_with_retry_chat(
-            current_message=message,
-            use_functions=use_functions,
-            history=chat_history,
-            api_mode=mode,
-            images_list=processed_images,
-            k=k,
+        formatted = _format_llm_response(result)
+        kept_session = await _record_turn(
+            session_id, new_session, chat_history, message, formatted, conversation
         )
+        if kept_session:
+            formatted["session_id"] = kept_session
 
-        return _format_llm_response(result)
+        response.headers["Server-Timing"] = timings.server_timing()
+        logger.info(f"[INFO] /ask stage timings (ms): {timings.summary()}")
+        return formatted
     except SecurityBlocked as e:
         logger.error("HTTPException")
         raise HTTPException(status_code=400, detail=e.detail)
 
+    except SessionNotFound as e:
+        logger.error("SessionNotFound")
+        raise HTTPException(status_code=404, detail=e.detail)
+
+    except ImageTooLarge as e:
+        logger.error("ImageTooLarge")
+        raise HTTPException(status_code=413, detail=e.detail)
+
+    except ImageProcessingError as e:
+        logger.error("ImageProcessingError")
+        raise HTTPException(status_code=422, detail=e.detail)
+
     except ValidationError as e:
         logger.error("ValidationError")
         raise HTTPException(status_code=422, detail=e.detail)
@@ -165,6 +283,166 @@ async def ask(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.post(
+    "/ask/stream",
+    summary="Submit patient symptoms (streaming)",
+    tags=["Diagnosis"],
+    response_description="Server-Sent Events: 'retrieval', 'token', then 'result' (or 'error').",
+)
+async def ask_stream(
+    message: MessageForm,
+    history: HistoryForm = "[]",
+    images: ImagesForm = None,
+    k: RetrievalKForm = 5,
+    mode: ModeForm = "api",
+    use_functions: UseFunctionsForm = True,
+    session_id: SessionForm = None,
+    new_session: NewSessionForm = False,
+):
+    """
+    **Streaming variant of `/ask`.**
+
+    Runs the same security checks before the stream opens, then emits
+    Server-Sent Events while the model is generating.
+
+    - **retrieval**: RAG context is ready.
+    - **token**: next piece of the message for the patient.
+    - **result**: the same payload `/ask` returns (chat message or final report, plus `session_id` when a session is kept).
+    - **error**: `status_code` and `detail` if the model call fails mid-stream.
+    """
+
+    logger.info("Endpoint ask_stream called")
+    timings = StageTimings()
+    try:
+        chat_history = await _load_history(history, session_id)
+        conversation = await _load_conversation(session_id, new_session, chat_history)
+
+        embedding = EmbeddingContext(message)
+
+        processed_images, rag_context = await _prepare_request(
+            message, images, k, mode, embedding, timings, conversation
+        )
+    except SecurityBlocked as e:
+        logger.error("HTTPException")
+        raise HTTPException(status_code=400, detail=e.detail)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    events = _stream_ask_events(
+        current_message=message,
+        session_id=session_id,
+        new_session=new_session,
+        conversation=conversation,
+        use_functions=use_functions,
+        history=chat_history,
+        api_mode=mode,
+        images_list=processed_images,
+        k=k,
+        embedding=embedding,
+        rag_context=rag_context,
+    )
+    logger.info(f"[INFO] /ask/stream stage timings (ms): {timings.summary()}")
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Server-Timing": timings.server_timing(),
+        },
+    )
+
+
+async def _stream_ask_events(
+    current_message: str,
+    session_id: Optional[str] = None,
+    new_session: bool = False,
+    conversation: Optional[ConversationRetrieval] = None,
+    **kwargs,
+):
+    try:
+        async for event in stream_with_response_cache(current_message, **kwargs):
+            if event["event"] == "result":
+                formatted = _format_llm_response(event["data"])
+                kept_session = await _record_turn(
+                    session_id,
+                    new_session,
+                    kwargs["history"],
+                    current_message,
+                    formatted,
+                    conversation,
+                )
+                if kept_session:
+                    formatted["session_id"] = kept_session
+                yield _format_sse_event("result", formatted)
+            else:
+                yield _format_sse_event(event["event"], event["data"])
+    except HTTPException as e:
+        logger.error(f"Stream error: {e.detail}")
+        yield _format_sse_event(
+            "error", {"status_code": e.status_code, "detail": e.detail}
+        )
+    except Exception as e:
+        logger.error(e)
+        yield _format_sse_event(
+            "error", {"status_code": 500, "detail": "Internal server error"}
+        )
+
+
+async def _prepare_request(
+    message: str,
+    images: Optional[List[UploadFile]],
+    k: int,
+    api_mode: str,
+    embedding: EmbeddingContext,
+    timings: StageTimings,
+    conversation: Optional[ConversationRetrieval] = None,
+) -> Tuple[List[Dict[str, str]], str]:
+    """
+    Runs image processing, the guardrail check and RAG retrieval concurrently.
+
+    Retrieval is speculative: it starts before the guardrail verdict and is
+    discarded if the message is blocked or an image fails. All three share the
+    request's EmbeddingContext, so the message is still encoded only once.
+    """
+    retrieval = asyncio.create_task(
+        timings.track(
+            "retrieval",
+            retrieve_context(message, k, embedding, api_mode, conversation),
+        )
+    )
+    try:
+        processed_images, _ = await asyncio.gather(
+            timings.track("images", _process_uploaded_images(images)),
+            timings.track(
+                "guardrails",
+                run_in_threadpool(guard_input, message, embedding=embedding),
+            ),
+        )
+    except BaseException:
+        retrieval.cancel()
+        # The worker thread cannot be interrupted; retrieve its outcome so a
+        # late failure is not reported as an unhandled task exception.
+        retrieval.add_done_callback(_discard_task_result)
+        raise
+
+    return processed_images, await retrieval
+
+
+def _discard_task_result(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+def _format_sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 async def _process_uploaded_images(
     files: Optional[List[UploadFile]],
 ) -> List[Dict[str, str]]:
@@ -175,12 +453,13 @@ async def _process_uploaded_images(
     for image in files:
         logger.info(f"Processing image: {image.filename}")
         try:
-            content = await image.read()
-            mime = image.content_type or "image/jpeg"
-
-            image_data = await run_in_threadpool(_encode_image_sync, content, mime)
+            content, digest = await read_upload(image, settings.IMAGE_MAX_UPLOAD_BYTES)
+            image_data = await run_in_threadpool(prepare_image, content, digest)
 
             processed.append(image_data)
+        except ImageTooLarge:
+            logger.error(f"Image {image.filename} exceeds the upload limit")
+            raise
         except Exception as e:
             logger.error(f"Failed to process image {image.filename}: {e}")
             raise ImageProcessingError(f"Failed to process image {image.filename}")
@@ -188,9 +467,84 @@ async def _process_uploaded_images(
     return processed
 
 
-def _encode_image_sync(content: bytes, mime: str) -> Dict[str, str]:
-    b64 = base64.b64encode(content).decode("utf-8")
-    return {"data": b64, "mime": mime}
+async def _load_history(
+    history_json: str, session_id: Optional[str]
+) -> List[ChatMessage]:
+    if not session_id:
+        return _parse_chat_history(history_json)
+
+    messages = await run_in_threadpool(get_session_store().get, session_id)
+    if messages is None:
+        raise SessionNotFound()
+    return _trim_history(messages, MAX_HISTORY_LENGTH)
+
+
+def _trim_history(messages: List[ChatMessage], max_chars: int) -> List[ChatMessage]:
+    # Stored sessions hold up to SESSION_MAX_MESSAGES turns; keep the prompt
+    # within the same budget a posted `history` is held to, newest first.
+    kept, total = 0, 0
+    for message in reversed(messages):
+        total += len(message.content)
+        if total > max_chars:
+            break
+        kept += 1
+    return messages[len(messages) - kept :]
+
+
+async def _load_conversation(
+    session_id: Optional[str], new_session: bool, history: List[ChatMessage]
+) -> Optional[ConversationRetrieval]:
+    # The state only pays off when it is kept for the next turn; sessionless
+    # requests retrieve on the current message alone.
+    if not settings.CONVERSATION_RETRIEVAL_ENABLED or not (session_id or new_session):
+        return None
+
+    state = None
+    if session_id:
+        try:
+            state = await run_in_threadpool(get_session_store().get_state, session_id)
+        except Exception as e:
+            logger.error(f"[ERROR] Session store unavailable: {e}")
+    if state is None:
+        return ConversationRetrieval.from_history(history)
+    return ConversationRetrieval.from_dict(state)
+
+
+async def _record_turn(
+    session_id: Optional[str],
+    new_session: bool,
+    history: List[ChatMessage],
+    message: str,
+    formatted: Dict[str, Any],
+    conversation: Optional[ConversationRetrieval] = None,
+) -> Optional[str]:
+    """
+    Appends the finished turn to the session (creating one seeded with the
+    posted history when `new_session` is set) and returns its id, together
+    with the conversation's retrieval state. Requests without a session
+    keep nothing. A failing store only costs the session: the client then
+    falls back to sending history.
+    """
+    if not session_id and not new_session:
+        return None
+
+    reply = formatted.get("message") or json.dumps(formatted.get("report"))
+    turn = [
+        ChatMessage(role="user", content=message),
+        ChatMessage(role="assistant", content=reply),
+    ]
+    store = get_session_store()
+    try:
+        if session_id:
+            await run_in_threadpool(store.append, session_id, turn)
+        else:
+            session_id = await run_in_threadpool(store.create, history + turn)
+        if conversation is not None:
+            await run_in_threadpool(store.set_state, session_id, conversation.to_dict())
+        return session_id
+    except Exception as e:
+        logger.error(f"[ERROR] Session store unavailable: {e}")
+        return None
 
 
 def _parse_chat_history(history_json: str) -> List[ChatMessage]:
@@ -0,0 +1,231 @@
+import re
+import math
+import threading
+import numpy as np
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from app.core.logging import logger
+from app.core.config import settings
+
+# Fallback estimate when a model's tokenizer cannot be loaded.
+CHARS_PER_TOKEN = 4
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_tokenizers: Dict[str, Any] = {}
+_tokenizer_lock = threading.Lock()
+
+
+def load_context_tokenizer(model_name: str):
+    """
+    Loads the HF tokenizer used to count prompt tokens for `model_name`; run
+    at startup (see warmup.py). If it cannot be loaded, None is recorded and
+    counts for that model fall back to chars / 4.
+    """
+    with _tokenizer_lock:
+        if model_name not in _tokenizers:
+            tokenizer_name = settings.CONTEXT_TOKENIZERS.get(model_name, model_name)
+            try:
+                from transformers import AutoTokenizer
+
+                logger.info(f"[INFO] Loading context tokenizer {tokenizer_name}...")
+                _tokenizers[model_name] = AutoTokenizer.from_pretrained(tokenizer_name)
+            except Exception as e:
+                logger.warning(
+                    f"[WARN] Tokenizer {tokenizer_name} unavailable ({e}); "
+                    f"estimating {CHARS_PER_TOKEN} chars per token"
+                )
+                _tokenizers[model_name] = None
+    return _tokenizers[model_name]
+
+
+def get_context_tokenizer(model_name: str):
+    """
+    Returns the tokenizer preloaded for `model_name`, or None if it was not
+    loaded. Never loads one itself: that would be a hub download on the
+    request path.
+    """
+    return _tokenizers.get(model_name)
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    tokenizer = get_context_tokenizer(model_name)
+    if tokenizer is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def context_token_budget(model_name: str) -> int:
+    return settings.CONTEXT_TOKEN_BUDGETS.get(
+        model_name, settings.CONTEXT_DEFAULT_TOKEN_BUDGET
+    )
+
+
+def format_document(doc: Dict[str, Any], text: Optional[str] = None) -> str:
+    return (
+        f"--- DOCUMENT ID: {doc['original_id']} ---\n"
+        f"SOURCE: {doc['source']}\n"
+        f"CONTENT:\n{doc['text'] if text is None else text}\n"
+    )
+
+
+def mmr_order(
+    relevance: np.ndarray, doc_vectors: np.ndarray, k: int, lambda_: float
+) -> List[int]:
+    """
+    Maximal marginal relevance: greedily picks the document maximising
+    lambda * relevance - (1 - lambda) * max similarity to those already
+    picked, so near-duplicates of a chosen document sink to the bottom.
+    Returns up to k positions into `relevance`, in selection order.
+    """
+    count = len(relevance)
+    if count == 0:
+        return []
+
+    similarity = doc_vectors @ doc_vectors.T
+    selected: List[int] = []
+    redundancy = np.zeros(count, dtype="float32")
+    remaining = np.ones(count, dtype=bool)
+
+    while len(selected) < min(k, count):
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        remaining[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+
+def split_passages(
+    text: str, max_tokens: int, count: Callable[[str], int]
+) -> List[str]:
+    """Groups consecutive sentences into passages of at most ~max_tokens."""
+    passages, current, current_tokens = [], [], 0
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        tokens = count(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            passages.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def trim_document(
+    text: str,
+    query_vector: np.ndarray,
+    max_tokens: int,
+    count: Callable[[str], int],
+    encode: Callable[[List[str]], np.ndarray],
+) -> str:
+    """
+    Cuts `text` down to its passages most similar to the query that fit in
+    `max_tokens`. The first passage (the topic title) is always kept and the
+    passages stay in document order; gaps are marked with "...".
+    """
+    passages = split_passages(text, settings.CONTEXT_PASSAGE_TOKENS, count)
+    if len(passages) <= 1:
+        return passages[0] if passages else ""
+
+    similarity = encode(passages[1:]) @ query_vector.reshape(-1)
+    keep = {0}
+    used = count(passages[0])
+    for position in np.argsort(-similarity, kind="stable") + 1:
+        tokens = count(passages[position])
+        if used + tokens <= max_tokens:
+            keep.add(int(position))
+            used += tokens
+
+    parts, previous = [], -1
+    for position in sorted(keep):
+        if previous >= 0 and position != previous + 1:
+            parts.append("...")
+        parts.append(passages[position])
+        previous = position
+    return "\n".join(parts)
+
+
+def select_context(
+    docs: List[Dict[str, Any]],
+    doc_vectors: np.ndarray,
+    query_vector: np.ndarray,
+    k: int,
+    model_name: str,
+    encode: Callable[[List[str]], np.ndarray],
+    preferred_ids: Sequence[int] = (),
+) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    Chooses and formats the context docs for `model_name` from ranked
+    candidate docs; returns (doc, formatted chunk) pairs in prompt order.
+
+    Up to k docs are chosen by MMR (relevance is the retriever score scaled to
+    the best hit, redundancy the cosine similarity of doc vectors). Docs longer
+    than CONTEXT_MAX_DOC_TOKENS, or than what is left of the model's token
+    budget, are trimmed to their most query-relevant passages.
+
+    Chosen docs listed in `preferred_ids` come first, in that order, so a
+    context re-packed with mostly the same docs keeps the same prefix.
+    """
+    if not docs:
+        return []
+
+    def count(text: str) -> int:
+        return count_tokens(text, model_name)
+
+    budget = context_token_budget(model_name)
+    scores = np.array([doc["score"] for doc in docs], dtype="float32")
+    relevance = scores / max(float(np.abs(scores).max()), 1e-9)
+    order = mmr_order(relevance, doc_vectors, k, settings.CONTEXT_MMR_LAMBDA)
+    if preferred_ids:
+        rank = {doc_id: position for position, doc_id in enumerate(preferred_ids)}
+        order.sort(
+            key=lambda position: rank.get(docs[position]["original_id"], len(rank))
+        )
+
+    selected: List[Tuple[Dict[str, Any], str]] = []
+    used = 0
+    for position in order:
+        doc = docs[position]
+        overhead = count(format_document(doc, text=""))
+        available = min(budget - used, settings.CONTEXT_MAX_DOC_TOKENS + overhead)
+        if available - overhead < settings.CONTEXT_PASSAGE_TOKENS:
+            break
+
+        chunk = format_document(doc)
+        tokens = count(chunk)
+        if tokens > available:
+            text = trim_document(
+                doc["text"], query_vector, available - overhead, count, encode
+            )
+            chunk = format_document(doc, text)
+            tokens = count(chunk)
+            if used + tokens > budget:
+                break
+
+        selected.append((doc, chunk))
+        used += tokens
+
+    logger.info(
+        f"[INFO] Packed {len(selected)} of {len(docs)} candidate docs into "
+        f"{used}/{budget} tokens for {model_name}"
+    )
+    return selected
+
+
+def pack_context(
+    docs: List[Dict[str, Any]],
+    doc_vectors: np.ndarray,
+    query_vector: np.ndarray,
+    k: int,
+    model_name: str,
+    encode: Callable[[List[str]], np.ndarray],
+) -> str:
+    """Builds the RAG context string for `model_name` (see select_context)."""
+    selected = select_context(docs, doc_vectors, query_vector, k, model_name, encode)
+    return "\n\n".join(chunk for _, chunk in selected)
@@ -0,0 +1,201 @@
+import base64
+import threading
+import numpy as np
+
+from typing import Any, Dict, List, Optional, Sequence
+from app.core.logging import logger
+from app.core.config import settings
+from app.services.context_packer import select_context
+from app.services.rag_service import EmbeddingContext, get_rag_service
+from app.services.sparse_index import tokenize
+
+
+_stats = {"searches": 0, "reuses": 0}
+_stats_lock = threading.Lock()
+
+
+class ConversationRetrieval:
+    """
+    Retrieval state of one conversation, carried from turn to turn.
+
+    Every patient message is folded into a running query vector: earlier
+    turns decay by CONVERSATION_VECTOR_DECAY and a message counts in
+    proportion to its content words, so replies like "no" or "yes" leave the
+    vector where it was. A new search only runs once that vector has drifted
+    more than CONVERSATION_REQUERY_DRIFT (1 - cosine) from the one the current
+    context was retrieved with. Otherwise the previous context is reused,
+    which keeps the prompt prefix identical between turns.
+
+    Only ids are kept between turns: a reused context is re-packed from its
+    passage ids with the same query vector, which yields the same text.
+    """
+
+    def __init__(self, pending: Sequence[str] = ()):
+        self.vector: Optional[np.ndarray] = None
+        # Running vector at the last search.
+        self.anchor: Optional[np.ndarray] = None
+        # Latest content-bearing messages; their text is the lexical query.
+        self.messages: List[str] = []
+        self.context: Optional[str] = None
+        self.context_key: Optional[List] = None
+        self.doc_ids: List[int] = []
+        # Passage ids of each context doc, best first (see group_passages).
+        self.passage_ids: List[List[int]] = []
+        self.scores: List[float] = []
+        # Earlier messages not folded in yet (history posted by the client).
+        self._pending = list(pending)
+
+    @classmethod
+    def from_history(cls, history) -> "ConversationRetrieval":
+        # Older turns have decayed to almost nothing by then, so only the
+        # last few are replayed.
+        messages = [message.content for message in history if message.role == "user"]
+        return cls(messages[-settings.CONVERSATION_QUERY_MESSAGES :])
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "ConversationRetrieval":
+        conversation = cls(state.get("pending", ()))
+        conversation.vector = _decode_vector(state.get("vector"))
+        conversation.anchor = _decode_vector(state.get("anchor"))
+        conversation.messages = list(state.get("messages", []))
+        conversation.context_key = state.get("context_key")
+        conversation.doc_ids = list(state.get("doc_ids", []))
+        conversation.passage_ids = list(state.get("passage_ids", []))
+        conversation.scores = list(state.get("scores", []))
+        return conversation
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serialisable state, as kept by the session store."""
+        return {
+            "vector": _encode_vector(self.vector),
+            "anchor": _encode_vector(self.anchor),
+            "messages": self.messages,
+            "context_key": self.context_key,
+            "doc_ids": self.doc_ids,
+            "passage_ids": self.passage_ids,
+            "scores": self.scores,
+            "pending": self._pending,
+        }
+
+    def observe(
+        self, message: str, embedding: Optional[EmbeddingContext] = None
+    ) -> None:
+        """Folds one patient message into the running query vector."""
+        weight = min(
+            1.0, len(tokenize(message)) / settings.CONVERSATION_FULL_WEIGHT_TOKENS
+        )
+        if weight == 0 and self.vector is not None:
+            return
+
+        vector = (embedding or EmbeddingContext(message)).vector.reshape(-1)
+        if self.vector is None:
+            running = vector.astype("float32")
+        else:
+            running = settings.CONVERSATION_VECTOR_DECAY * self.vector + weight * vector
+        # Rounded to what to_dict keeps, so a restored state searches and
+        # re-packs with exactly the same vector.
+        self.vector = _float16_round(
+            running / max(float(np.linalg.norm(running)), 1e-9)
+        )
+
+        if weight > 0:
+            self.messages = (self.messages + [message])[
+                -settings.CONVERSATION_QUERY_MESSAGES :
+            ]
+
+    def drift(self) -> float:
+        if self.vector is None or self.anchor is None:
+            return 1.0
+        return 1.0 - float(self.vector @ self.anchor)
+
+    def retrieve(
+        self,
+        message: str,
+        k: int,
+        model_name: str,
+        embedding: Optional[EmbeddingContext] = None,
+    ) -> str:
+        """
+        Returns the RAG context for the conversation after `message`.
+
+        A fresh context keeps the docs the previous one already had first, in
+        the same order, so a small shift in the topic list still leaves most
+        of the prompt prefix unchanged.
+        """
+        for pending in self._pending:
+            self.observe(pending)
+        self._pending = []
+        self.observe(message, embedding)
+
+        rag_service = get_rag_service()
+        context_key = [k, model_name]
+        if (
+            self.context_key == context_key
+            and self.drift() <= settings.CONVERSATION_REQUERY_DRIFT
+        ):
+            _count("reuses")
+            logger.info(
+                f"[INFO] Reusing conversation context (drift {self.drift():.3f})"
+            )
+            if self.context is None:
+                docs = rag_service.docs_from_passages(self.passage_ids, self.scores)
+                self._pack(rag_service, docs, k, model_name)
+            return self.context
+
+        _count("searches")
+        query = EmbeddingContext(
+            " ".join(self.messages) or message, vector=self.vector.reshape(1, -1)
+        )
+        docs = rag_service.query(
+            query.text, k=k * settings.CONTEXT_CANDIDATE_FACTOR, embedding=query
+        )
+        self.anchor = self.vector
+        self.context_key = context_key
+        self._pack(rag_service, docs, k, model_name)
+        return self.context
+
+    def _pack(self, rag_service, docs: List[dict], k: int, model_name: str) -> None:
+        selected = select_context(
+            docs,
+            rag_service.doc_vectors(docs),
+            self.anchor,
+            k,
+            model_name,
+            encode=rag_service.encode,
+            preferred_ids=self.doc_ids,
+        )
+        self.context = "\n\n".join(chunk for _, chunk in selected)
+        self.doc_ids = [int(doc["original_id"]) for doc, _ in selected]
+        self.passage_ids = [
+            [int(passage_id) for passage_id in doc["passage_ids"]]
+            for doc, _ in selected
+        ]
+        self.scores = [float(doc["score"]) for doc, _ in selected]
+
+
+def _float16_round(vector: np.ndarray) -> np.ndarray:
+    return vector.astype(np.float16).astype("float32")
+
+
+def _encode_vector(vector: Optional[np.ndarray]) -> Optional[str]:
+    # float16 bytes, base64: ~1 KB for a 384-dim vector instead of ~8 KB of
+    # JSON floats.
+    if vector is None:
+        return None
+    return base64.b64encode(vector.astype(np.float16).tobytes()).decode("ascii")
+
+
+def _decode_vector(encoded: Optional[str]) -> Optional[np.ndarray]:
+    if encoded is None:
+        return None
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float16).astype("float32")
+
+
+def _count(outcome: str) -> None:
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def conversation_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,124 @@
+import os
+import mmap
+import json
+import threading
+import numpy as np
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from app.core.logging import logger
+
+
+class DocStore:
+    """
+    Read-only document store backed by a memory-mapped blob.
+
+    The blob holds one UTF-8 JSON record per document, back to back; the
+    offsets file is an int64 array of length n + 1 so that record i spans
+    blob[offsets[i]:offsets[i + 1]]. The ids file holds the sorted int64 id
+    of each record (the same ids the FAISS index returns). Nothing is decoded
+    until a record is requested, and all worker processes share the same
+    page cache.
+    """
+
+    def __init__(self, blob_path: str, offsets_path: str, ids_path: str):
+        self.blob_path = str(blob_path)
+        self.offsets_path = str(offsets_path)
+        self.ids_path = str(ids_path)
+        self._offsets = None
+        self._ids = None
+        self._blob = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self) -> "DocStore":
+        paths = (self.blob_path, self.offsets_path, self.ids_path)
+        if not all(os.path.exists(path) for path in paths):
+            raise FileNotFoundError(f"Doc store missing ({', '.join(paths)})")
+
+        with self._lock:
+            self.close()
+            self._offsets = np.load(self.offsets_path, mmap_mode="r")
+            self._ids = np.load(self.ids_path, mmap_mode="r")
+            self._file = open(self.blob_path, "rb")
+            if os.path.getsize(self.blob_path) > 0:
+                self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._blob = b""
+
+        logger.info(f"[INFO] Opened doc store with {len(self)} records")
+        return self
+
+    def close(self) -> None:
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        if self._file is not None:
+            self._file.close()
+        self._blob = None
+        self._file = None
+        self._offsets = None
+        self._ids = None
+
+    def __len__(self) -> int:
+        return 0 if self._offsets is None else len(self._offsets) - 1
+
+    def get(self, position: int) -> Dict[str, Any]:
+        start = int(self._offsets[position])
+        end = int(self._offsets[position + 1])
+        return json.loads(self._blob[start:end].decode("utf-8"))
+
+    def get_many(self, positions: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self.get(position) for position in positions]
+
+    def get_by_id(self, doc_id: int) -> Optional[Dict[str, Any]]:
+        position = self.position_of(doc_id)
+        return None if position is None else self.get(position)
+
+    def position_of(self, doc_id: int) -> Optional[int]:
+        if self._ids is None or len(self._ids) == 0:
+            return None
+        position = int(np.searchsorted(self._ids, doc_id))
+        if position < len(self._ids) and int(self._ids[position]) == doc_id:
+            return position
+        return None
+
+
+def write_doc_store(
+    docs: Sequence[Dict[str, Any]],
+    ids: Sequence[int],
+    blob_path: str,
+    offsets_path: str,
+    ids_path: str,
+) -> int:
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(ids) != len(docs):
+        raise ValueError(f"Got {len(docs)} docs but {len(ids)} ids")
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("Doc store ids must be unique")
+
+    order = np.argsort(ids, kind="stable")
+
+    offsets = [0]
+    with open(blob_path, "wb") as blob:
+        for position in order:
+            doc = docs[position]
+            record = json.dumps(doc, ensure_ascii=False, default=_to_json).encode(
+                "utf-8"
+            )
+            blob.write(record)
+            offsets.append(offsets[-1] + len(record))
+
+    # np.save appends ".npy" unless it is already there; write through a file
+    # handle so the configured path is used verbatim.
+    with open(offsets_path, "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.int64))
+    with open(ids_path, "wb") as f:
+        np.save(f, ids[order])
+
+    return len(offsets) - 1
+
+
+def _to_json(value: Any) -> Any:
+    # numpy scalars (e.g. int64 ids coming from pandas) expose .item()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
@@ -0,0 +1,74 @@
+import os
+
+from sentence_transformers import SentenceTransformer
+from app.core.logging import logger
+from app.core.config import settings
+
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+ONNX_FP32_FILE = "onnx/model.onnx"
+
+
+def onnx_file_name(backend: str) -> str:
+    if backend == "onnx-int8":
+        return f"onnx/model_int8_{settings.EMBEDDING_ONNX_QUANTIZATION}.onnx"
+    return ONNX_FP32_FILE
+
+
+def load_embedding_model(backend: str = None) -> SentenceTransformer:
+    """
+    Loads the sentence-transformers model on the configured backend.
+
+    All backends return the same (n, dim) float32 numpy vectors from
+    encode(); ONNX backends read the model exported by
+    scripts.export_embedding_model from EMBEDDING_ONNX_DIR.
+    """
+    backend = (backend or settings.EMBEDDING_BACKEND).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown EMBEDDING_BACKEND '{backend}'. Expected one of {EMBEDDING_BACKENDS}"
+        )
+
+    if backend == "torch":
+        return SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+
+    file_name = onnx_file_name(backend)
+    model_path = settings.EMBEDDING_ONNX_DIR
+    if not os.path.exists(os.path.join(model_path, file_name)):
+        if backend == "onnx-int8":
+            raise FileNotFoundError(
+                f"Quantised ONNX model missing at {model_path}/{file_name}. "
+                "Run: python -m scripts.export_embedding_model"
+            )
+        # sentence-transformers exports fp32 ONNX on the fly from the hub model.
+        logger.warning(f"[WARN] No exported ONNX model in {model_path}, exporting")
+        model_path = settings.EMBEDDING_MODEL_NAME
+
+    logger.info(f"[INFO] Using {backend} embedding backend ({file_name})")
+    return SentenceTransformer(
+        model_path, backend="onnx", model_kwargs={"file_name": file_name}
+    )
+
+
+def export_onnx_model(output_dir: str = None) -> str:
+    """Exports the fp32 and int8 dynamic-quantised ONNX models to output_dir."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    output_dir = output_dir or settings.EMBEDDING_ONNX_DIR
+    quantization = settings.EMBEDDING_ONNX_QUANTIZATION
+
+    logger.info(f"[INFO] Exporting {settings.EMBEDDING_MODEL_NAME} to ONNX...")
+    model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME, backend="onnx")
+    model.save_pretrained(output_dir)
+
+    logger.info(f"[INFO] Quantising ONNX model to int8 ({quantization})...")
+    export_dynamic_quantized_onnx_model(
+        model,
+        quantization,
+        output_dir,
+        file_suffix=f"int8_{quantization}",
+    )
+
+    logger.info(f"[INFO] Exported ONNX embedding models to {output_dir}")
+    return output_dir
@@ -0,0 +1,125 @@
+import io
+import base64
+import hashlib
+import threading
+
+from typing import Any, Dict, Tuple
+from fastapi import UploadFile
+from PIL import ExifTags, Image, ImageOps
+from app.core.config import settings
+from app.core.exceptions import ImageTooLarge
+from app.utils.cache import TTLCache
+
+
+OUTPUT_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Pillow formats that may be forwarded untouched when no resize is needed.
+PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+# (content sha256, max dimension, format, quality) -> {"data": base64, "mime": ...}
+_image_cache = TTLCache(settings.IMAGE_CACHE_SIZE, settings.IMAGE_CACHE_TTL_SECONDS)
+
+_stats = {"images": 0, "bytes_in": 0, "bytes_out": 0, "resized": 0}
+_stats_lock = threading.Lock()
+
+
+async def read_upload(upload: UploadFile, max_bytes: int) -> Tuple[bytes, str]:
+    """
+    Reads an upload in chunks, hashing as it goes; returns (content, sha256).
+
+    Raises ImageTooLarge as soon as more than `max_bytes` have arrived, so an
+    oversized upload is never buffered whole.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise ImageTooLarge()
+
+    digest = hashlib.sha256()
+    chunks, size = [], 0
+    while chunk := await upload.read(settings.IMAGE_READ_CHUNK_BYTES):
+        size += len(chunk)
+        if size > max_bytes:
+            raise ImageTooLarge()
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+def prepare_image(content: bytes, digest: str) -> Dict[str, str]:
+    """
+    Returns the base64 payload and mime type sent to the vision model.
+
+    The image is rotated upright from its EXIF orientation, downscaled so its
+    long side is at most IMAGE_MAX_DIMENSION and re-encoded as IMAGE_FORMAT at
+    IMAGE_QUALITY. A small, upright JPEG/WebP/PNG that re-encoding would not
+    shrink is forwarded as-is. Results are cached by content hash, so an
+    image re-sent later in the conversation is not processed again.
+    """
+    max_dimension = settings.IMAGE_MAX_DIMENSION
+    output_format = settings.IMAGE_FORMAT.upper()
+    key = (digest, max_dimension, output_format, settings.IMAGE_QUALITY)
+
+    cached = _image_cache.get(key)
+    if cached is not None:
+        return cached
+
+    encoded, mime, resized = _transcode(content, max_dimension, output_format)
+    result = {"data": base64.b64encode(encoded).decode("utf-8"), "mime": mime}
+    _image_cache.set(key, result)
+
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["bytes_in"] += len(content)
+        _stats["bytes_out"] += len(encoded)
+        _stats["resized"] += resized
+    return result
+
+
+def _transcode(
+    content: bytes, max_dimension: int, output_format: str
+) -> Tuple[bytes, str, bool]:
+    with Image.open(io.BytesIO(content)) as image:
+        source_format = image.format
+        too_large = max(image.size) > max_dimension
+        rotated = image.getexif().get(ExifTags.Base.Orientation, 1) != 1
+
+        if too_large:
+            # JPEG can decode straight to a reduced scale, which is much
+            # cheaper than decoding full size and resampling.
+            image.draft("RGB", (max_dimension, max_dimension))
+        upright = ImageOps.exif_transpose(image)
+        if too_large:
+            upright.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        _flatten(upright, output_format).save(
+            buffer, format=output_format, quality=settings.IMAGE_QUALITY
+        )
+
+    encoded = buffer.getvalue()
+    if (
+        not too_large
+        and not rotated
+        and source_format in PASSTHROUGH_FORMATS
+        and len(content) <= len(encoded)
+    ):
+        return content, PASSTHROUGH_FORMATS[source_format], False
+    return encoded, OUTPUT_MIME[output_format], too_large
+
+
+def _flatten(image: Image.Image, output_format: str) -> Image.Image:
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    if output_format == "WEBP" and has_alpha:
+        return image.convert("RGBA")
+    if has_alpha:
+        # JPEG has no alpha channel: composite onto white, not black.
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def image_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    return {**stats, "cache": _image_cache.stats()}
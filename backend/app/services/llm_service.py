@@ -1,27 +1,39 @@
 import os
+import re
 import json
 import asyncio
+import threading
+import httpx
 from json_repair import repair_json
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from dotenv import load_dotenv
-from groq import Groq
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from groq import AsyncGroq
+from groq.types.chat import ChatCompletionMessageToolCall
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    TextIteratorStreamer,
+    pipeline,
+)
 from json import JSONDecodeError
-from app.core.exceptions import ToolError, ValidationError, EmptyModelOutput
+from app.core.exceptions import (
+    ToolError,
+    ToolTimeout,
+    ValidationError,
+    EmptyModelOutput,
+)
 from app.domain.prompts import LOCAL_MEDICAL_PROMPT, API_MEDICAL_PROMPT
-from app.utils.tools import TOOLS, execute_tool
-from .rag_service import get_rag_service
+from app.utils.tools import TOOLS, execute_tool, provide_response_implementation
+from .rag_service import get_rag_service, EmbeddingContext
+from .context_packer import pack_context
+from .conversation_retrieval import ConversationRetrieval
+from .response_cache import get_response_cache
 from app.core.logging import logger
 from app.core.config import settings
 from app.domain.models import ChatMessage
 
 
-MAX_CONTEXT_TOKENS = 2000
-CHARS_PER_TOKEN = 4
-MAX_CONTEXT_CHARS = MAX_CONTEXT_TOKENS * CHARS_PER_TOKEN
-
-
 load_dotenv()
 
 
@@ -29,17 +41,41 @@ _groq_client = None
 _local_generator = None
 
 
-def _get_groq_client():
+def _get_groq_client() -> AsyncGroq:
     global _groq_client
     if _groq_client is None:
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
-        _groq_client = Groq(api_key=api_key)
-        logger.info("[INFO] INITIALIZED GROQ CLIENT")
+        _groq_client = AsyncGroq(
+            api_key=api_key,
+            base_url=settings.GROQ_BASE_URL,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            http_client=_build_http_client(),
+        )
+        logger.info("[INFO] INITIALIZED ASYNC GROQ CLIENT")
     return _groq_client
 
 
+def _build_http_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return httpx.AsyncClient(
+        limits=limits, timeout=settings.LLM_TIMEOUT_SECONDS, follow_redirects=True
+    )
+
+
+async def close_groq_client():
+    global _groq_client
+    if _groq_client is not None:
+        await _groq_client.close()
+        _groq_client = None
+        logger.info("[INFO] CLOSED ASYNC GROQ CLIENT")
+
+
 def _get_local_generator():
     global _local_generator
     if _local_generator is None:
@@ -72,6 +108,166 @@ async def run_with_retry_chat(current_message: str, **kwargs):
         raise last_exception
 
 
+async def stream_with_retry_chat(
+    current_message: str, **kwargs
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    stream_chat_once with the retry of run_with_retry_chat.
+
+    An attempt that fails with EmptyModelOutput is retried only while it has
+    not streamed any token yet; once text has reached the client the error
+    is passed on. A retry does not repeat the "retrieval" event.
+    """
+    last_exception = None
+    retrieval_sent = False
+    for i in range(2):
+        streamed = False
+        try:
+            logger.warning(f"[WARN] CALLED stream_with_retry_chat {i + 1} time")
+            async for event in stream_chat_once(current_message, **kwargs):
+                if event["event"] == "retrieval":
+                    if retrieval_sent:
+                        continue
+                    retrieval_sent = True
+                elif event["event"] == "token":
+                    streamed = True
+                yield event
+            return
+        except EmptyModelOutput as e:
+            if streamed:
+                raise
+            logger.error("EmptyModelOutput detected")
+            last_exception = e
+            await asyncio.sleep(0.2)
+
+    if last_exception:
+        raise last_exception
+
+
+def _response_cache_for(history, images_list, use_functions, api_mode):
+    # Only first-turn, text-only API requests are eligible.
+    cache = get_response_cache()
+    if (
+        cache is not None
+        and not history
+        and not images_list
+        and use_functions
+        and api_mode == "api"
+    ):
+        return cache
+    return None
+
+
+def _is_cacheable(result: Optional[Dict[str, Any]]) -> bool:
+    # Only follow-up questions that pass the provide_response schema are
+    # stored; a malformed output would otherwise be served to every similar
+    # first message until it expires.
+    if not (
+        result
+        and result.get("type") == "chat"
+        and result.get("source") == "provide_response"
+    ):
+        return False
+    validated = provide_response_implementation(
+        action="message", message_to_patient=result.get("message")
+    )
+    return "error" not in validated
+
+
+async def run_with_response_cache(
+    current_message: str,
+    history: List[ChatMessage],
+    images_list: List[Dict[str, str]] = None,
+    use_functions=True,
+    api_mode="api",
+    k: int = 5,
+    embedding: Optional[EmbeddingContext] = None,
+    rag_context: Optional[str] = None,
+):
+    """
+    run_with_retry_chat behind the semantic response cache.
+
+    Only first-turn, text-only API requests are looked up; only follow-up
+    messages produced through provide_response are stored, never reports.
+    """
+    kwargs = dict(
+        history=history,
+        images_list=images_list,
+        use_functions=use_functions,
+        api_mode=api_mode,
+        k=k,
+        embedding=embedding,
+        rag_context=rag_context,
+    )
+    cache = _response_cache_for(history, images_list, use_functions, api_mode)
+    if cache is None:
+        return await run_with_retry_chat(current_message=current_message, **kwargs)
+
+    if embedding is None:
+        kwargs["embedding"] = embedding = EmbeddingContext(current_message)
+    scope = (settings.MODEL_NAME, k)
+
+    cached = await asyncio.to_thread(cache.lookup, embedding.vector, scope)
+    if cached is not None:
+        return cached
+
+    result = await run_with_retry_chat(current_message=current_message, **kwargs)
+
+    if _is_cacheable(result):
+        await asyncio.to_thread(cache.store, embedding.vector, scope, result)
+    return result
+
+
+async def stream_with_response_cache(
+    current_message: str,
+    history: List[ChatMessage],
+    images_list: List[Dict[str, str]] = None,
+    use_functions=True,
+    api_mode="api",
+    k: int = 5,
+    embedding: Optional[EmbeddingContext] = None,
+    rag_context: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of run_with_response_cache: the same lookup and
+    store rules around stream_with_retry_chat. A cache hit is sent as one
+    "token" event with the whole message, followed by its "result".
+    """
+    kwargs = dict(
+        history=history,
+        images_list=images_list,
+        use_functions=use_functions,
+        api_mode=api_mode,
+        k=k,
+        embedding=embedding,
+        rag_context=rag_context,
+    )
+    cache = _response_cache_for(history, images_list, use_functions, api_mode)
+    if cache is None:
+        async for event in stream_with_retry_chat(current_message, **kwargs):
+            yield event
+        return
+
+    if embedding is None:
+        kwargs["embedding"] = embedding = EmbeddingContext(current_message)
+    scope = (settings.MODEL_NAME, k)
+
+    cached = await asyncio.to_thread(cache.lookup, embedding.vector, scope)
+    if cached is not None:
+        yield {
+            "event": "retrieval",
+            "data": {"context_chars": len(rag_context or "")},
+        }
+        yield {"event": "token", "data": {"text": cached["message"]}}
+        yield {"event": "result", "data": cached}
+        return
+
+    async for event in stream_with_retry_chat(current_message, **kwargs):
+        if event["event"] == "result" and _is_cacheable(event["data"]):
+            await asyncio.to_thread(cache.store, embedding.vector, scope, event["data"])
+        yield event
+
+
 async def chat_once(
     current_message,
     history: List[ChatMessage],
@@ -79,11 +275,15 @@ async def chat_once(
     use_functions=True,
     api_mode="api",
     k: int = 5,
+    embedding: Optional[EmbeddingContext] = None,
+    rag_context: Optional[str] = None,
 ):
-    rag_text = _get_rag_context(current_message, k)
+    rag_text = rag_context
+    if rag_text is None:
+        rag_text = await retrieve_context(current_message, k, embedding, api_mode)
 
     if api_mode == "local":
-        return _run_local_mode(current_message, rag_text)
+        return await asyncio.to_thread(_run_local_mode, current_message, rag_text)
 
     logger.info("[INFO] CALLED API MODE")
     client = _get_groq_client()
@@ -97,27 +297,15 @@ async def chat_once(
         current_turn += 1
 
         tools_payload = _build_tools_payload(use_functions)
-        tool_choice_strategy = None
-        if tools_payload:
-            has_response_tool = any(
-                tool["function"]["name"] == "provide_response" for tool in tools_payload
-            )
-
-            if has_response_tool:
-                tool_choice_strategy = {
-                    "type": "function",
-                    "function": {"name": "provide_response"},
-                }
-            else:
-                tool_choice_strategy = "auto"
+        tool_choice_strategy = _build_tool_choice(tools_payload)
 
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=settings.MODEL_NAME,
                 messages=messages,
                 tools=tools_payload,
                 tool_choice=tool_choice_strategy,
-                timeout=30,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
                 temperature=0.3,
             )
         except Exception as e:
@@ -139,73 +327,299 @@ async def chat_once(
 
         messages.append(response_message.model_dump())
 
-        for tool_call in tool_calls:
-            execution_result = await _execute_tool_call(tool_call, messages)
+        final_args = await _execute_tool_calls(tool_calls, messages)
 
-            if execution_result.get("is_final"):
-                return _handle_special_tool_response(
-                    "provide_response",
-                    execution_result["args"],
-                )
+        if final_args is not None:
+            return _handle_special_tool_response("provide_response", final_args)
 
 
-def _get_rag_context(message: str, k: int) -> str:
+async def stream_chat_once(
+    current_message,
+    history: List[ChatMessage],
+    images_list: List[Dict[str, str]] = None,
+    use_functions=True,
+    api_mode="api",
+    k: int = 5,
+    embedding: Optional[EmbeddingContext] = None,
+    rag_context: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of chat_once.
+
+    Yields progress events as dicts with "event" and "data" keys: one
+    "retrieval" event, then "token" events carrying text deltas of the
+    patient-facing message, and finally a "result" event whose data has the
+    same shape chat_once returns.
+    """
+    rag_text = rag_context
+    if rag_text is None:
+        rag_text = await retrieve_context(current_message, k, embedding, api_mode)
+    yield {
+        "event": "retrieval",
+        "data": {"context_chars": len(rag_text)},
+    }
+
+    if api_mode == "local":
+        async for event in _stream_local_mode(current_message, rag_text):
+            yield event
+        return
+
+    logger.info("[INFO] CALLED API STREAM MODE")
+    client = _get_groq_client()
+
+    messages = _build_api_messages(history, current_message, rag_text, images_list)
+
+    MAX_TURNS = 3
+    current_turn = 0
+
+    while current_turn < MAX_TURNS:
+        current_turn += 1
+
+        tools_payload = _build_tools_payload(use_functions)
+
+        try:
+            stream = await client.chat.completions.create(
+                model=settings.MODEL_NAME,
+                messages=messages,
+                tools=tools_payload,
+                tool_choice=_build_tool_choice(tools_payload),
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                temperature=0.3,
+                stream=True,
+            )
+        except Exception as e:
+            logger.error(f"[ERROR] API Error: {e}")
+            raise ToolError(f"Provider Error: {e}")
+
+        content_parts = []
+        tool_call_parts: Dict[int, Dict[str, Any]] = {}
+        message_streamer = _JsonStringFieldStreamer("message_to_patient")
+
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+
+                if delta.content:
+                    content_parts.append(delta.content)
+                    yield {"event": "token", "data": {"text": delta.content}}
+
+                for call_delta in delta.tool_calls or []:
+                    parts = tool_call_parts.setdefault(
+                        call_delta.index, {"id": None, "name": "", "arguments": ""}
+                    )
+                    if call_delta.id:
+                        parts["id"] = call_delta.id
+                    if call_delta.function is None:
+                        continue
+                    if call_delta.function.name:
+                        parts["name"] += call_delta.function.name
+                    if call_delta.function.arguments:
+                        parts["arguments"] += call_delta.function.arguments
+                        if parts["name"] == "provide_response":
+                            text = message_streamer.feed(call_delta.function.arguments)
+                            if text:
+                                yield {"event": "token", "data": {"text": text}}
+        except Exception as e:
+            logger.error(f"[ERROR] API Stream Error: {e}")
+            raise ToolError(f"Provider Error: {e}")
+
+        if not tool_call_parts:
+            logger.warning("[WARN] Model didn't use tool, falling back to text content")
+            yield {
+                "event": "result",
+                "data": {
+                    "type": "chat",
+                    "message": "".join(content_parts)
+                    or "I couldn't generate a structured response.",
+                },
+            }
+            return
+
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=parts["id"] or f"call_{index}",
+                type="function",
+                function={"name": parts["name"], "arguments": parts["arguments"]},
+            )
+            for index, parts in sorted(tool_call_parts.items())
+        ]
+
+        logger.info(f"[INFO] MODEL REQUESTED {len(tool_calls)} TOOL(S)")
+
+        messages.append(
+            {
+                "role": "assistant",
+                "content": "".join(content_parts) or None,
+                "tool_calls": [call.model_dump() for call in tool_calls],
+            }
+        )
+
+        final_args = await _execute_tool_calls(tool_calls, messages)
+
+        if final_args is not None:
+            yield {
+                "event": "result",
+                "data": _handle_special_tool_response("provide_response", final_args),
+            }
+            return
+
+
+class _JsonStringFieldStreamer:
+    """
+    Incrementally decodes one string field from JSON that arrives in fragments.
+
+    Used to forward `message_to_patient` to the client while the model is
+    still generating the tool call arguments.
+    """
+
+    _ESCAPES = {
+        '"': '"',
+        "\\": "\\",
+        "/": "/",
+        "b": "\b",
+        "f": "\f",
+        "n": "\n",
+        "r": "\r",
+        "t": "\t",
+    }
+
+    def __init__(self, field: str):
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._position = None
+        self._done = False
+
+    def feed(self, fragment: str) -> str:
+        self._buffer += fragment
+        if self._done:
+            return ""
+
+        if self._position is None:
+            match = self._pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._position = match.end()
+
+        buffer = self._buffer
+        i = self._position
+        decoded = []
+
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self._done = True
+                i += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                i += 1
+                continue
+
+            if i + 1 >= len(buffer):
+                break
+            escape = buffer[i + 1]
+            if escape != "u":
+                decoded.append(self._ESCAPES.get(escape, escape))
+                i += 2
+                continue
+
+            if i + 6 > len(buffer):
+                break
+            code = int(buffer[i + 2 : i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                if i + 12 > len(buffer):
+                    break
+                low = int(buffer[i + 8 : i + 12], 16)
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                i += 6
+            decoded.append(chr(code))
+            i += 6
+
+        self._position = i
+        return "".join(decoded)
+
+
+def _build_tool_choice(tools_payload: Optional[List[dict]]):
+    if not tools_payload:
+        return None
+
+    has_response_tool = any(
+        tool["function"]["name"] == "provide_response" for tool in tools_payload
+    )
+
+    if has_response_tool:
+        return {
+            "type": "function",
+            "function": {"name": "provide_response"},
+        }
+    return "auto"
+
+
+async def retrieve_context(
+    message: str,
+    k: int,
+    embedding: Optional[EmbeddingContext] = None,
+    api_mode: str = "api",
+    conversation: Optional[ConversationRetrieval] = None,
+) -> str:
+    """Embeds the message and packs the RAG context in a worker thread."""
+    return await asyncio.to_thread(
+        _get_rag_context, message, k, embedding, api_mode, conversation
+    )
+
+
+def _get_rag_context(
+    message: str,
+    k: int,
+    embedding: Optional[EmbeddingContext] = None,
+    api_mode: str = "api",
+    conversation: Optional[ConversationRetrieval] = None,
+) -> str:
     if not message:
         return ""
 
     logger.info("[INFO] CALLED RAG QUERY")
 
+    if embedding is None:
+        embedding = EmbeddingContext(message)
+    model_name = (
+        settings.LOCAL_MODEL_NAME if api_mode == "local" else settings.MODEL_NAME
+    )
+
     try:
+        if conversation is not None:
+            return conversation.retrieve(message, k, model_name, embedding=embedding)
+
         rag_service = get_rag_service()
-        context_docs = rag_service.query(message, k=k * 2)
+        context_docs = rag_service.query(
+            message, k=k * settings.CONTEXT_CANDIDATE_FACTOR, embedding=embedding
+        )
+        return pack_context(
+            context_docs,
+            rag_service.doc_vectors(context_docs),
+            embedding.vector,
+            k,
+            model_name,
+            encode=rag_service.encode,
+        )
     except Exception as e:
         logger.error(f"[EROOR] RAG Error (continuing without context): {e}")
         return ""
 
-    rag_text_parts = []
-    current_char_count = 0
-
-    for doc in context_docs:
-        formatted_chunk = (
-            f"--- DOCUMENT ID: {doc['original_id']} ---\n"
-            f"SOURCE: {doc['source']}\n"
-            f"CONTENT:\n{doc['text']}\n"
-        )
-
-        chunk_len = len(formatted_chunk)
-
-        if current_char_count + chunk_len > MAX_CONTEXT_CHARS:
-            logger.warning(
-                f"[WARN] Context limit reached! Stopping at {len(rag_text_parts)} docs "
-                f"({current_char_count} chars). Ignored remaining candidates."
-            )
-            break
-
-        rag_text_parts.append(formatted_chunk)
-        current_char_count += chunk_len
-
-    return "\n\n".join(rag_text_parts)
-
 
 def _run_local_mode(current_message: str, rag_text: str) -> Dict[str, Any]:
     logger.info("CALLED LOCAL MODE")
 
     generator = _get_local_generator()
-    tokenizer = generator.tokenizer
 
     full_prompt = LOCAL_MEDICAL_PROMPT.format(
         rag_text=rag_text, current_message=current_message
     )
 
     try:
-        out = generator(
-            full_prompt,
-            max_new_tokens=120,
-            temperature=0.3,
-            pad_token_id=tokenizer.eos_token_id,
-            return_full_text=False,
-            do_sample=True,
-        )
+        out = generator(full_prompt, **_local_generation_kwargs(generator))
 
         text = out[0]["generated_text"].strip()
     except Exception as e:
@@ -222,6 +636,59 @@ def _run_local_mode(current_message: str, rag_text: str) -> Dict[str, Any]:
     }
 
 
+async def _stream_local_mode(
+    current_message: str, rag_text: str
+) -> AsyncIterator[Dict[str, Any]]:
+    logger.info("CALLED LOCAL STREAM MODE")
+
+    generator = _get_local_generator()
+    streamer = TextIteratorStreamer(
+        generator.tokenizer, skip_prompt=True, skip_special_tokens=True
+    )
+
+    full_prompt = LOCAL_MEDICAL_PROMPT.format(
+        rag_text=rag_text, current_message=current_message
+    )
+
+    def generate():
+        try:
+            generator(
+                full_prompt, streamer=streamer, **_local_generation_kwargs(generator)
+            )
+        except Exception as e:
+            logger.error(f"[ERROR] Local Model Error: {e}")
+            streamer.end()
+
+    thread = threading.Thread(target=generate, daemon=True)
+    thread.start()
+
+    text_parts = []
+    while True:
+        token = await asyncio.to_thread(next, streamer, None)
+        if token is None:
+            break
+        if token:
+            text_parts.append(token)
+            yield {"event": "token", "data": {"text": token}}
+
+    text = "".join(text_parts).strip()
+    if not text:
+        logger.error("[ERROR] EmptyModelOutput")
+        raise EmptyModelOutput("EmptyModelOutput detected")
+
+    yield {"event": "result", "data": {"type": "chat", "message": text}}
+
+
+def _local_generation_kwargs(generator) -> Dict[str, Any]:
+    return {
+        "max_new_tokens": 120,
+        "temperature": 0.3,
+        "pad_token_id": generator.tokenizer.eos_token_id,
+        "return_full_text": False,
+        "do_sample": True,
+    }
+
+
 def _build_api_messages(
     history: List[ChatMessage],
     current_message: str,
@@ -270,9 +737,41 @@ def _build_tools_payload(use_functions: bool) -> Optional[List[dict]]:
     return active_tools if active_tools else None
 
 
-async def _execute_tool_call(
-    tool_call, messages: List[Dict[str, Any]]
+async def _execute_tool_calls(
+    tool_calls, messages: List[Dict[str, Any]]
 ) -> Optional[Dict[str, Any]]:
+    """
+    Runs the tool calls of one model turn concurrently.
+
+    Results are appended to `messages` in the order the model requested
+    them. The first provide_response call short-circuits the turn: only the
+    calls before it are executed, and its arguments are returned. Returns
+    None when the turn has no provide_response call.
+    """
+    final_position = next(
+        (
+            position
+            for position, tool_call in enumerate(tool_calls)
+            if tool_call.function.name == "provide_response"
+        ),
+        len(tool_calls),
+    )
+
+    results = await asyncio.gather(
+        *(_execute_tool_call(tool_call) for tool_call in tool_calls[:final_position])
+    )
+    messages.extend(result["message"] for result in results)
+
+    if final_position == len(tool_calls):
+        if results:
+            logger.info("TOOLS EXECUTED. FEEDING RESULTS BACK TO LLM...")
+        return None
+
+    final = await _execute_tool_call(tool_calls[final_position])
+    return final["args"]
+
+
+async def _execute_tool_call(tool_call) -> Dict[str, Any]:
     fn_name = tool_call.function.name
     fn_args_json = tool_call.function.arguments
     call_id = tool_call.id
@@ -290,21 +789,23 @@ async def _execute_tool_call(
 
     tool_result = await execute_tool(fn_name, args)
 
+    if tool_result.get("error") == "timeout":
+        logger.error(f"[ERROR] ToolTimeout in {fn_name}")
+        raise ToolTimeout(f"Tool {fn_name} timed out")
+
     if "error" in tool_result:
         logger.error(f"[ERROR] ToolError in {fn_name}")
         raise ToolError(tool_result["error"])
 
-    messages.append(
-        {
+    return {
+        "is_final": False,
+        "message": {
             "role": "tool",
             "tool_call_id": call_id,
             "name": fn_name,
             "content": json.dumps(tool_result),
-        }
-    )
-
-    logger.info("TOOL EXECUTED. FEEDING RESULT BACK TO LLM...")
-    return {"is_final": False}
+        },
+    }
 
 
 def _handle_special_tool_response(fn_name: str, args: dict) -> Optional[Dict[str, Any]]:
@@ -315,6 +816,7 @@ def _handle_special_tool_response(fn_name: str, args: dict) -> Optional[Dict[str
         return {
             "type": "chat",
             "message": args.get("message_to_patient"),
+            "source": "provide_response",
         }
     elif args.get("action") == "final_report":
         return {
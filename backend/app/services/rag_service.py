@@ -1,26 +1,208 @@
 import os
-import pickle
-import faiss
+import hashlib
+import time
+import queue
+import threading
+import numpy as np
 
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
 from app.core.logging import logger
 from app.core.config import settings
+from app.services.vector_index import load_index
+from app.services.doc_store import DocStore
+from app.services.sparse_index import open_bm25_index, reciprocal_rank_fusion
+from app.services import reranker as reranker_module
+from app.services.embedding_backend import load_embedding_model
+from app.utils.cache import TTLCache, normalize_cache_text
 
 
 _embedding_model = None
 
+# Normalised message text -> (1, dim) query vector. Independent of the index,
+# so it survives index reloads.
+_embedding_cache = TTLCache(
+    settings.RAG_EMBEDDING_CACHE_SIZE, settings.RAG_CACHE_TTL_SECONDS
+)
+
 
 def get_embedding_model():
     global _embedding_model
     if _embedding_model is None:
-        logger.info(f"[INFO] Loading Embedding Model ({settings.EMBEDDING_MODEL_NAME})...")
-        _embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+        logger.info(
+            f"[INFO] Loading Embedding Model ({settings.EMBEDDING_MODEL_NAME}, "
+            f"{settings.EMBEDDING_BACKEND})..."
+        )
+        _embedding_model = load_embedding_model()
     return _embedding_model
 
 
+class EmbeddingContext:
+    """
+    Per-request holder for the embedding of the patient's message.
+
+    The vector is computed lazily on first access and then shared by every
+    consumer of the request (guardrails, RAG), so the message is encoded once.
+    It is kept as a single L2-normalised float32 ndarray of shape (1, dim),
+    which FAISS consumes directly.
+
+    Vectors are also cached across requests, keyed by normalised text.
+
+    A precomputed `vector` (e.g. a conversation's running query vector) can
+    be passed in; it is then used as-is instead of encoding `text`.
+    """
+
+    def __init__(self, text: str, vector: Optional[np.ndarray] = None):
+        self.text = text
+        self._vector = vector
+        self._lock = threading.Lock()
+        # Search results are cached per vector, not per text, once they differ.
+        self.cache_key = normalize_cache_text(text)
+        if vector is not None:
+            self.cache_key = (
+                self.cache_key,
+                hashlib.sha1(vector.tobytes()).hexdigest(),
+            )
+
+    @property
+    def vector(self) -> np.ndarray:
+        if self._vector is None:
+            with self._lock:
+                if self._vector is None:
+                    self._vector = _encode_cached(self.text)
+        return self._vector
+
+
+def _encode_cached(text: str) -> np.ndarray:
+    key = normalize_cache_text(text)
+    vector = _embedding_cache.get(key)
+    if vector is None:
+        vector = get_embedding_batcher().encode(text)
+        vector.setflags(write=False)
+        _embedding_cache.set(key, vector)
+    return vector
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text encode calls into batched forward passes.
+
+    Callers block in encode() while a background thread collects pending
+    texts for up to `max_wait_ms` (or until `max_batch` are queued), encodes
+    them in one model.encode call and resolves each caller's future with its
+    own (1, dim) row. With `max_batch` <= 1 texts are encoded inline.
+    """
+
+    def __init__(self, max_batch: int, max_wait_ms: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.encoded = 0
+
+    def encode(self, text: str) -> np.ndarray:
+        if self.max_batch <= 1:
+            return _encode_batch([text])
+
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        pending.append(self._queue.get(timeout=remaining))
+                    else:
+                        pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(pending)
+
+    def _process(self, pending: List[Tuple[str, Future]]) -> None:
+        try:
+            vectors = _encode_batch([text for text, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.encoded += len(pending)
+        for row, (_, future) in enumerate(pending):
+            future.set_result(vectors[row : row + 1].copy())
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "avg_batch_size": (
+                round(self.encoded / self.batches, 2) if self.batches else 0.0
+            ),
+        }
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    model = get_embedding_model()
+    return model.encode(
+        texts,
+        batch_size=max(len(texts), 1),
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+
+
+_embedding_batcher = None
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        _embedding_batcher = EmbeddingBatcher(
+            settings.EMBEDDING_BATCH_MAX_SIZE, settings.EMBEDDING_BATCH_MAX_WAIT_MS
+        )
+    return _embedding_batcher
+
+
+# Passage n of topic t is stored under id t * PASSAGE_ID_STRIDE + n, so all
+# passages of a topic form one contiguous id range.
+PASSAGE_ID_STRIDE = 1000
+
+
+def passage_id(topic_id: int, number: int) -> int:
+    return int(topic_id) * PASSAGE_ID_STRIDE + number
+
+
 _rag_instance = None
 
 
+def cache_stats() -> dict:
+    retrieval = _rag_instance._retrieval_cache if _rag_instance is not None else None
+    return {
+        "embedding_batcher": get_embedding_batcher().stats(),
+        "embedding_cache": _embedding_cache.stats(),
+        "retrieval_cache": retrieval.stats() if retrieval is not None else None,
+        "reranker": reranker_module.reranker_stats(),
+    }
+
+
 def get_rag_service():
     global _rag_instance
     if _rag_instance is None:
@@ -36,35 +218,300 @@ class RAG:
     def __init__(self):
         self.model = get_embedding_model()
         self.index = None
-        self.docs = []
+        self.index_params = {}
+        self.docs = DocStore(
+            settings.RAG_DOCSTORE_PATH,
+            settings.RAG_DOCSTORE_OFFSETS_PATH,
+            settings.RAG_DOCSTORE_IDS_PATH,
+        )
+        self.bm25 = None
+        # (retriever, normalised text, k) -> raw (scores, ids) search hits for this index
+        self._retrieval_cache = TTLCache(
+            settings.RAG_RETRIEVAL_CACHE_SIZE, settings.RAG_CACHE_TTL_SECONDS
+        )
 
     def load_index(self):
         if not os.path.exists(settings.RAG_INDEX_PATH) or not os.path.exists(
-            settings.RAG_METADATA_PATH
+            settings.RAG_DOCSTORE_PATH
         ):
             raise FileNotFoundError("RAG files missing. Run ETL script.")
 
         logger.info(f"[INFO] Loading FAISS index from {settings.RAG_INDEX_PATH}...")
-        self.index = faiss.read_index(str(settings.RAG_INDEX_PATH))
+        self.index, self.index_params = load_index(
+            settings.RAG_INDEX_PATH,
+            settings.RAG_INDEX_PARAMS_PATH,
+            use_mmap=settings.RAG_INDEX_MMAP,
+        )
 
-        logger.info(f"[INFO] Loading metadata from {settings.RAG_METADATA_PATH}...")
-        with open(settings.RAG_METADATA_PATH, "rb") as f:
-            self.docs = pickle.load(f)
+        logger.info(f"[INFO] Opening doc store {settings.RAG_DOCSTORE_PATH}...")
+        self.docs.open()
+        self.bm25 = open_bm25_index(settings.RAG_BM25_PATH)
+        self._retrieval_cache.clear()
+        reranker_module.clear_rerank_cache()
 
-        logger.info(f"[INFO] RAG Ready. Loaded {self.index.ntotal} vectors.")
+        if self.bm25 is None and settings.RAG_RETRIEVAL_MODE == "hybrid":
+            logger.warning(
+                f"[WARN] No BM25 index at {settings.RAG_BM25_PATH}; hybrid retrieval "
+                "falls back to dense-only. Rebuild the index to enable it."
+            )
 
-    def query(self, text: str, k: int) -> list[dict]:
+        if self.index_params.get("metric") != "ip":
+            logger.warning(
+                "[WARN] RAG index uses L2 distances; similarity cut-offs are disabled. "
+                "Rebuild the index to enable them."
+            )
+
+        logger.info(
+            f"[INFO] RAG Ready. Loaded {self.index.ntotal} vectors "
+            f"({self.index_params.get('index_type', 'flat')} index)."
+        )
+
+    def query(
+        self,
+        text: str,
+        k: int,
+        embedding: Optional[EmbeddingContext] = None,
+        min_score: Optional[float] = None,
+        max_score_gap: Optional[float] = None,
+        mode: Optional[str] = None,
+        rerank: Optional[bool] = None,
+    ) -> list[dict]:
+        """
+        Returns up to k topics, best first, each with a "score" key.
+
+        The index holds passages; the best RAG_PASSAGES_PER_TOPIC passages of
+        each topic are merged (in document order) into the topic's "text",
+        and the topic takes the score of its best passage.
+
+        In "dense" mode scores are cosine similarities. Documents below
+        `min_score`, or more than `max_score_gap` below the best hit, are
+        dropped so weak matches never reach the prompt.
+
+        In "hybrid" mode the surviving dense candidates and the BM25 matches
+        are fused with reciprocal-rank fusion; "score" is the fused score and
+        "dense_score" / "bm25_score" hold whichever of the two found the doc.
+
+        With `rerank` (default RERANK_ENABLED) the top RERANK_CANDIDATES are
+        re-scored by the cross-encoder and at most RERANK_TOP_K are returned,
+        unless the re-rank would exceed its latency budget.
+        """
         if self.index is None or self.index.ntotal == 0:
             logger.warning("[WARN] RAG Index is empty or not loaded.")
             return []
 
-        q_vec = self.model.encode([text], convert_to_numpy=True)
+        if embedding is None:
+            embedding = EmbeddingContext(text)
+
+        mode = mode or settings.RAG_RETRIEVAL_MODE
         actual_k = min(k, self.index.ntotal)
-        distances, indices = self.index.search(q_vec, actual_k)
+        min_score = settings.RAG_MIN_SIMILARITY if min_score is None else min_score
+        max_score_gap = (
+            settings.RAG_MAX_SCORE_GAP if max_score_gap is None else max_score_gap
+        )
+
+        rerank = settings.RERANK_ENABLED if rerank is None else rerank
+        # Several passages of one topic can rank together, so over-fetch
+        # passages to still fill k topics after grouping.
+        fetch_k = actual_k * settings.RAG_PASSAGE_FETCH_FACTOR
+        if rerank:
+            fetch_k = max(fetch_k, settings.RERANK_CANDIDATES)
+        fetch_k = min(fetch_k, self.index.ntotal)
+
+        if mode == "hybrid" and self.bm25 is not None:
+            results = self._hybrid_query(embedding, fetch_k, min_score, max_score_gap)
+        else:
+            results = self._dense_query(embedding, fetch_k, min_score, max_score_gap)
+
+        if rerank:
+            reranked = reranker_module.get_reranker().rerank(
+                embedding.text, results, min_docs=settings.RERANK_TOP_K
+            )
+            if reranked is not None:
+                return group_passages(reranked, min(actual_k, settings.RERANK_TOP_K))
+        return group_passages(results, actual_k)
+
+    def _hybrid_query(
+        self,
+        embedding: EmbeddingContext,
+        k: int,
+        min_score: float,
+        max_score_gap: float,
+    ) -> list[dict]:
+        candidates = min(max(k, settings.RAG_HYBRID_CANDIDATES), self.index.ntotal)
+        dense = self._dense_query(embedding, candidates, min_score, max_score_gap)
+        bm25_scores, bm25_ids = self._cached_search(
+            "bm25",
+            normalize_cache_text(embedding.text),
+            candidates,
+            lambda: self.bm25.search(embedding.text, candidates),
+        )
+
+        dense_by_id = {_record_id(doc): doc for doc in dense}
+        # BM25-only hits skip the dense cut-offs, so they must match a large
+        # enough share of the query on their own: one shared filler word
+        # ("yesterday") is not enough to reach the prompt.
+        floor = settings.RAG_BM25_MIN_SCORE * self.bm25.max_score(embedding.text)
+        bm25_by_id = {
+            doc_id: score
+            for doc_id, score in zip(bm25_ids.tolist(), bm25_scores.tolist())
+            if doc_id in dense_by_id or score >= floor
+        }
+        fused = reciprocal_rank_fusion(
+            [list(dense_by_id), list(bm25_by_id)], k, settings.RAG_RRF_K
+        )
+
+        results = []
+        for doc_id, score in fused:
+            doc = dense_by_id.get(doc_id)
+            if doc is None:
+                doc = self.docs.get_by_id(int(doc_id))
+                if doc is None:
+                    continue
+            else:
+                doc = {**doc, "dense_score": doc["score"]}
+            if doc_id in bm25_by_id:
+                doc["bm25_score"] = bm25_by_id[doc_id]
+            doc["score"] = score
+            results.append(doc)
+        return results
+
+    def docs_from_passages(
+        self, passage_ids: List[List[int]], scores: List[float]
+    ) -> list[dict]:
+        """
+        Rebuilds topics as query() returns them from each topic's passage ids
+        (best first) and score, e.g. to re-pack a context kept by id only.
+        Passages no longer in the doc store are skipped.
+        """
+        passages = []
+        for ids, score in zip(passage_ids, scores):
+            for passage_id in ids:
+                record = self.docs.get_by_id(int(passage_id))
+                if record is not None:
+                    passages.append({**record, "score": score})
+        return group_passages(passages, len(passage_ids))
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """L2-normalised embeddings of ad-hoc texts (e.g. passages), one batch."""
+        return _encode_batch(texts)
+
+    def doc_vectors(self, docs: list[dict]) -> np.ndarray:
+        """
+        L2-normalised vectors of the best passage of each of `docs` (as returned
+        by query), read back from the index.
+        """
+        if not docs:
+            return np.empty((0, 0), dtype="float32")
+        vectors = np.vstack(
+            [self.index.reconstruct(int(doc["passage_ids"][0])) for doc in docs]
+        ).astype("float32")
+        return vectors / np.maximum(
+            np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+        )
+
+    def _dense_query(
+        self,
+        embedding: EmbeddingContext,
+        k: int,
+        min_score: float,
+        max_score_gap: float,
+    ) -> list[dict]:
+        scores, indices = self._cached_search(
+            "dense", embedding.cache_key, k, lambda: self._dense_search(embedding, k)
+        )
 
         results = []
-        for i in indices[0]:
-            if i != -1 and i < len(self.docs):
-                results.append(self.docs[i])
+        for score, doc_id in zip(scores, indices):
+            if doc_id == -1:
+                continue
+            doc = self.docs.get_by_id(int(doc_id))
+            if doc is not None:
+                results.append({**doc, "score": float(score)})
+
+        if self.index_params.get("metric") != "ip":
+            for doc in results:
+                doc["score"] = -doc["score"]
+            return results
+
+        return _apply_score_cutoffs(results, min_score, max_score_gap)
+
+    def _dense_search(self, embedding: EmbeddingContext, k: int):
+        scores, indices = self.index.search(embedding.vector, k)
+        return scores[0], indices[0]
+
+    def _cached_search(self, retriever: str, key, k: int, search):
+        cache_key = (retriever, key, k)
+        hits = self._retrieval_cache.get(cache_key)
+        if hits is None:
+            hits = search()
+            self._retrieval_cache.set(cache_key, hits)
+        return hits
+
+
+def _record_id(doc: dict) -> int:
+    # The id the record is indexed under (topic id for pre-chunking builds).
+    return doc.get("passage_id", doc["original_id"])
+
 
+def group_passages(passages: list[dict], k: int) -> list[dict]:
+    """
+    Groups ranked passages into at most k topics, in order of each topic's
+    best passage. Records built before passage chunking count as a single
+    passage of their topic.
+    """
+    groups: dict[int, list[dict]] = {}
+    for passage in passages:
+        group = groups.get(passage["original_id"])
+        if group is None:
+            if len(groups) == k:
+                continue
+            group = groups[passage["original_id"]] = []
+        if len(group) < settings.RAG_PASSAGES_PER_TOPIC:
+            group.append(passage)
+    return [_merge_passages(group) for group in groups.values()]
+
+
+def _merge_passages(group: list[dict]) -> dict:
+    best = group[0]
+    if "passage" not in best:
+        return {**best, "passage_ids": [best["original_id"]]}
+
+    parts, previous = [], None
+    for passage in sorted(group, key=lambda p: p["passage"]):
+        if previous is not None and passage["passage"] == previous + 1:
+            # Drop the words this passage repeats from the previous one.
+            parts[-1] += " " + " ".join(
+                passage["text"].split()[passage["body_start"] :]
+            )
+        else:
+            parts.append(passage["text"])
+        previous = passage["passage"]
+
+    topic = {
+        key: value
+        for key, value in best.items()
+        if key not in ("passage", "passage_id", "body_start")
+    }
+    topic["text"] = (
+        f"Disease/Topic: {best['title']}\nDescription: {' ... '.join(parts)}"
+        f"\nSource: {best['source']}"
+    )
+    topic["passage_ids"] = [p["passage_id"] for p in group]
+    return topic
+
+
+def _apply_score_cutoffs(
+    results: list[dict], min_score: float, max_score_gap: float
+) -> list[dict]:
+    if not results:
         return results
+
+    floor = max(min_score, results[0]["score"] - max_score_gap)
+    kept = [doc for doc in results if doc["score"] >= floor]
+
+    if len(kept) < len(results):
+        logger.info(
+            f"[INFO] RAG cut-off dropped {len(results) - len(kept)} of "
+            f"{len(results)} docs (floor {floor:.2f})"
+        )
+    return kept
@@ -0,0 +1,176 @@
+import time
+import threading
+
+from typing import List, Optional
+from app.core.logging import logger
+from app.core.config import settings
+from app.utils.cache import TTLCache, normalize_cache_text
+
+
+_cross_encoder = None
+_reranker = None
+
+
+def get_cross_encoder():
+    global _cross_encoder
+    if _cross_encoder is None:
+        from sentence_transformers import CrossEncoder
+
+        logger.info(f"[INFO] Loading cross-encoder ({settings.RERANK_MODEL_NAME})...")
+        _cross_encoder = CrossEncoder(
+            settings.RERANK_MODEL_NAME,
+            max_length=settings.RERANK_MAX_LENGTH,
+            device="cpu",
+        )
+    return _cross_encoder
+
+
+class Reranker:
+    """
+    Re-scores retrieved documents with a cross-encoder, within a latency budget.
+
+    Every (query, doc) pair not yet in the score cache is scored in a single
+    batched predict call. Its cost is estimated from the running average
+    seconds-per-pair of earlier calls (unknown until the first one, which the
+    warm-up makes), so the stage never plans more work than `budget_ms`.
+    """
+
+    def __init__(self, model, budget_ms: float, cache_size: int, ttl_seconds: float):
+        self.model = model
+        self.budget = budget_ms / 1000
+        # (normalised query, doc id) -> cross-encoder score
+        self._scores = TTLCache(cache_size, ttl_seconds)
+        self._seconds_per_pair: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reranked = 0
+        self.skipped = 0
+        self.over_budget = 0
+
+    def rerank(
+        self, query: str, docs: List[dict], min_docs: int = 1
+    ) -> Optional[List[dict]]:
+        """
+        Returns `docs` re-ordered by cross-encoder score (as "score", with the
+        retriever's kept as "retrieval_score"), or None if skipped.
+
+        When scoring every doc would blow the budget, only the longest prefix
+        of `docs` that fits is re-ranked (the rest follow in retriever order,
+        scored as the lowest re-ranked doc); if that prefix is shorter than
+        `min_docs` the stage is skipped.
+        """
+        if not docs:
+            return docs
+
+        key = normalize_cache_text(query)
+        scores = [self._scores.get((key, _doc_key(doc))) for doc in docs]
+
+        head = len(docs)
+        if self._seconds_per_pair is not None:
+            affordable = int(self.budget / max(self._seconds_per_pair, 1e-9))
+            missing = 0
+            for position, score in enumerate(scores):
+                missing += score is None
+                if missing > affordable:
+                    head = position
+                    break
+        if head < min(min_docs, len(docs)):
+            with self._lock:
+                self.skipped += 1
+            logger.warning(
+                f"[WARN] Skipping re-rank: scoring {min_docs} docs would exceed "
+                f"the {self.budget * 1000:.0f}ms budget"
+            )
+            return None
+
+        missing = [position for position in range(head) if scores[position] is None]
+        if missing:
+            start = time.perf_counter()
+            predicted = self.model.predict(
+                [(query, docs[position]["text"]) for position in missing],
+                batch_size=len(missing),
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+            self._record(len(missing), time.perf_counter() - start)
+
+            for position, score in zip(missing, predicted):
+                scores[position] = float(score)
+                self._scores.set((key, _doc_key(docs[position])), float(score))
+
+        with self._lock:
+            self.reranked += 1
+        reranked = sorted(
+            (
+                {**doc, "retrieval_score": doc["score"], "score": scores[position]}
+                for position, doc in enumerate(docs[:head])
+            ),
+            key=lambda doc: -doc["score"],
+        )
+        # Unscored docs follow in retriever order. They take the lowest
+        # cross-encoder score, so consumers that compare or normalise "score"
+        # (MMR in the context packer) never rank a cosine above a logit.
+        floor = reranked[-1]["score"]
+        return reranked + [
+            {**doc, "retrieval_score": doc["score"], "score": floor}
+            for doc in docs[head:]
+        ]
+
+    def clear_cache(self) -> None:
+        # Cached scores are keyed by passage id, which a rebuilt index may
+        # give to a different passage.
+        self._scores.clear()
+
+    def warm_up(self) -> None:
+        # Also seeds the per-pair cost estimate used by the budget check.
+        pairs = [("headache and fever", "Fever: high body temperature.")] * 4
+        start = time.perf_counter()
+        self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        self._record(len(pairs), time.perf_counter() - start)
+
+    def _record(self, pairs: int, seconds: float) -> None:
+        per_pair = seconds / pairs
+        with self._lock:
+            if self._seconds_per_pair is None:
+                self._seconds_per_pair = per_pair
+            else:
+                self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * per_pair
+            if seconds > self.budget:
+                self.over_budget += 1
+
+    def stats(self) -> dict:
+        return {
+            "reranked": self.reranked,
+            "skipped": self.skipped,
+            "over_budget": self.over_budget,
+            "ms_per_pair": (
+                round(self._seconds_per_pair * 1000, 3)
+                if self._seconds_per_pair is not None
+                else None
+            ),
+            "score_cache": self._scores.stats(),
+        }
+
+
+def _doc_key(doc: dict) -> int:
+    return doc.get("passage_id", doc["original_id"])
+
+
+def get_reranker() -> Reranker:
+    global _reranker
+    if _reranker is None:
+        _reranker = Reranker(
+            get_cross_encoder(),
+            settings.RERANK_BUDGET_MS,
+            settings.RERANK_CACHE_SIZE,
+            settings.RAG_CACHE_TTL_SECONDS,
+        )
+    return _reranker
+
+
+def clear_rerank_cache() -> None:
+    if _reranker is not None:
+        _reranker.clear_cache()
+
+
+def reranker_stats() -> Optional[dict]:
+    return _reranker.stats() if _reranker is not None else None
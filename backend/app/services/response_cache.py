@@ -0,0 +1,141 @@
+import time
+import threading
+import faiss
+import numpy as np
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from app.core.logging import logger
+from app.core.config import settings
+
+
+# Candidates inspected per lookup; the nearest hit may be expired or belong to
+# a different scope (e.g. another k), so look a little further than top-1.
+LOOKUP_CANDIDATES = 8
+
+
+class SemanticResponseCache:
+    """
+    Near-duplicate cache of first-turn chat responses.
+
+    Each entry is the normalised message embedding of a first-turn request
+    and the chat result the model gave for it. A lookup is a hit when a live
+    entry with the same scope has cosine similarity >= `threshold`. Entries
+    expire after `ttl_seconds`; past `max_size` the least recently used entry
+    is evicted from both the LRU list and the FAISS index.
+    """
+
+    def __init__(self, threshold: float, max_size: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._index = None
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, vector: np.ndarray, scope: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            k = min(LOOKUP_CANDIDATES, self._index.ntotal)
+            scores, ids = self._index.search(_as_query(vector), k)
+
+            now = time.monotonic()
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id == -1 or score < self.threshold:
+                    break
+                entry_id = int(entry_id)
+                expires_at, entry_scope, result = self._entries[entry_id]
+                if expires_at < now:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                if entry_scope != scope:
+                    continue
+
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                logger.info(f"[INFO] Semantic cache hit (similarity {score:.3f})")
+                return dict(result)
+
+            self.misses += 1
+            return None
+
+    def store(self, vector: np.ndarray, scope: Hashable, result: Dict[str, Any]):
+        if self.max_size <= 0:
+            return
+
+        query = _as_query(vector)
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(query.shape[1]))
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(query, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (
+                time.monotonic() + self.ttl_seconds,
+                scope,
+                dict(result),
+            )
+            self.stores += 1
+
+            while len(self._entries) > self.max_size:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.reset()
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, entry_id: int) -> None:
+        self._entries.pop(entry_id, None)
+        self._index.remove_ids(np.array([entry_id], dtype=np.int64))
+
+
+def _as_query(vector: np.ndarray) -> np.ndarray:
+    query = np.array(vector, dtype="float32", copy=True).reshape(1, -1)
+    faiss.normalize_L2(query)
+    return query
+
+
+_response_cache = None
+
+
+def get_response_cache() -> Optional[SemanticResponseCache]:
+    global _response_cache
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = SemanticResponseCache(
+            settings.RESPONSE_CACHE_THRESHOLD,
+            settings.RESPONSE_CACHE_SIZE,
+            settings.RESPONSE_CACHE_TTL_SECONDS,
+        )
+    return _response_cache
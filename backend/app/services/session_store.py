@@ -0,0 +1,156 @@
+import json
+import uuid
+import threading
+
+from typing import Any, Dict, List, Optional
+from app.core.logging import logger
+from app.core.config import settings
+from app.domain.models import ChatMessage
+from app.utils.cache import TTLCache
+
+
+class InMemorySessionStore:
+    """
+    Per-process session store: an LRU of sessions bounded by `max_sessions`
+    and by `max_bytes` (estimated from message and state sizes), each
+    expiring `ttl_seconds` after its last turn. Messages are kept as
+    validated ChatMessage objects, so nothing is re-parsed between turns.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        ttl_seconds: float,
+        max_messages: int,
+        max_bytes: Optional[int] = None,
+    ):
+        self.max_messages = max_messages
+        # session id -> (messages, state)
+        self._sessions = TTLCache(
+            max_sessions, ttl_seconds, max_weight=max_bytes, weigh=_session_bytes
+        )
+        self._lock = threading.Lock()
+
+    def create(self, messages: List[ChatMessage]) -> str:
+        session_id = uuid.uuid4().hex
+        self._sessions.set(session_id, (list(messages[-self.max_messages :]), None))
+        return session_id
+
+    def get(self, session_id: str) -> Optional[List[ChatMessage]]:
+        session = self._sessions.get(session_id)
+        return None if session is None else list(session[0])
+
+    def append(self, session_id: str, messages: List[ChatMessage]) -> None:
+        with self._lock:
+            current, state = self._sessions.get(session_id) or ([], None)
+            # Re-setting also restarts the TTL: sessions expire after inactivity.
+            self._sessions.set(
+                session_id, ((current + list(messages))[-self.max_messages :], state)
+            )
+
+    def get_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self._sessions.get(session_id)
+        return None if session is None else session[1]
+
+    def set_state(self, session_id: str, state: Dict[str, Any]) -> None:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.set(session_id, (session[0], state))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._sessions.stats()}
+
+
+def _session_bytes(session) -> int:
+    messages, state = session
+    size = sum(len(message.content) for message in messages)
+    return size + (len(json.dumps(state)) if state is not None else 0)
+
+
+class RedisSessionStore:
+    """
+    Session store on any Redis-compatible server, shared by every worker.
+
+    Each session is a list of JSON messages under `<prefix><session_id>`;
+    a turn is one RPUSH + LTRIM + EXPIRE pipeline, so only the new messages
+    travel over the wire. Per-session state (e.g. retrieval state) is a JSON
+    string under `<prefix><session_id>:state`.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl_seconds: float,
+        max_messages: int,
+        prefix: str = "session:",
+    ):
+        self.client = client
+        self.ttl_seconds = int(ttl_seconds)
+        self.max_messages = max_messages
+        self.prefix = prefix
+
+    def create(self, messages: List[ChatMessage]) -> str:
+        # Sessions are created after their first turn, so never empty (Redis
+        # has no empty lists).
+        session_id = uuid.uuid4().hex
+        self._push(session_id, messages)
+        return session_id
+
+    def get(self, session_id: str) -> Optional[List[ChatMessage]]:
+        raw = self.client.lrange(self._key(session_id), 0, -1)
+        if not raw:
+            return None
+        return [ChatMessage.model_validate_json(item) for item in raw]
+
+    def append(self, session_id: str, messages: List[ChatMessage]) -> None:
+        self._push(session_id, messages)
+
+    def get_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(self._key(session_id, "state"))
+        return None if raw is None else json.loads(raw)
+
+    def set_state(self, session_id: str, state: Dict[str, Any]) -> None:
+        self.client.set(
+            self._key(session_id, "state"), json.dumps(state), ex=self.ttl_seconds
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "ttl_seconds": self.ttl_seconds}
+
+    def _push(self, session_id: str, messages: List[ChatMessage]) -> None:
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, *(message.model_dump_json() for message in messages))
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def _key(self, session_id: str, suffix: str = "") -> str:
+        key = f"{self.prefix}{session_id}"
+        return f"{key}:{suffix}" if suffix else key
+
+
+_session_store = None
+
+
+def get_session_store():
+    global _session_store
+    if _session_store is None:
+        if settings.SESSION_BACKEND == "redis":
+            import redis
+
+            logger.info("[INFO] Using Redis session store")
+            _session_store = RedisSessionStore(
+                redis.Redis.from_url(settings.SESSION_REDIS_URL),
+                settings.SESSION_TTL_SECONDS,
+                settings.SESSION_MAX_MESSAGES,
+            )
+        else:
+            _session_store = InMemorySessionStore(
+                settings.SESSION_MAX_SESSIONS,
+                settings.SESSION_TTL_SECONDS,
+                settings.SESSION_MAX_MESSAGES,
+                settings.SESSION_MAX_BYTES,
+            )
+    return _session_store
@@ -0,0 +1,233 @@
+import os
+import re
+import json
+import threading
+import numpy as np
+
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.core.logging import logger
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Function words that carry no lexical signal; medical terms are never dropped.
+STOPWORDS = frozenset(
+    "a about after all also an and any are as at be been before being but by "
+    "can could did do does for from had has have how i if in into is it its "
+    "me my no not of on or our so some than that the their them then there "
+    "these they this those to too very was we were what when where which who "
+    "why will with would you your".split()
+)
+
+PARAMS_FILE = "bm25.json"
+INDPTR_FILE = "indptr.npy"
+POSTINGS_FILE = "postings.npy"
+WEIGHTS_FILE = "weights.npy"
+IDS_FILE = "ids.npy"
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(str(text).lower())
+        if token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Read-only Okapi BM25 index backed by memory-mapped numpy arrays.
+
+    Postings are stored term-major (CSR over terms): the documents containing
+    term t are postings[indptr[t]:indptr[t + 1]], and weights holds the
+    precomputed BM25 contribution of t to each of them. A query is therefore
+    a sum of a few contiguous slices, with no per-query length normalisation.
+    Document positions map to the same int64 ids the FAISS index uses.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.params: Dict = {}
+        self._terms: Dict[str, int] = {}
+        self._indptr = None
+        self._postings = None
+        self._weights = None
+        self._ids = None
+        # Largest weight of each term over all documents.
+        self._max_weights = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, PARAMS_FILE))
+
+    def open(self) -> "BM25Index":
+        if not self.exists(self.path):
+            raise FileNotFoundError(f"BM25 index missing ({self.path})")
+
+        with open(os.path.join(self.path, PARAMS_FILE), "r", encoding="utf-8") as f:
+            params = json.load(f)
+
+        with self._lock:
+            self._terms = {term: row for row, term in enumerate(params.pop("terms"))}
+            self.params = params
+            self._indptr = self._load(INDPTR_FILE)
+            self._postings = self._load(POSTINGS_FILE)
+            self._weights = self._load(WEIGHTS_FILE)
+            self._ids = self._load(IDS_FILE)
+            self._max_weights = (
+                np.maximum.reduceat(self._weights, self._indptr[:-1])
+                if len(self._terms)
+                else np.empty(0, dtype="float32")
+            )
+
+        logger.info(
+            f"[INFO] Opened BM25 index with {len(self)} docs and "
+            f"{len(self._terms)} terms"
+        )
+        return self
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return 0 if self._ids is None else len(self._ids)
+
+    def max_score(self, text: str) -> float:
+        """
+        Upper bound on any document's score for `text`: a document holding
+        every query term at its best weight. Dividing by it gives a score in
+        [0, 1] that is comparable across queries. Query words the corpus lacks
+        count as a term found in a single document, so a match on the one
+        known word of a mostly unknown query does not look complete.
+        """
+        if self._max_weights is None:
+            return 0.0
+        num_docs, k1 = self.params["num_docs"], self.params["k1"]
+        unseen = np.log1p((num_docs - 0.5) / 1.5) * (k1 + 1)
+        return float(
+            sum(
+                (
+                    self._max_weights[self._terms[token]]
+                    if token in self._terms
+                    else unseen
+                )
+                for token in tokenize(text)
+            )
+        )
+
+    def search(self, text: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (scores, ids) of the top k documents, best first.
+
+        Only documents sharing at least one term with the query are returned,
+        so the result may be shorter than k.
+        """
+        empty = (np.empty(0, dtype="float32"), np.empty(0, dtype=np.int64))
+        if not len(self) or k <= 0:
+            return empty
+
+        query_terms = Counter(
+            self._terms[token] for token in tokenize(text) if token in self._terms
+        )
+        if not query_terms:
+            return empty
+
+        scores = np.zeros(len(self), dtype="float32")
+        for row, count in query_terms.items():
+            start, end = int(self._indptr[row]), int(self._indptr[row + 1])
+            scores[self._postings[start:end]] += count * self._weights[start:end]
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return scores[order], np.asarray(self._ids[order], dtype=np.int64)
+
+
+def build_bm25_index(
+    texts: Sequence[str],
+    ids: Sequence[int],
+    path: str,
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> int:
+    """
+    Tokenises `texts` and writes a BM25Index to the `path` directory.
+
+    Returns the vocabulary size.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(ids) != len(texts):
+        raise ValueError(f"Got {len(texts)} texts but {len(ids)} ids")
+
+    vocabulary: Dict[str, int] = {}
+    term_rows, doc_positions, term_freqs = [], [], []
+    doc_lengths = np.zeros(len(texts), dtype="float32")
+
+    for position, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lengths[position] = len(tokens)
+        for term, freq in Counter(tokens).items():
+            term_rows.append(vocabulary.setdefault(term, len(vocabulary)))
+            doc_positions.append(position)
+            term_freqs.append(freq)
+
+    term_rows = np.asarray(term_rows, dtype=np.int64)
+    doc_positions = np.asarray(doc_positions, dtype=np.int32)
+    term_freqs = np.asarray(term_freqs, dtype="float32")
+
+    num_docs = len(texts)
+    avgdl = float(doc_lengths.mean()) if num_docs else 0.0
+    doc_freqs = np.bincount(term_rows, minlength=len(vocabulary))
+    idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+    norm = k1 * (1 - b + b * doc_lengths[doc_positions] / max(avgdl, 1e-9))
+    weights = idf[term_rows] * term_freqs * (k1 + 1) / (term_freqs + norm)
+
+    order = np.argsort(term_rows, kind="stable")
+    indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(doc_freqs, out=indptr[1:])
+
+    os.makedirs(path, exist_ok=True)
+    _save(path, INDPTR_FILE, indptr)
+    _save(path, POSTINGS_FILE, doc_positions[order])
+    _save(path, WEIGHTS_FILE, weights[order].astype("float32"))
+    _save(path, IDS_FILE, ids)
+
+    terms = sorted(vocabulary, key=vocabulary.get)
+    with open(os.path.join(path, PARAMS_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {"k1": k1, "b": b, "num_docs": num_docs, "avgdl": avgdl, "terms": terms},
+            f,
+            ensure_ascii=False,
+        )
+
+    return len(vocabulary)
+
+
+def _save(path: str, name: str, array: np.ndarray) -> None:
+    with open(os.path.join(path, name), "wb") as f:
+        np.save(f, array)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], k: int, rrf_k: int = 60
+) -> List[Tuple[int, float]]:
+    """
+    Fuses ranked id lists into one: score(d) = sum 1 / (rrf_k + rank_d).
+
+    Returns up to k (id, score) pairs, best first; ties keep the order in
+    which ids first appear.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])[:k]
+
+
+def open_bm25_index(path: str) -> Optional[BM25Index]:
+    if not BM25Index.exists(path):
+        return None
+    return BM25Index(path).open()
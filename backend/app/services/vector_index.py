@@ -0,0 +1,225 @@
+import os
+import json
+import math
+import faiss
+import numpy as np
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+from app.core.logging import logger
+from app.core.config import settings
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# Search-time parameters each index type understands (faiss.ParameterSpace names).
+SEARCH_PARAM_NAMES = {
+    "flat": (),
+    "hnsw": ("efSearch",),
+    "ivf_flat": ("nprobe",),
+    "ivf_pq": ("nprobe",),
+}
+
+
+def build_index(
+    embeddings: np.ndarray,
+    index_type: str = None,
+    ids: Optional[np.ndarray] = None,
+) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """
+    Creates, trains and fills a FAISS index of the configured type.
+
+    Vectors are L2-normalised and indexed by inner product, so search scores
+    are cosine similarities in [-1, 1]. Every vector is stored under an
+    explicit int64 id (defaults to its row number), which is what search
+    returns and what remove_vectors() takes.
+
+    Returns the index together with the parameters that must be persisted
+    next to it so the loader can restore the same search behaviour.
+    """
+    index_type = (index_type or settings.RAG_INDEX_TYPE).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"Unknown RAG_INDEX_TYPE '{index_type}'. Expected one of {INDEX_TYPES}"
+        )
+
+    embeddings = np.array(embeddings, dtype="float32", copy=True)
+    faiss.normalize_L2(embeddings)
+    count, dimension = embeddings.shape
+
+    description = _index_description(index_type, count, dimension)
+    logger.info(f"[INFO] Building FAISS index '{description}' for {count} vectors")
+
+    index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+
+    if index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = (
+            settings.RAG_HNSW_EF_CONSTRUCTION
+        )
+
+    if not index.is_trained:
+        logger.info(f"[INFO] Training {index_type} index on {count} vectors...")
+        index.train(embeddings)
+    _ensure_direct_map(index)
+
+    if ids is None:
+        ids = np.arange(count)
+    index.add_with_ids(embeddings, np.asarray(ids, dtype=np.int64))
+
+    params = {
+        "index_type": index_type,
+        "description": description,
+        "metric": "ip",
+        "dimension": dimension,
+        "search": _default_search_params(index_type),
+    }
+    apply_search_params(index, params)
+    return index, params
+
+
+def add_vectors(index: faiss.Index, embeddings: np.ndarray, ids: np.ndarray) -> None:
+    embeddings = np.array(embeddings, dtype="float32", copy=True)
+    faiss.normalize_L2(embeddings)
+    index.add_with_ids(embeddings, np.asarray(ids, dtype=np.int64))
+
+
+def remove_vectors(index: faiss.Index, ids: Iterable[int]) -> int:
+    ids = np.fromiter(ids, dtype=np.int64)
+    if ids.size == 0:
+        return 0
+    return _remove_id_array(index, ids)
+
+
+def remove_id_ranges(index: faiss.Index, ranges: Iterable[Tuple[int, int]]) -> int:
+    """Removes every vector whose id falls in one of the [start, end) ranges."""
+    ranges = list(ranges)
+    if _ivf(index) is not None:
+        # The hashed direct map can only remove an explicit list of ids.
+        ids = [np.arange(start, end, dtype=np.int64) for start, end in ranges]
+        return _remove_id_array(index, np.concatenate(ids)) if ids else 0
+
+    removed = 0
+    for start, end in ranges:
+        removed += int(index.remove_ids(faiss.IDSelectorRange(start, end)))
+    return removed
+
+
+def _remove_id_array(index: faiss.Index, ids: np.ndarray) -> int:
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    return int(index.remove_ids(faiss.IDSelectorArray(len(ids), faiss.swig_ptr(ids))))
+
+
+def _ivf(index: faiss.Index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+
+def _ensure_direct_map(index: faiss.Index) -> None:
+    # IVF lists cannot look a vector up by id without a direct map, which
+    # reconstruct() (doc_vectors) needs. Passage ids are sparse
+    # (topic * 1000 + n), so it is a hash table rather than an array.
+    ivf = _ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+
+def supports_removal(params: Dict[str, Any]) -> bool:
+    # HNSW graphs cannot delete nodes, and indexes built before ids were
+    # introduced address vectors by position only.
+    description = params.get("description", "")
+    if params.get("index_type") == "hnsw":
+        return False
+    return description.startswith("IDMap2,") or description.startswith("IVF")
+
+
+def apply_search_params(index: faiss.Index, params: Dict[str, Any]) -> None:
+    search = params.get("search") or {}
+    if not search:
+        return
+
+    parameter_space = faiss.ParameterSpace()
+    for name, value in search.items():
+        parameter_space.set_index_parameter(index, name, value)
+    logger.info(f"[INFO] Applied FAISS search params: {search}")
+
+
+def save_index(
+    index: faiss.Index, params: Dict[str, Any], index_path: str, params_path: str
+) -> None:
+    faiss.write_index(index, str(index_path))
+
+    with open(params_path, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+
+
+def load_index(
+    index_path: str, params_path: str, use_mmap: bool = False
+) -> Tuple[faiss.Index, Dict]:
+    index = _read_index(index_path, use_mmap)
+    # Indexes saved before the direct map was added get it on load.
+    _ensure_direct_map(index)
+
+    params = {"index_type": "flat", "metric": "l2", "search": {}}
+    if os.path.exists(params_path):
+        with open(params_path, "r", encoding="utf-8") as f:
+            params = json.load(f)
+    else:
+        logger.warning(
+            f"[WARN] No index params at {params_path}, using defaults for a flat index."
+        )
+
+    apply_search_params(index, params)
+    return index, params
+
+
+def _read_index(index_path: str, use_mmap: bool) -> faiss.Index:
+    if use_mmap:
+        try:
+            # Memory-mapped and read-only: worker processes share the pages
+            # instead of each holding a private copy of the vectors.
+            return faiss.read_index(
+                str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+        except RuntimeError as e:
+            logger.warning(f"[WARN] mmap load failed ({e}), reading index into RAM")
+    return faiss.read_index(str(index_path))
+
+
+def _index_description(index_type: str, count: int, dimension: int) -> str:
+    # Flat and HNSW are wrapped in an id map; IVF indexes store ids natively
+    # (wrapping them would break remove_ids, which does not renumber IVF lists).
+    if index_type == "flat":
+        return "IDMap2,Flat"
+
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{settings.RAG_HNSW_M}"
+
+    nlist = settings.RAG_IVF_NLIST or _auto_nlist(count)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+
+    if dimension % settings.RAG_PQ_M != 0:
+        raise ValueError(
+            f"RAG_PQ_M={settings.RAG_PQ_M} must divide the embedding dimension {dimension}"
+        )
+
+    nbits = min(settings.RAG_PQ_NBITS, int(math.log2(max(count, 2))))
+    if nbits < settings.RAG_PQ_NBITS:
+        logger.warning(
+            f"[WARN] Only {count} vectors to train PQ, reducing nbits "
+            f"{settings.RAG_PQ_NBITS} -> {nbits}"
+        )
+    return f"IVF{nlist},PQ{settings.RAG_PQ_M}x{nbits}"
+
+
+def _auto_nlist(count: int) -> int:
+    # ~4*sqrt(n) lists, while keeping at least 39 training points per list.
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+def _default_search_params(index_type: str) -> Dict[str, int]:
+    defaults = {
+        "efSearch": settings.RAG_HNSW_EF_SEARCH,
+        "nprobe": settings.RAG_IVF_NPROBE,
+    }
+    return {name: defaults[name] for name in SEARCH_PARAM_NAMES[index_type]}
@@ -0,0 +1,154 @@
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from app.core.logging import logger
+from app.core.config import settings
+
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Readiness:
+    """Thread-safe load status of every component preloaded at startup."""
+
+    def __init__(self):
+        self._components: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def reset(self, names: List[str]) -> None:
+        with self._lock:
+            self._components = {
+                name: {"status": PENDING, "load_seconds": None, "error": None}
+                for name in names
+            }
+
+    def run(self, name: str, loader: Callable[[], None]) -> None:
+        self._update(name, status=LOADING)
+        start = time.perf_counter()
+        try:
+            loader()
+        except Exception as e:
+            logger.error(f"[ERROR] Preloading {name} failed: {e}")
+            self._update(
+                name,
+                status=FAILED,
+                load_seconds=round(time.perf_counter() - start, 3),
+                error=str(e),
+            )
+            return
+
+        seconds = round(time.perf_counter() - start, 3)
+        logger.info(f"[INFO] Preloaded {name} in {seconds:.2f}s")
+        self._update(name, status=READY, load_seconds=seconds)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            components = {name: dict(c) for name, c in self._components.items()}
+        return {
+            "ready": all(c["status"] == READY for c in components.values()),
+            "components": components,
+        }
+
+    def _update(self, name: str, **fields) -> None:
+        with self._lock:
+            self._components.setdefault(name, {}).update(fields)
+
+
+readiness = Readiness()
+
+
+def _load_embedding_model() -> None:
+    from app.services.rag_service import get_embedding_model
+
+    model = get_embedding_model()
+    model.encode(["warm-up"], convert_to_numpy=True, normalize_embeddings=True)
+
+
+def _load_context_tokenizers() -> None:
+    from app.services.context_packer import load_context_tokenizer
+
+    load_context_tokenizer(settings.MODEL_NAME)
+    if settings.PRELOAD_LOCAL_MODEL:
+        load_context_tokenizer(settings.LOCAL_MODEL_NAME)
+
+
+def _load_rag_index() -> None:
+    from app.services.rag_service import get_embedding_model, get_rag_service
+
+    rag = get_rag_service()
+    if rag.index is None:
+        raise RuntimeError("RAG index not loaded. Run the ETL script.")
+
+    query = get_embedding_model().encode(
+        ["headache and fever"], convert_to_numpy=True, normalize_embeddings=True
+    )
+    rag.index.search(query, 1)
+
+
+def _load_jailbreak_index() -> None:
+    from app.utils.guardrails import get_jailbreak_bank
+
+    get_jailbreak_bank().ensure_loaded()
+
+
+def _load_reranker() -> None:
+    from app.services.reranker import get_reranker
+
+    get_reranker().warm_up()
+
+
+def _load_local_generator() -> None:
+    from app.services.llm_service import _get_local_generator
+
+    _get_local_generator()
+
+
+def _preload_stages() -> List[Dict[str, Callable[[], None]]]:
+    # Components in a stage are independent of each other; later stages need
+    # the embedding model from the first one.
+    first = {
+        "embedding_model": _load_embedding_model,
+        "context_tokenizer": _load_context_tokenizers,
+    }
+    if settings.PRELOAD_LOCAL_MODEL:
+        first["local_generator"] = _load_local_generator
+
+    second = {
+        "rag_index": _load_rag_index,
+        "jailbreak_index": _load_jailbreak_index,
+    }
+    if settings.RERANK_ENABLED:
+        second["reranker"] = _load_reranker
+
+    return [first, second]
+
+
+def preload_component_names() -> List[str]:
+    return [name for stage in _preload_stages() for name in stage]
+
+
+def preload_components(parallel: Optional[bool] = None) -> Dict[str, Any]:
+    """Loads and warms up every configured component, returning the report."""
+    parallel = settings.PRELOAD_PARALLEL if parallel is None else parallel
+    stages = _preload_stages()
+    readiness.reset(preload_component_names())
+
+    start = time.perf_counter()
+    for stage in stages:
+        if parallel and len(stage) > 1:
+            with ThreadPoolExecutor(
+                max_workers=len(stage), thread_name_prefix="preload"
+            ) as pool:
+                for name, loader in stage.items():
+                    pool.submit(readiness.run, name, loader)
+        else:
+            for name, loader in stage.items():
+                readiness.run(name, loader)
+
+    logger.info(f"[INFO] Preloading finished in {time.perf_counter() - start:.2f}s")
+    return readiness.report()
@@ -0,0 +1,106 @@
+import time
+import threading
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    `get` returns None on a miss, so None itself cannot be cached. A
+    `max_size` of 0 disables the cache (every lookup is a miss).
+
+    With `weigh` (e.g. a value's size in bytes) and `max_weight`, least
+    recently used entries are also evicted while the total weight is over
+    `max_weight`.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        max_weight: Optional[int] = None,
+        weigh: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value, weight = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.weight -= weight
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+
+        weight = self.weigh(value) if self.weigh is not None else 0
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                self.weight -= previous[2]
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, weight)
+            self._entries.move_to_end(key)
+            self.weight += weight
+            while len(self._entries) > self.max_size or (
+                self.max_weight is not None
+                and self.weight > self.max_weight
+                and len(self._entries) > 1
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self.weight -= evicted[2]
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                **(
+                    {"weight": self.weight, "max_weight": self.max_weight}
+                    if self.max_weight is not None
+                    else {}
+                ),
+            }
+
+
+def normalize_cache_text(text: str) -> str:
+    # Case and whitespace differences ("My stomach  hurts" vs "my stomach
+    # hurts") should hit the same entry; the embedding model is uncased.
+    return " ".join(text.lower().split())
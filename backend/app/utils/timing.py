@@ -0,0 +1,46 @@
+import time
+
+from typing import Awaitable, Dict, TypeVar
+
+
+T = TypeVar("T")
+
+
+class StageTimings:
+    """
+    Wall-clock durations of the stages of one request.
+
+    Stages may overlap, so the sum of all stages ("sequential") minus the time
+    elapsed since creation ("total") is the latency saved by running them
+    concurrently.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    async def track(self, name: str, awaitable: Awaitable[T]) -> T:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stages[name] = (time.perf_counter() - start) * 1000
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def summary(self) -> Dict[str, float]:
+        total = self.total_ms()
+        sequential = sum(self.stages.values())
+        return {
+            **{name: round(ms, 1) for name, ms in self.stages.items()},
+            "total": round(total, 1),
+            "sequential": round(sequential, 1),
+            "saved": round(max(sequential - total, 0.0), 1),
+        }
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header."""
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
@@ -1,13 +1,90 @@
-import concurrent.futures
+import time
 import asyncio
+import threading
+import functools
 
-from typing import Type, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Type, Dict, Any, Optional
 from pydantic import BaseModel, ValidationError
 from app.core.logging import logger
+from app.core.config import settings
 from app.domain.models import ResponseArgs
 
 
-async def execute_tool(name: str, arguments: dict, timeout: int = 3):
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(
+                    max_workers=settings.TOOL_MAX_WORKERS, thread_name_prefix="tool"
+                )
+    return _tool_executor
+
+
+def shutdown_tool_executor() -> None:
+    global _tool_executor
+    if _tool_executor is not None:
+        _tool_executor.shutdown(wait=False, cancel_futures=True)
+        _tool_executor = None
+
+
+class ToolMetrics:
+    """Per-tool call, error and timeout counters with latency totals."""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, outcome: str) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(
+                name,
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "timeouts": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                },
+            )
+            stats["calls"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if outcome == "timeout":
+                stats["timeouts"] += 1
+            elif outcome == "error":
+                stats["errors"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "timeouts": stats["timeouts"],
+                    "avg_ms": round(stats["total_seconds"] * 1000 / stats["calls"], 2),
+                    "max_ms": round(stats["max_seconds"] * 1000, 2),
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+tool_metrics = ToolMetrics()
+
+
+async def execute_tool(name: str, arguments: dict, timeout: Optional[float] = None):
+    """
+    Runs a registered tool once on the shared tool executor.
+
+    The timeout defaults to the tool's "timeout" entry in TOOLS. A timed-out
+    call is reported as {"error": "timeout"}; its worker thread cannot be
+    interrupted and finishes in the background.
+    """
     if name not in TOOLS:
         return {"error": "tool_not_allowed"}
 
@@ -18,17 +95,25 @@ async def execute_tool(name: str, arguments: dict, timeout: int = 3):
     except Exception as e:
         return {"error": "validation_error", "details": str(e)}
 
-    impl = tool["implementation"]
+    impl = functools.partial(tool["implementation"], **validated.model_dump())
+    timeout = timeout or tool.get("timeout", settings.TOOL_DEFAULT_TIMEOUT_SECONDS)
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(
+            loop.run_in_executor(get_tool_executor(), impl), timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        tool_metrics.record(name, time.perf_counter() - start, "timeout")
+        logger.error(f"[ERROR] Tool {name} timed out after {timeout}s")
+        return {"error": "timeout"}
+    except Exception as e:
+        tool_metrics.record(name, time.perf_counter() - start, "error")
+        return {"error": "tool_failed", "details": str(e)}
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        executor.submit(lambda: impl(**validated.dict()))
-        try:
-            result = await asyncio.to_thread(impl, **validated.dict())
-            return {"ok": True, "result": result}
-        except concurrent.futures.TimeoutError:
-            return {"error": "timeout"}
-        except Exception as e:
-            return {"error": "tool_failed", "details": str(e)}
+    tool_metrics.record(name, time.perf_counter() - start, "ok")
+    return {"ok": True, "result": result}
 
 
 def provide_response_implementation(**kwargs) -> Dict[str, Any]:
@@ -94,5 +179,6 @@ TOOLS = {
         ),
         "args_schema": ResponseArgs,
         "implementation": provide_response_implementation,
+        "timeout": 3.0,
     },
 }
@@ -0,0 +1,88 @@
+import argparse
+import time
+
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.services.rag_service import EmbeddingBatcher, get_embedding_model
+
+CONCURRENCY_LEVELS = (1, 8, 32, 128)
+REQUESTS_PER_LEVEL = 512
+
+MESSAGES = [
+    "I have had a severe headache and fever for {} days.",
+    "My stomach hurts {} hours after eating, what could it be?",
+    "There is a red itchy rash on my forearm, about {} cm wide.",
+    "I feel dizzy when I stand up quickly, {} times a day.",
+]
+
+
+def _texts(count: int):
+    # Unique texts so nothing is served from a cache.
+    return [MESSAGES[i % len(MESSAGES)].format(i) for i in range(count)]
+
+
+def _run(batcher: EmbeddingBatcher, concurrency: int, texts):
+    latencies = []
+
+    def call(text):
+        start = time.perf_counter()
+        batcher.encode(text)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, texts))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": len(texts) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "avg_batch": batcher.stats()["avg_batch_size"] or 1.0,
+    }
+
+
+def run_benchmark(levels=CONCURRENCY_LEVELS, requests_per_level=REQUESTS_PER_LEVEL):
+    print(
+        f"🚀 Embedding batching benchmark ({settings.EMBEDDING_MODEL_NAME}, "
+        f"max_batch={settings.EMBEDDING_BATCH_MAX_SIZE}, "
+        f"max_wait={settings.EMBEDDING_BATCH_MAX_WAIT_MS}ms)"
+    )
+    get_embedding_model().encode(["warm-up"], convert_to_numpy=True)
+    texts = _texts(requests_per_level)
+
+    print(
+        f"\n{'Callers':>8}{'Mode':>10}{'req/s':>10}{'p50 ms':>10}"
+        f"{'p95 ms':>10}{'avg batch':>11}"
+    )
+    for concurrency in levels:
+        for mode, batcher in (
+            ("single", EmbeddingBatcher(max_batch=1, max_wait_ms=0)),
+            (
+                "batched",
+                EmbeddingBatcher(
+                    settings.EMBEDDING_BATCH_MAX_SIZE,
+                    settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+                ),
+            ),
+        ):
+            r = _run(batcher, concurrency, texts)
+            print(
+                f"{concurrency:>8}{mode:>10}{r['throughput']:>10.1f}"
+                f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['avg_batch']:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Throughput of batched vs single embedding calls under concurrency."
+    )
+    parser.add_argument(
+        "--callers", type=int, nargs="+", default=list(CONCURRENCY_LEVELS)
+    )
+    parser.add_argument("--requests", type=int, default=REQUESTS_PER_LEVEL)
+    args = parser.parse_args()
+
+    run_benchmark(tuple(args.callers), args.requests)
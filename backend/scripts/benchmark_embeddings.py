@@ -0,0 +1,114 @@
+import time
+import statistics
+
+from app.core.config import settings
+from app.services import rag_service
+from app.services.rag_service import get_embedding_model, get_rag_service, EmbeddingContext
+from app.utils.guardrails import guard_input, get_jailbreak_bank
+
+
+MESSAGES = [
+    "I have had a severe headache and fever for 2 days.",
+    "My stomach hurts after eating, what could it be?",
+    "There is a red itchy rash on my forearm since yesterday.",
+    "I feel dizzy when I stand up quickly.",
+]
+ROUNDS = 25
+K = 5
+
+
+class _EncodeCounter:
+    def __init__(self, model):
+        self.model = model
+        self.original_encode = model.encode
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        def counted_encode(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return self.original_encode(*args, **kwargs)
+            finally:
+                self.calls += 1
+                self.seconds += time.perf_counter() - start
+
+        self.model.encode = counted_encode
+        return self
+
+    def __exit__(self, *exc):
+        self.model.encode = self.original_encode
+
+
+def _own_embedding(message: str) -> EmbeddingContext:
+    # What each consumer did before: encode the message itself, bypassing the
+    # shared per-text cache.
+    vector = get_embedding_model().encode(
+        [message], convert_to_numpy=True, normalize_embeddings=True
+    )
+    return EmbeddingContext(message, vector=vector.astype("float32"))
+
+
+def _legacy_request(rag, message: str):
+    guard_input(message, embedding=_own_embedding(message))
+    rag.query(message, k=K, embedding=_own_embedding(message))
+
+
+def _shared_request(rag, message: str):
+    embedding = EmbeddingContext(message)
+    guard_input(message, embedding=embedding)
+    rag.query(message, k=K, embedding=embedding)
+
+
+def _run(name: str, request_fn, rag, model):
+    latencies = []
+    with _EncodeCounter(model) as counter:
+        for _ in range(ROUNDS):
+            for message in MESSAGES:
+                # Otherwise every repeat is served from the embedding and
+                # retrieval caches: measure cold requests only.
+                rag_service._embedding_cache.clear()
+                rag._retrieval_cache.clear()
+                start = time.perf_counter()
+                request_fn(rag, message)
+                latencies.append(time.perf_counter() - start)
+
+    requests_count = len(latencies)
+    return {
+        "name": name,
+        "encodes_per_request": counter.calls / requests_count,
+        "embed_ms_per_request": counter.seconds * 1000 / requests_count,
+        "p50_ms": statistics.median(latencies) * 1000,
+    }
+
+
+def run_benchmark():
+    print(f"🚀 Embedding benchmark ({settings.EMBEDDING_MODEL_NAME})")
+
+    model = get_embedding_model()
+    rag = get_rag_service()
+    get_jailbreak_bank().ensure_loaded()
+    model.encode(["warm-up"], convert_to_numpy=True)
+
+    results = [
+        _run("legacy (encode per consumer)", _legacy_request, rag, model),
+        _run("shared EmbeddingContext", _shared_request, rag, model),
+    ]
+
+    print(f"\n{'Path':<32}{'encodes/req':>12}{'embed ms/req':>14}{'p50 ms':>10}")
+    for r in results:
+        print(
+            f"{r['name']:<32}{r['encodes_per_request']:>12.2f}"
+            f"{r['embed_ms_per_request']:>14.2f}{r['p50_ms']:>10.2f}"
+        )
+
+    legacy, shared = results
+    ratio = legacy["embed_ms_per_request"] / max(shared["embed_ms_per_request"], 1e-9)
+    print(
+        f"\n✅ Encodes per request {legacy['encodes_per_request']:.2f} -> "
+        f"{shared['encodes_per_request']:.2f}, embedding cost reduced {ratio:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    run_benchmark()
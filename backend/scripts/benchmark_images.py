@@ -0,0 +1,98 @@
+import io
+import time
+import base64
+import asyncio
+import argparse
+
+import numpy as np
+
+from fastapi import UploadFile
+from PIL import Image
+from app.core.config import settings
+from app.main import _process_uploaded_images
+from app.services import image_pipeline
+
+# Typical phone camera resolutions (12 MP and 8 MP).
+SYNTHETIC_SIZES = ((4032, 3024), (3264, 2448))
+ROUNDS = 5
+
+
+def _synthetic_photo(size) -> bytes:
+    # Smooth gradients plus sensor-like noise: compresses like a real photo.
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 24)
+    image = Image.merge("RGB", (gradient, noise, gradient.rotate(180)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def _uploads(images):
+    return [
+        UploadFile(io.BytesIO(content), filename=name, size=len(content))
+        for name, content in images
+    ]
+
+
+async def _raw_base64(files):
+    # The previous path: read the whole upload, base64 the original bytes.
+    return [
+        {"data": base64.b64encode(await file.read()).decode("utf-8")} for file in files
+    ]
+
+
+def _measure(images, process, clear_cache: bool):
+    latencies, payload = [], 0
+    for _ in range(ROUNDS):
+        if clear_cache:
+            image_pipeline._image_cache.clear()
+        start = time.perf_counter()
+        processed = asyncio.run(process(_uploads(images)))
+        latencies.append(time.perf_counter() - start)
+        payload = sum(len(image["data"]) for image in processed)
+    return payload, float(np.median(latencies))
+
+
+def run_benchmark(paths, uplink_mbps: float):
+    if paths:
+        images = [(path, open(path, "rb").read()) for path in paths]
+    else:
+        images = [
+            (f"{w}x{h}.jpg", _synthetic_photo((w, h))) for w, h in SYNTHETIC_SIZES
+        ]
+
+    print(
+        f"🖼️  Image pipeline benchmark ({len(images)} images, "
+        f"{sum(len(c) for _, c in images) / 1e6:.1f} MB, "
+        f"max_dim={settings.IMAGE_MAX_DIMENSION}, {settings.IMAGE_FORMAT} "
+        f"q={settings.IMAGE_QUALITY}, uplink {uplink_mbps:g} Mbit/s)"
+    )
+    print(
+        f"\n{'Path':<16}{'payload MB':>12}{'process ms':>12}"
+        f"{'upload ms':>12}{'total ms':>12}"
+    )
+    for name, process, clear_cache in (
+        ("raw base64", _raw_base64, False),
+        ("pipeline cold", _process_uploaded_images, True),
+        ("pipeline cached", _process_uploaded_images, False),
+    ):
+        payload, seconds = _measure(images, process, clear_cache)
+        # Time to send the data URLs to the vision API at the given uplink.
+        upload = payload * 8 / (uplink_mbps * 1e6)
+        print(
+            f"{name:<16}{payload / 1e6:>12.2f}{seconds * 1000:>12.1f}"
+            f"{upload * 1000:>12.1f}{(seconds + upload) * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Vision payload size and latency: raw base64 vs the image pipeline."
+    )
+    parser.add_argument(
+        "images", nargs="*", help="Image files (default: synthetic phone photos)"
+    )
+    parser.add_argument("--uplink-mbps", type=float, default=20.0)
+    args = parser.parse_args()
+
+    run_benchmark(args.images, args.uplink_mbps)
@@ -0,0 +1,119 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.vector_index import INDEX_TYPES, build_index
+
+NUM_QUERIES = 200
+QUERY_NOISE = 0.05
+K = 10
+
+
+def _load_corpus_embeddings() -> np.ndarray:
+    from .build_rag_index import _load_data, _prepare_documents, _generate_embeddings
+
+    df = _load_data(settings.RAG_DATA_PATH)
+    texts, _ = _prepare_documents(df)
+    return _generate_embeddings(texts, settings.EMBEDDING_MODEL_NAME)
+
+
+def _synthetic_embeddings(count: int, dimension: int = 384) -> np.ndarray:
+    # Clustered data behaves much more like real sentence embeddings than
+    # uniform noise does, which matters for IVF/PQ recall.
+    rng = np.random.default_rng(42)
+    clusters = max(1, count // 100)
+    centers = rng.normal(size=(clusters, dimension)).astype("float32")
+    assignment = rng.integers(0, clusters, size=count)
+    vectors = centers[assignment] + 0.3 * rng.normal(size=(count, dimension))
+    return vectors.astype("float32")
+
+
+def _make_queries(embeddings: np.ndarray) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    picks = rng.choice(len(embeddings), size=min(NUM_QUERIES, len(embeddings)))
+    scale = QUERY_NOISE * float(np.linalg.norm(embeddings, axis=1).mean())
+    noise = rng.normal(size=(len(picks), embeddings.shape[1])) / np.sqrt(
+        embeddings.shape[1]
+    )
+    queries = (embeddings[picks] + scale * noise).astype("float32")
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def _search_one_by_one(index, queries: np.ndarray, k: int):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return np.array(results), np.array(latencies)
+
+
+def _recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run_benchmark(synthetic: int = 0, index_types=INDEX_TYPES, k: int = K):
+    if synthetic:
+        print(f"🚀 Index benchmark on {synthetic} synthetic vectors")
+        embeddings = _synthetic_embeddings(synthetic)
+    else:
+        print(f"🚀 Index benchmark on MedlinePlus corpus ({settings.RAG_DATA_PATH})")
+        embeddings = _load_corpus_embeddings()
+
+    queries = _make_queries(embeddings)
+    k = min(k, len(embeddings))
+
+    rows = []
+    truth = None
+    for index_type in ("flat",) + tuple(t for t in index_types if t != "flat"):
+        start = time.perf_counter()
+        index, params = build_index(embeddings, index_type)
+        build_seconds = time.perf_counter() - start
+
+        found, latencies = _search_one_by_one(index, queries, k)
+        if truth is None:
+            truth = found
+
+        rows.append(
+            {
+                "type": index_type,
+                "description": params["description"],
+                "search": params["search"],
+                "build_s": build_seconds,
+                "recall": _recall_at_k(found, truth),
+                "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            }
+        )
+
+    print(
+        f"\n{'Type':<10}{'Factory':<18}{'Build s':>9}"
+        f"{f'Recall@{k}':>11}{'p50 ms':>9}{'p95 ms':>9}  Search params"
+    )
+    for r in rows:
+        print(
+            f"{r['type']:<10}{r['description']:<18}{r['build_s']:>9.2f}"
+            f"{r['recall']:>11.3f}{r['p50_ms']:>9.3f}{r['p95_ms']:>9.3f}  {r['search']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare ANN index types against the exact flat baseline."
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="Benchmark on N clustered random vectors instead of the corpus.",
+    )
+    parser.add_argument("--k", type=int, default=K)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES))
+    args = parser.parse_args()
+
+    run_benchmark(args.synthetic, tuple(args.types), args.k)
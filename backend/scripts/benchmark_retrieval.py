@@ -0,0 +1,78 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.rag_service import EmbeddingContext, get_rag_service
+
+MESSAGES = [
+    "I have had a severe headache and fever for 2 days.",
+    "My stomach hurts after eating, what could it be?",
+    "There is a red itchy rash on my forearm since yesterday.",
+    "I feel dizzy when I stand up quickly.",
+    "Can metformin cause diarrhea?",
+    "Is amoxicillin safe if I am allergic to penicillin?",
+    "My child has impetigo around the nose.",
+    "What are the symptoms of Guillain-Barre syndrome?",
+]
+ROUNDS = 50
+
+
+def _run(rag, mode: str, k: int, rounds: int):
+    latencies = []
+    returned = []
+    for _ in range(rounds):
+        for message in MESSAGES:
+            embedding = EmbeddingContext(message)
+            embedding.vector  # encoding is shared by both modes; time search only
+            rag._retrieval_cache.clear()
+
+            start = time.perf_counter()
+            results = rag.query(message, k=k, embedding=embedding, mode=mode)
+            latencies.append(time.perf_counter() - start)
+            returned.append(len(results))
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "avg_docs": float(np.mean(returned)),
+    }
+
+
+def run_benchmark(k: int = 5, rounds: int = ROUNDS):
+    rag = get_rag_service()
+    if rag.bm25 is None:
+        raise SystemExit(
+            f"No BM25 index at {settings.RAG_BM25_PATH}. Run scripts.build_rag_index first."
+        )
+
+    print(
+        f"🚀 Retrieval latency ({rag.index.ntotal} docs, k={k}, "
+        f"candidates={settings.RAG_HYBRID_CANDIDATES}, rrf_k={settings.RAG_RRF_K})"
+    )
+    print(f"\n{'Mode':>8}{'p50 ms':>10}{'p95 ms':>10}{'avg docs':>10}")
+    for mode in ("dense", "hybrid"):
+        r = _run(rag, mode, k, rounds)
+        print(
+            f"{mode:>8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['avg_docs']:>10.1f}"
+        )
+
+    print("\nTop hits (dense | hybrid):")
+    for message in MESSAGES:
+        dense, hybrid = (
+            [doc["title"] for doc in rag.query(message, k=k, mode=mode)][:3]
+            for mode in ("dense", "hybrid")
+        )
+        print(f"  {message}\n    {dense}\n    {hybrid}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Latency of dense-only vs hybrid (dense + BM25) RAG retrieval."
+    )
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args()
+
+    run_benchmark(args.k, args.rounds)
@@ -0,0 +1,93 @@
+import os
+import json
+import argparse
+import faiss
+import numpy as np
+import pandas as pd
+from typing import List
+
+from app.core.logging import logger
+from app.core.config import settings
+from app.services.rag_service import get_embedding_model
+from app.utils.guardrails import KNOWN_JAILBREAKS
+
+
+def build_jailbreak_index(corpus_path: str = None) -> int:
+    """
+    Embeds the jailbreak corpus (plus the built-in patterns) into an
+    inner-product index next to medline.index. Running guard_input processes
+    pick the new index up on their next reload check.
+    """
+    corpus_path = corpus_path or settings.JAILBREAK_CORPUS_PATH
+    patterns = _dedupe(KNOWN_JAILBREAKS + _load_corpus(corpus_path))
+
+    logger.info(f"[INFO] Embedding {len(patterns)} jailbreak patterns...")
+    model = get_embedding_model()
+    vectors = model.encode(
+        patterns,
+        batch_size=settings.RAG_EMBED_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(np.asarray(vectors, dtype="float32"))
+
+    _write_atomic_json(
+        settings.JAILBREAK_PATTERNS_PATH,
+        {"embedding_model": settings.EMBEDDING_MODEL_NAME, "patterns": patterns},
+    )
+    # The index file is what readers watch, so it is replaced last.
+    tmp_index_path = f"{settings.JAILBREAK_INDEX_PATH}.tmp"
+    faiss.write_index(index, tmp_index_path)
+    os.replace(tmp_index_path, settings.JAILBREAK_INDEX_PATH)
+
+    logger.info(
+        f"[INFO] Saved {len(patterns)} jailbreak patterns to {settings.JAILBREAK_INDEX_PATH}"
+    )
+    return len(patterns)
+
+
+def _load_corpus(corpus_path: str) -> List[str]:
+    if not corpus_path or not os.path.exists(corpus_path):
+        logger.warning(f"[WARN] Jailbreak corpus not found at {corpus_path}")
+        return []
+
+    if corpus_path.endswith(".csv"):
+        df = pd.read_csv(corpus_path)
+        return df["text"].dropna().astype(str).str.strip().tolist()
+
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def _dedupe(patterns: List[str]) -> List[str]:
+    seen = set()
+    unique = []
+    for pattern in patterns:
+        key = " ".join(pattern.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(pattern)
+    return unique
+
+
+def _write_atomic_json(path: str, payload) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Embed the jailbreak corpus into the guardrail index."
+    )
+    parser.add_argument(
+        "--corpus",
+        default=None,
+        help='Path to a .txt (one pattern per line) or .csv ("text" column) corpus.',
+    )
+    args = parser.parse_args()
+
+    build_jailbreak_index(args.corpus)
@@ -1,23 +1,49 @@
 import os
-import pickle
+import json
+import zlib
+import argparse
+import hashlib
+import time
 import faiss
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Tuple, Any
+from itertools import chain
+from typing import List, Dict, Tuple, Any, Optional
 
 from .medline_data_rag import download_and_process
 from app.core.logging import logger
 from app.core.config import settings
-from app.services.rag_service import get_embedding_model
-
-
-def build_rag_index():
+from app.services.rag_service import (
+    PASSAGE_ID_STRIDE,
+    get_embedding_model,
+    passage_id,
+)
+from app.services.embedding_backend import export_onnx_model, onnx_file_name
+from app.services.vector_index import (
+    build_index,
+    save_index,
+    load_index,
+    add_vectors,
+    remove_id_ranges,
+    supports_removal,
+)
+from app.services.doc_store import write_doc_store
+from app.services.sparse_index import build_bm25_index
+
+
+# Encode batches per chunk; each chunk is copied into the output matrix (in
+# RAG_EMBED_DTYPE) before the next one is encoded.
+EMBED_CHUNK_BATCHES = 64
+
+
+def build_rag_index(incremental: bool = False, offline: bool = False):
     try:
         logger.info(
             "[INFO] START: a complete ETL (Extract, Transform, Load) script for build RAG system"
         )
 
-        _ensure_data_exists(settings.RAG_DATA_PATH)
+        _ensure_embedding_model_exported()
+        _ensure_data_exists(settings.RAG_DATA_PATH, offline=offline)
         df = _load_data(settings.RAG_DATA_PATH)
         texts, metadata = _prepare_documents(df)
 
@@ -25,12 +51,32 @@ def build_rag_index():
             logger.warning("[WARM] No texts to process")
             return
 
-        embeddings = _generate_embeddings(texts, settings.EMBEDDING_MODEL_NAME)
-        index = _create_faiss_index(embeddings)
+        ids = np.array([doc["passage_id"] for doc in metadata], dtype=np.int64)
+        manifest = _build_manifest(df, df["id"].map(_topic_id).to_numpy())
+
+        previous_manifest = _load_previous_manifest() if incremental else None
+        if previous_manifest is not None:
+            index, index_params = _update_faiss_index(
+                texts, ids, manifest, previous_manifest
+            )
+        else:
+            embeddings = _generate_embeddings(texts, settings.EMBEDDING_MODEL_NAME)
+            index, index_params = _create_faiss_index(embeddings, ids)
 
         save_artifacts(
-            index, metadata, settings.RAG_INDEX_PATH, settings.RAG_METADATA_PATH
+            index,
+            index_params,
+            metadata,
+            ids,
+            manifest,
+            settings.RAG_INDEX_PATH,
+            settings.RAG_INDEX_PARAMS_PATH,
+            settings.RAG_DOCSTORE_PATH,
+            settings.RAG_DOCSTORE_OFFSETS_PATH,
+            settings.RAG_DOCSTORE_IDS_PATH,
+            settings.RAG_MANIFEST_PATH,
         )
+        _create_bm25_index(texts, ids)
 
         logger.info("[INFO] SUCCESS: RAG Index built successfully!")
 
@@ -39,9 +85,23 @@ def build_rag_index():
         raise
 
 
-def _ensure_data_exists(csv_path: str) -> None:
+def _ensure_embedding_model_exported() -> None:
+    if settings.EMBEDDING_BACKEND == "torch":
+        return
+
+    model_file = os.path.join(
+        settings.EMBEDDING_ONNX_DIR, onnx_file_name(settings.EMBEDDING_BACKEND)
+    )
+    if os.path.exists(model_file):
+        return
+
+    logger.info(f"[Step 0]: Exporting {settings.EMBEDDING_BACKEND} embedding model...")
+    export_onnx_model(settings.EMBEDDING_ONNX_DIR)
+
+
+def _ensure_data_exists(csv_path: str, offline: bool = False) -> None:
     logger.info("[Step 1]: Downloading and processing CSV...")
-    download_and_process()
+    download_and_process(offline=offline)
 
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"CSV file not found at {csv_path}")
@@ -50,65 +110,344 @@ def _ensure_data_exists(csv_path: str) -> None:
 def _load_data(csv_path: str) -> pd.DataFrame:
     logger.info("[Step 2]: Loading CSV data...")
     df = pd.read_csv(csv_path)
-    return df.fillna("")
+    df = df.fillna("")
+    return df.drop_duplicates(subset="id", keep="last").reset_index(drop=True)
 
 
 def _prepare_documents(df: pd.DataFrame) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Splits every description into word windows of RAG_PASSAGE_WORDS, each
+    overlapping the previous one by RAG_PASSAGE_OVERLAP_WORDS. Returns one
+    text to embed (title + passage) and one doc store record per passage;
+    records keep their parent topic in "original_id", and "body_start" is the
+    number of leading words repeated from the previous passage.
+    """
     logger.info(f"[Step 3]: Processing {len(df)} records...")
-    texts_to_embed = []
-    metadata_docs = []
-
-    for _, row in df.iterrows():
-        embed_text = f"{row['title']} " f"{str(row['description'])[:500]}"
-
-        display_text = (
-            f"Disease/Topic: {row['title']}\n"
-            f"Description: {str(row['description'])}\n"
-            f"Source: {row.get('source_url', '')}"
+    if "source_url" in df:
+        source = df["source_url"].astype(str)
+    else:
+        source = pd.Series("", index=df.index)
+
+    size = settings.RAG_PASSAGE_WORDS
+    overlap = min(settings.RAG_PASSAGE_OVERLAP_WORDS, size - 1)
+    windows = [
+        _word_windows(description.split(), size, overlap)
+        for description in df["description"].astype(str)
+    ]
+    passages = list(chain.from_iterable(windows))
+
+    # One row per passage: its topic's row and its number within the topic.
+    counts = np.fromiter(map(len, windows), dtype=np.int64, count=len(windows))
+    rows = np.repeat(np.arange(len(df)), counts)
+    number = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    topic_ids = df["id"].map(_topic_id).to_numpy(dtype=np.int64)[rows]
+    titles = df["title"].astype(str).to_numpy()[rows].tolist()
+
+    texts_to_embed = [f"{title} {passage}" for title, passage in zip(titles, passages)]
+    metadata_docs = [
+        {
+            "original_id": topic_id,
+            "passage_id": pid,
+            "passage": n,
+            "body_start": body_start,
+            "source": url,
+            "text": passage,
+            "title": title,
+        }
+        for topic_id, pid, n, body_start, url, passage, title in zip(
+            topic_ids.tolist(),
+            (topic_ids * PASSAGE_ID_STRIDE + number).tolist(),
+            number.tolist(),
+            np.where(number == 0, 0, overlap).tolist(),
+            source.to_numpy()[rows].tolist(),
+            passages,
+            titles,
         )
+    ]
 
-        doc_entry = {
-            "original_id": row.get("id"),
-            "source": row.get("source_url"),
-            "text": display_text,
-            "title": row["title"],
-        }
+    logger.info(f"[INFO] Split {len(df)} topics into {len(passages)} passages")
+    return texts_to_embed, metadata_docs
 
-        texts_to_embed.append(embed_text)
-        metadata_docs.append(doc_entry)
 
-    return texts_to_embed, metadata_docs
+def _word_windows(words: List[str], size: int, overlap: int) -> List[str]:
+    if len(words) <= size:
+        return [" ".join(words)]
+
+    starts = range(0, max(len(words) - overlap, 1), size - overlap)
+    if len(starts) > PASSAGE_ID_STRIDE:
+        logger.warning(
+            f"[WARN] Description of {len(words)} words truncated to "
+            f"{PASSAGE_ID_STRIDE} passages"
+        )
+    return [
+        " ".join(words[start : start + size]) for start in starts[:PASSAGE_ID_STRIDE]
+    ]
 
 
 def _generate_embeddings(texts: List[str], model_name: str) -> np.ndarray:
     logger.info(f"[Step 4]: Loading model {model_name}...")
     model = get_embedding_model()
 
-    logger.info("[Step 5]: Generating embeddings (this may take a while)...")
-    return model.encode(texts, convert_to_numpy=True)
+    batch_size = settings.RAG_EMBED_BATCH_SIZE
+    workers = settings.RAG_EMBED_WORKERS or os.cpu_count() or 1
+    # Spawning worker processes (each loading its own model copy) only pays
+    # off once every worker gets at least a few batches.
+    workers = max(1, min(workers, len(texts) // (batch_size * 4)))
+    if workers > 1 and not hasattr(model, "start_multi_process_pool"):
+        logger.warning(
+            f"[WARN] {type(model).__name__} has no multi-process encoding, "
+            "embedding in this process"
+        )
+        workers = 1
+
+    logger.info(
+        f"[Step 5]: Generating embeddings for {len(texts)} texts "
+        f"(batch_size={batch_size}, processes={workers}, "
+        f"dtype={settings.RAG_EMBED_DTYPE})..."
+    )
+    start = time.perf_counter()
+    pool = None
+    if workers > 1:
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+    try:
+        embeddings = _encode_in_chunks(
+            model, texts, batch_size, pool, np.dtype(settings.RAG_EMBED_DTYPE)
+        )
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+    elapsed = time.perf_counter() - start
+
+    logger.info(
+        f"[INFO] Embedded {len(texts)} texts in {elapsed:.1f}s "
+        f"({len(texts) / max(elapsed, 1e-9):.1f} docs/sec)"
+    )
+    return embeddings
+
+
+def _encode_in_chunks(
+    model: Any, texts: List[str], batch_size: int, pool: Any, dtype: np.dtype
+) -> np.ndarray:
+    # The matrix is preallocated in `dtype`, so at most one chunk is ever held
+    # in float32 on top of it.
+    chunk_size = batch_size * EMBED_CHUNK_BATCHES
+    embeddings = None
+    for offset in range(0, len(texts), chunk_size):
+        chunk = texts[offset : offset + chunk_size]
+        if pool is not None:
+            vectors = model.encode_multi_process(
+                chunk, pool, batch_size=batch_size, normalize_embeddings=True
+            )
+        else:
+            vectors = model.encode(
+                chunk,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        if embeddings is None:
+            embeddings = np.empty((len(texts), vectors.shape[1]), dtype=dtype)
+        embeddings[offset : offset + len(chunk)] = vectors
+    if embeddings is None:
+        return np.empty((0, 0), dtype=dtype)
+    return embeddings
+
+
+def _create_faiss_index(
+    embeddings: np.ndarray, ids: np.ndarray
+) -> Tuple[faiss.Index, Dict]:
+    logger.info(f"[Step 6]: Building FAISS index ({settings.RAG_INDEX_TYPE})...")
+    return build_index(embeddings, settings.RAG_INDEX_TYPE, ids=ids)
+
+
+def _create_bm25_index(texts: List[str], ids: np.ndarray) -> None:
+    # BM25 indexes the same passages (and ids) as the dense index, so hybrid
+    # fusion works per passage. It is cheap enough to rebuild in full on
+    # incremental runs.
+    logger.info("[Step 8]: Building BM25 index over passages...")
+    terms = build_bm25_index(
+        texts,
+        ids,
+        settings.RAG_BM25_PATH,
+        k1=settings.RAG_BM25_K1,
+        b=settings.RAG_BM25_B,
+    )
+    logger.info(f"[INFO] Saved BM25 index ({terms} terms) to {settings.RAG_BM25_PATH}")
+
+
+def _topic_id(raw_id: Any) -> int:
+    # MedlinePlus topic ids are numeric; anything else gets a stable 31-bit
+    # hash so it can still be used as a FAISS id.
+    try:
+        return int(raw_id)
+    except (TypeError, ValueError):
+        return zlib.crc32(str(raw_id).encode("utf-8")) & 0x7FFFFFFF
+
+
+def _content_hash(title: Any, description: Any) -> str:
+    payload = f"{title}\n{description}".encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+def _build_manifest(df: pd.DataFrame, ids: np.ndarray) -> Dict[str, Any]:
+    hashes = {
+        str(topic_id): _content_hash(title, description)
+        for topic_id, title, description in zip(ids, df["title"], df["description"])
+    }
+    return {
+        "embedding_model": settings.EMBEDDING_MODEL_NAME,
+        "index_type": settings.RAG_INDEX_TYPE,
+        "passages": [settings.RAG_PASSAGE_WORDS, settings.RAG_PASSAGE_OVERLAP_WORDS],
+        "topics": hashes,
+    }
+
+
+def _load_previous_manifest() -> Optional[Dict[str, Any]]:
+    required = (
+        settings.RAG_MANIFEST_PATH,
+        settings.RAG_INDEX_PATH,
+        settings.RAG_INDEX_PARAMS_PATH,
+    )
+    if not all(os.path.exists(path) for path in required):
+        logger.warning("[WARN] No previous build found, running a full rebuild")
+        return None
+
+    with open(settings.RAG_MANIFEST_PATH, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("embedding_model") != settings.EMBEDDING_MODEL_NAME:
+        logger.warning("[WARN] Embedding model changed, running a full rebuild")
+        return None
+    if manifest.get("index_type") != settings.RAG_INDEX_TYPE:
+        logger.warning("[WARN] Index type changed, running a full rebuild")
+        return None
+    if manifest.get("passages") != [
+        settings.RAG_PASSAGE_WORDS,
+        settings.RAG_PASSAGE_OVERLAP_WORDS,
+    ]:
+        logger.warning("[WARN] Passage chunking changed, running a full rebuild")
+        return None
+
+    return manifest
+
+
+def _diff_manifests(
+    current: Dict[str, Any], previous: Dict[str, Any]
+) -> Dict[str, List[int]]:
+    new_topics, old_topics = current["topics"], previous["topics"]
+    return {
+        "added": [int(t) for t in new_topics if t not in old_topics],
+        "changed": [
+            int(t)
+            for t, digest in new_topics.items()
+            if t in old_topics and old_topics[t] != digest
+        ],
+        "removed": [int(t) for t in old_topics if t not in new_topics],
+        "unchanged": [
+            int(t) for t, digest in new_topics.items() if old_topics.get(t) == digest
+        ],
+    }
+
+
+def _update_faiss_index(
+    texts: List[str],
+    ids: np.ndarray,
+    manifest: Dict[str, Any],
+    previous_manifest: Dict[str, Any],
+) -> Tuple[faiss.Index, Dict]:
+    logger.info("[Step 4]: Computing delta against the previous build...")
+    delta = _diff_manifests(manifest, previous_manifest)
+    _log_delta_report(delta)
+
+    index, index_params = load_index(
+        settings.RAG_INDEX_PATH, settings.RAG_INDEX_PARAMS_PATH, use_mmap=False
+    )
+
+    if not supports_removal(index_params):
+        logger.warning(
+            f"[WARN] Index '{index_params.get('description')}' cannot remove vectors, "
+            "running a full rebuild"
+        )
+        embeddings = _generate_embeddings(texts, settings.EMBEDDING_MODEL_NAME)
+        return _create_faiss_index(embeddings, ids)
+
+    # Every passage of a stale topic lies in [topic * stride, (topic + 1) * stride)
+    removed = remove_id_ranges(
+        index,
+        [
+            (passage_id(topic_id, 0), passage_id(topic_id + 1, 0))
+            for topic_id in delta["changed"] + delta["removed"]
+        ],
+    )
+    logger.info(f"[Step 5]: Removed {removed} stale passage vectors")
+
+    to_embed = set(delta["added"] + delta["changed"])
+    positions = [
+        i for i, pid in enumerate(ids) if int(pid) // PASSAGE_ID_STRIDE in to_embed
+    ]
+    if positions:
+        embeddings = _generate_embeddings(
+            [texts[i] for i in positions], settings.EMBEDDING_MODEL_NAME
+        )
+        add_vectors(index, embeddings, ids[positions])
+
+    logger.info(
+        f"[Step 6]: Re-embedded {len(positions)} passages, index now holds "
+        f"{index.ntotal} vectors"
+    )
+    return index, index_params
 
 
-def _create_faiss_index(embeddings: np.ndarray) -> faiss.Index:
-    logger.info("[Step 6]: Building FAISS index...")
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
-    return index
+def _log_delta_report(delta: Dict[str, List[int]]) -> None:
+    logger.info("[INFO] ---- Incremental rebuild delta ----")
+    for key in ("added", "changed", "removed", "unchanged"):
+        sample = ", ".join(str(t) for t in delta[key][:10])
+        more = " ..." if len(delta[key]) > 10 else ""
+        logger.info(f"[INFO] {key:<9}: {len(delta[key]):>6}  {sample}{more}")
 
 
 def save_artifacts(
-    index: faiss.Index, metadata: List[Dict], index_path: str, metadata_path: str
+    index: faiss.Index,
+    index_params: Dict[str, Any],
+    metadata: List[Dict],
+    ids: np.ndarray,
+    manifest: Dict[str, Any],
+    index_path: str,
+    index_params_path: str,
+    docstore_path: str,
+    docstore_offsets_path: str,
+    docstore_ids_path: str,
+    manifest_path: str,
 ) -> None:
     logger.info("[Step 7]: Saving artifacts to disk...")
 
-    faiss.write_index(index, str(index_path))
+    save_index(index, index_params, index_path, index_params_path)
+
+    count = write_doc_store(
+        metadata, ids, docstore_path, docstore_offsets_path, docstore_ids_path
+    )
 
-    with open(metadata_path, "wb") as f:
-        pickle.dump(metadata, f)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
 
     logger.info(f"[INFO] Saved index to {index_path}")
-    logger.info(f"[INFO] Saved metadata to {metadata_path}")
+    logger.info(f"[INFO] Saved index params to {index_params_path}")
+    logger.info(f"[INFO] Saved {count} documents to {docstore_path}")
+    logger.info(f"[INFO] Saved content hashes to {manifest_path}")
 
 
 if __name__ == "__main__":
-    build_rag_index()
+    parser = argparse.ArgumentParser(description="Build the MedlinePlus RAG index.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-embed topics whose title/description changed since the last build.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Build from the cached MedlinePlus XML without touching the network.",
+    )
+    args = parser.parse_args()
+
+    build_rag_index(incremental=args.incremental, offline=args.offline)
@@ -0,0 +1,14 @@
+import argparse
+
+from app.core.config import settings
+from app.services.embedding_backend import export_onnx_model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the embedding model to ONNX (fp32 and int8 quantised)."
+    )
+    parser.add_argument("--output", default=settings.EMBEDDING_ONNX_DIR)
+    args = parser.parse_args()
+
+    export_onnx_model(args.output)
@@ -1,60 +1,222 @@
+import os
+import json
+import argparse
 import requests
 import xml.etree.ElementTree as ET
 import pandas as pd
 
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
 from bs4 import BeautifulSoup
 from app.core.logging import logger
 from app.core.config import settings
 
-
 XML_URL = "https://medlineplus.gov/xml/mplus_topics_2026-01-31.xml"
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def download_and_process(
+    offline: bool = False, xml_path: Optional[str] = None
+) -> Optional[int]:
+    """
+    Streams the MedlinePlus topics XML into settings.RAG_DATA_PATH.
+
+    The XML is served from a local cache that is revalidated with
+    ETag / If-Modified-Since. `offline=True` (or an explicit `xml_path`,
+    e.g. a test fixture) skips the network entirely.
+    """
+    if xml_path is None:
+        xml_path = fetch_xml(
+            XML_URL,
+            settings.RAG_XML_CACHE_PATH,
+            settings.RAG_XML_CACHE_META_PATH,
+            offline=offline,
+        )
+    if xml_path is None:
+        return None
+
+    logger.info(f"[INFO] Parsing MedlinePlus XML from {xml_path}...")
+    count = write_topics_csv(
+        iter_topics(xml_path),
+        settings.RAG_DATA_PATH,
+        chunk_size=settings.ETL_CHUNK_SIZE,
+        workers=settings.ETL_WORKERS,
+    )
 
+    logger.info(
+        f"[INFO] Data written to file: {settings.RAG_DATA_PATH}. Processed {count} records."
+    )
+    return count
+
+
+def fetch_xml(
+    url: str, cache_path: str, meta_path: str, offline: bool = False
+) -> Optional[str]:
+    meta = _load_cache_meta(meta_path)
+    has_cache = os.path.exists(cache_path) and meta.get("url") == url
+
+    if offline:
+        if not os.path.exists(cache_path):
+            logger.error(f"[ERROR] Offline mode but no cached XML at {cache_path}")
+            return None
+        logger.info(f"[INFO] Offline mode, using cached XML {cache_path}")
+        return cache_path
+
+    headers = {}
+    if has_cache and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if has_cache and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    logger.info(f"[INFO] Starting download from MedlinePlus dataset: {url}...")
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=60) as response:
+            if response.status_code == 304 and has_cache:
+                logger.info("[INFO] MedlinePlus XML not modified, using cache")
+                return cache_path
+
+            if response.status_code != 200:
+                logger.error(f"[ERROR] Download error! Status: {response.status_code}")
+                return cache_path if has_cache else None
+
+            tmp_path = f"{cache_path}.part"
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+            os.replace(tmp_path, cache_path)
+
+            _save_cache_meta(
+                meta_path,
+                {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                },
+            )
+            return cache_path
+    except requests.RequestException as e:
+        logger.error(f"[ERROR] Download failed: {e}")
+        if os.path.exists(cache_path):
+            logger.warning(f"[WARN] Falling back to cached XML {cache_path}")
+            return cache_path
+        return None
+
+
+def iter_topics(xml_path: str) -> Iterator[Dict[str, str]]:
+    """Yields raw English health topics without holding the tree in memory."""
+    root = None
+    for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if root is None:
+            root = elem
+            continue
+        if event != "end" or elem.tag != "health-topic":
+            continue
 
-def download_and_process():
-    logger.info(f"[INFO] Starting download from MedlinePlus dataset: {XML_URL}...")
+        url = elem.get("url")
+        if not (url and "/spanish/" in url):
+            summary_tag = elem.find("full-summary")
+            yield {
+                "id": elem.get("id"),
+                "title": elem.get("title"),
+                "raw_summary": summary_tag.text if summary_tag is not None else "",
+                "source_url": url,
+            }
 
-    response = requests.get(XML_URL)
+        # Drop the processed topic (and everything before it) from the tree.
+        elem.clear()
+        root.clear()
+
+
+def write_topics_csv(
+    topics: Iterator[Dict[str, str]],
+    csv_path: str,
+    chunk_size: int = 500,
+    workers: int = 0,
+) -> int:
+    workers = workers or os.cpu_count() or 1
+    tmp_path = f"{csv_path}.part"
+    count = 0
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            _rows_frame([]).to_csv(f, index=False)
+            for chunk in _chunks(topics, chunk_size):
+                summaries = [topic["raw_summary"] for topic in chunk]
+                if executor is not None:
+                    cleaned = list(
+                        executor.map(
+                            clean_html_text,
+                            summaries,
+                            chunksize=max(1, len(summaries) // workers),
+                        )
+                    )
+                else:
+                    cleaned = [clean_html_text(summary) for summary in summaries]
+
+                rows = [
+                    {
+                        "id": topic["id"],
+                        "title": topic["title"],
+                        "description": description,
+                        "source_url": topic["source_url"],
+                        "source_name": "MedlinePlus",
+                    }
+                    for topic, description in zip(chunk, cleaned)
+                ]
+                _rows_frame(rows).to_csv(f, index=False, header=False)
+                count += len(rows)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    os.replace(tmp_path, csv_path)
+    return count
 
-    if response.status_code != 200:
-        logger.error(f"[ERROR] Download error! Status: {response.status_code}")
-        return
 
-    root = ET.fromstring(response.content)
+def clean_html_text(html_content):
+    if not html_content:
+        return ""
+    soup = BeautifulSoup(html_content, "html.parser")
+    return soup.get_text(separator=" ", strip=True)
 
-    data_rows = []
 
-    for topic in root.findall("health-topic"):
-        url = topic.get("url")
-        if url and "/spanish/" in url:
-            continue
+def _rows_frame(rows: List[Dict[str, str]]) -> pd.DataFrame:
+    columns = ["id", "title", "description", "source_url", "source_name"]
+    return pd.DataFrame(rows, columns=columns)
 
-        title = topic.get("title")
-        mplus_id = topic.get("id")
 
-        summary_tag = topic.find("full-summary")
-        raw_summary = summary_tag.text if summary_tag is not None else ""
-        clean_summary = clean_html_text(raw_summary)
+def _chunks(items: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-        data_rows.append(
-            {
-                "id": mplus_id,
-                "title": title,
-                "description": clean_summary,
-                "source_url": url,
-                "source_name": "MedlinePlus",
-            }
-        )
 
-    df = pd.DataFrame(data_rows)
-    df.to_csv(settings.RAG_DATA_PATH, index=False, encoding="utf-8")
+def _load_cache_meta(meta_path: str) -> Dict[str, Optional[str]]:
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-    logger.info(
-        f"[INFO] Data written to file: {settings.RAG_DATA_PATH}. Processed {len(df)} records."
-    )
 
+def _save_cache_meta(meta_path: str, meta: Dict[str, Optional[str]]) -> None:
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
 
-def clean_html_text(html_content):
-    if not html_content:
-        return ""
-    soup = BeautifulSoup(html_content, "html.parser")
-    return soup.get_text(separator=" ", strip=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Download and clean the MedlinePlus topics XML into CSV."
+    )
+    parser.add_argument(
+        "--offline", action="store_true", help="Use the cached XML only."
+    )
+    parser.add_argument("--xml", help="Process this local XML file instead.")
+    args = parser.parse_args()
+
+    download_and_process(offline=args.offline, xml_path=args.xml)
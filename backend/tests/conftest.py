@@ -0,0 +1,68 @@
+import os
+import re
+import sys
+import zlib
+import tempfile
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+# The log sink is added when app.core.logging is imported, so LOG_PATH has to
+# point at a temp dir before any app module loads (keeps backend/data clean).
+os.environ.setdefault(
+    "LOG_PATH", os.path.join(tempfile.mkdtemp(prefix="backend-tests-"), "api.log")
+)
+
+
+FAKE_EMBEDDING_DIMENSION = 64
+
+
+class FakeEmbeddingModel:
+    """Bag-of-words hashing encoder, deterministic and torch-free."""
+
+    def __init__(self):
+        self.calls = 0
+        self.encoded = 0
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False, **_):
+        if isinstance(texts, str):
+            return self.encode([texts], normalize_embeddings=normalize_embeddings)[0]
+
+        self.calls += 1
+        self.encoded += len(texts)
+        vectors = np.zeros((len(texts), FAKE_EMBEDDING_DIMENSION), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % FAKE_EMBEDDING_DIMENSION] += 1
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    from app.services import rag_service
+
+    model = FakeEmbeddingModel()
+    monkeypatch.setattr(rag_service, "_embedding_model", model)
+    rag_service._embedding_cache.clear()
+    yield model
+    rag_service._embedding_cache.clear()
+
+
+@pytest.fixture
+def knowledge_base(tmp_path, monkeypatch):
+    """Points every RAG and jailbreak artifact path at a temporary directory."""
+    from app.core.config import settings
+
+    for name, value in settings.model_dump().items():
+        if name.startswith(("RAG_", "JAILBREAK_")) and name.endswith("_PATH"):
+            monkeypatch.setattr(settings, name, str(tmp_path / os.path.basename(value)))
+    return tmp_path
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import random
+
+from fastapi import FastAPI
+
+# Mean latency of a completion; each call varies by +-PROVIDER_JITTER, as real
+# responses do, instead of all 100 arriving in the same instant.
+PROVIDER_LATENCY = 0.5
+PROVIDER_JITTER = 0.2
+MODEL_NAME = "fake-model"
+
+
+def _fake_completion():
+    arguments = json.dumps(
+        {"action": "message", "message_to_patient": "How long have you had it?"}
+    )
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": 0,
+        "model": MODEL_NAME,
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": "call_1",
+                            "type": "function",
+                            "function": {
+                                "name": "provide_response",
+                                "arguments": arguments,
+                            },
+                        }
+                    ],
+                },
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+app = FastAPI()
+
+
+@app.post("/openai/v1/chat/completions")
+async def fake_chat_completions():
+    await asyncio.sleep(PROVIDER_LATENCY + random.uniform(-1, 1) * PROVIDER_JITTER)
+    return _fake_completion()
@@ -0,0 +1,60 @@
+class FakeRedis:
+    """The slice of the redis-py client API the session store uses."""
+
+    def __init__(self):
+        self.lists = {}
+        self.strings = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.strings.get(key)
+
+    def set(self, key, value, ex=None):
+        self.strings[key] = value.encode("utf-8") if isinstance(value, str) else value
+        if ex is not None:
+            self.ttls[key] = ex
+        return True
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(
+            value.encode("utf-8") if isinstance(value, str) else value
+            for value in values
+        )
+        return len(self.lists[key])
+
+    def lrange(self, key, start, end):
+        values = self.lists.get(key, [])
+        end = len(values) if end == -1 else end + 1
+        return values[start:end]
+
+    def ltrim(self, key, start, end):
+        values = self.lists.get(key, [])
+        start = max(len(values) + start, 0) if start < 0 else start
+        end = len(values) if end == -1 else end + 1
+        self.lists[key] = values[start:end]
+        return True
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+            return self
+
+        return queue
+
+    def execute(self):
+        results = [getattr(self.client, name)(*args) for name, args in self.commands]
+        self.commands = []
+        return results
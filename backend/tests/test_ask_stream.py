@@ -0,0 +1,186 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from groq.types.chat import ChatCompletionChunk
+
+from app import main
+from app.core.config import settings
+from app.core.exceptions import EmptyModelOutput
+from app.services import llm_service, response_cache
+
+REPORT_ARGUMENTS = json.dumps(
+    {"action": "message", "message_to_patient": 'Does it "hurt" – since when?'}
+)
+
+
+def _chunk(delta: dict, finish_reason=None) -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "fake-model",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+    )
+
+
+def _tool_call_chunks(arguments: str, size: int = 7):
+    yield _chunk(
+        {
+            "role": "assistant",
+            "tool_calls": [
+                {
+                    "index": 0,
+                    "id": "call_1",
+                    "type": "function",
+                    "function": {"name": "provide_response", "arguments": ""},
+                }
+            ],
+        }
+    )
+    for start in range(0, len(arguments), size):
+        yield _chunk(
+            {
+                "tool_calls": [
+                    {
+                        "index": 0,
+                        "function": {"arguments": arguments[start : start + size]},
+                    }
+                ]
+            }
+        )
+    yield _chunk({}, finish_reason="tool_calls")
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _FakeCompletions:
+    async def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        return _FakeStream(list(_tool_call_chunks(REPORT_ARGUMENTS)))
+
+
+class _FakeClient:
+    def __init__(self):
+        self.chat = type("Chat", (), {"completions": _FakeCompletions()})()
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "guard_input", lambda *args, **kwargs: None)
+    monkeypatch.setattr(llm_service, "_get_rag_context", lambda *args: "context")
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: _FakeClient())
+    return TestClient(main.app)
+
+
+def test_ask_stream_emits_tokens_then_result(client):
+    response = client.post(
+        "/ask/stream", data={"message": "My head hurts", "history": "[]"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(response.text)
+    names = [name for name, _ in events]
+
+    assert names[0] == "retrieval"
+    assert names[-1] == "result"
+    assert names.count("token") > 1
+
+    streamed = "".join(data["text"] for name, data in events if name == "token")
+    assert streamed == 'Does it "hurt" – since when?'
+    assert events[-1][1] == {"status": "chat", "message": streamed}
+
+
+def _flaky_stream(attempts, fail_after_token=False):
+    async def stream_chat_once(current_message, **kwargs):
+        attempts.append(current_message)
+        yield {"event": "retrieval", "data": {"context_chars": 7}}
+        if len(attempts) == 1:
+            if fail_after_token:
+                yield {"event": "token", "data": {"text": "Does"}}
+            raise EmptyModelOutput()
+        yield {"event": "token", "data": {"text": "Retried"}}
+        yield {"event": "result", "data": {"type": "chat", "message": "Retried"}}
+
+    return stream_chat_once
+
+
+def test_ask_stream_retries_empty_output_before_the_first_token(client, monkeypatch):
+    attempts = []
+    monkeypatch.setattr(llm_service, "stream_chat_once", _flaky_stream(attempts))
+
+    events = _parse_sse(
+        client.post("/ask/stream", data={"message": "My head hurts"}).text
+    )
+
+    assert len(attempts) == 2
+    assert [name for name, _ in events] == ["retrieval", "token", "result"]
+    assert events[-1][1] == {"status": "chat", "message": "Retried"}
+
+
+def test_ask_stream_does_not_retry_once_tokens_were_sent(client, monkeypatch):
+    attempts = []
+    monkeypatch.setattr(
+        llm_service,
+        "stream_chat_once",
+        _flaky_stream(attempts, fail_after_token=True),
+    )
+
+    events = _parse_sse(
+        client.post("/ask/stream", data={"message": "My head hurts"}).text
+    )
+
+    assert len(attempts) == 1
+    assert [name for name, _ in events] == ["retrieval", "token", "error"]
+    assert events[-1][1]["status_code"] == 502
+
+
+def test_ask_stream_shares_the_response_cache(client, fake_model, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(response_cache, "_response_cache", None)
+
+    first = _parse_sse(
+        client.post("/ask/stream", data={"message": "My head hurts"}).text
+    )
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: None)
+    second = _parse_sse(
+        client.post("/ask/stream", data={"message": "my head  HURTS"}).text
+    )
+
+    assert [name for name, _ in second] == ["retrieval", "token", "result"]
+    assert second[1][1]["text"] == 'Does it "hurt" – since when?'
+    assert second[-1] == first[-1]
+    assert response_cache.get_response_cache().stats()["hits"] == 1
+
+
+def test_json_string_field_streamer_handles_split_escapes():
+    streamer = llm_service._JsonStringFieldStreamer("message_to_patient")
+    payload = json.dumps({"message_to_patient": 'a\nb \U0001f600 "c"'})
+
+    decoded = "".join(streamer.feed(char) for char in payload)
+
+    assert decoded == 'a\nb \U0001f600 "c"'
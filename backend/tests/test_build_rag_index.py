@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.services import rag_service
+from app.services.sparse_index import BM25Index
+from scripts import build_rag_index as builder
+
+TOPICS = [
+    (1, "Headache", "Pain in the head, migraine and tension."),
+    (2, "Fever", "High body temperature and chills."),
+    (3, "Rash", "Red itchy skin."),
+]
+
+
+def _write_csv(rows):
+    pd.DataFrame(
+        [
+            {"id": i, "title": t, "description": d, "source_url": f"https://x/{i}"}
+            for i, t, d in rows
+        ]
+    ).to_csv(settings.RAG_DATA_PATH, index=False)
+
+
+@pytest.fixture(params=["flat", "ivf_flat"])
+def index_type(request, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_INDEX_TYPE", request.param)
+    monkeypatch.setattr(settings, "RAG_IVF_NLIST", 1)
+    return request.param
+
+
+@pytest.fixture
+def offline_builder(knowledge_base, fake_model, monkeypatch):
+    monkeypatch.setattr(
+        builder, "_ensure_data_exists", lambda path, offline=False: None
+    )
+    monkeypatch.setattr(builder, "get_embedding_model", lambda: fake_model)
+    return fake_model
+
+
+def _query_ids(text):
+    rag = rag_service.RAG()
+    rag.load_index()
+    try:
+        results = rag.query(text, k=5, min_score=0.0, max_score_gap=2.0)
+        return {doc["original_id"]: doc for doc in results}
+    finally:
+        rag.docs.close()
+
+
+def test_incremental_rebuild_only_embeds_the_delta(offline_builder, index_type):
+    _write_csv(TOPICS)
+    builder.build_rag_index()
+    assert offline_builder.encoded == 3
+
+    updated = [
+        TOPICS[0],
+        (2, "Fever", "High body temperature, chills and sweating."),
+        (4, "Cough", "Dry cough and sore throat."),
+    ]
+    _write_csv(updated)
+    offline_builder.encoded = 0
+    builder.build_rag_index(incremental=True)
+
+    assert offline_builder.encoded == 2  # changed "Fever" and new "Cough"
+
+    found = _query_ids("sweating cough rash headache")
+    assert all(len(doc["passage_ids"]) == 1 for doc in found.values())
+    assert set(found) <= {1, 2, 4}
+    assert 4 in found and 2 in found
+    assert "sweating" in found[2]["text"]
+
+
+def test_incremental_rebuild_replaces_every_passage_of_a_changed_topic(
+    offline_builder, index_type, monkeypatch
+):
+    monkeypatch.setattr(settings, "RAG_PASSAGE_WORDS", 3)
+    monkeypatch.setattr(settings, "RAG_PASSAGE_OVERLAP_WORDS", 1)
+    _write_csv(TOPICS)
+    builder.build_rag_index()
+    assert offline_builder.encoded == 3 + 2 + 1
+
+    _write_csv([TOPICS[0], (2, "Fever", "Chills."), TOPICS[2]])
+    offline_builder.encoded = 0
+    builder.build_rag_index(incremental=True)
+
+    assert offline_builder.encoded == 1
+    rag = rag_service.RAG()
+    rag.load_index()
+    try:
+        assert rag.index.ntotal == 3 + 1 + 1
+    finally:
+        rag.docs.close()
+
+
+def test_incremental_rebuild_without_previous_build_is_full(offline_builder):
+    _write_csv(TOPICS)
+    builder.build_rag_index(incremental=True)
+
+    assert offline_builder.encoded == 3
+    assert BM25Index.exists(settings.RAG_BM25_PATH)
+
+
+def test_prepare_documents_splits_descriptions_into_passages(monkeypatch):
+    monkeypatch.setattr(settings, "RAG_PASSAGE_WORDS", 4)
+    monkeypatch.setattr(settings, "RAG_PASSAGE_OVERLAP_WORDS", 1)
+    df = pd.DataFrame(
+        [
+            {
+                "id": 7,
+                "title": "Flu",
+                "description": "a b c d e f g",
+                "source_url": "u",
+            },
+            {"id": "abc", "title": "Cold", "description": "", "source_url": ""},
+        ]
+    )
+
+    texts, metadata = builder._prepare_documents(df)
+
+    assert texts == ["Flu a b c d", "Flu d e f g", "Cold "]
+    assert metadata[1] == {
+        "original_id": 7,
+        "passage_id": 7001,
+        "passage": 1,
+        "body_start": 1,
+        "source": "u",
+        "text": "d e f g",
+        "title": "Flu",
+    }
+    cold = builder._topic_id("abc")
+    assert metadata[2]["original_id"] == cold
+    assert metadata[2]["passage_id"] == cold * 1000
+
+
+def test_prepare_documents_caps_passages_per_topic(monkeypatch):
+    monkeypatch.setattr(settings, "RAG_PASSAGE_WORDS", 2)
+    monkeypatch.setattr(settings, "RAG_PASSAGE_OVERLAP_WORDS", 0)
+    monkeypatch.setattr(builder, "PASSAGE_ID_STRIDE", 2)
+    df = pd.DataFrame(
+        [{"id": 3, "title": "Long", "description": "a b c d e f", "source_url": ""}]
+    )
+
+    texts, metadata = builder._prepare_documents(df)
+
+    assert texts == ["Long a b", "Long c d"]
+    assert [doc["passage_id"] for doc in metadata] == [6, 7]
+
+
+def test_generate_embeddings_fills_the_configured_dtype_in_chunks(
+    offline_builder, monkeypatch
+):
+    monkeypatch.setattr(settings, "RAG_EMBED_DTYPE", "float16")
+    monkeypatch.setattr(settings, "RAG_EMBED_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "RAG_EMBED_WORKERS", 4)
+    monkeypatch.setattr(builder, "EMBED_CHUNK_BATCHES", 2)
+    texts = [f"symptom {i}" for i in range(16)]
+
+    embeddings = builder._generate_embeddings(texts, "fake")
+
+    # The fake model has no multi-process pool, so the build falls back to
+    # encoding in this process.
+    assert embeddings.dtype == "float16"
+    assert offline_builder.calls == 4
+    expected = offline_builder.encode(texts, normalize_embeddings=True)
+    assert np.allclose(embeddings, expected, atol=1e-3)
@@ -0,0 +1,47 @@
+from app.utils import cache as cache_module
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = cache_module.TTLCache(max_size=2, ttl_seconds=10)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    now[0] = 11.0
+    assert cache.get("c") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_weighted_cache_evicts_past_max_weight():
+    cache = cache_module.TTLCache(max_size=10, ttl_seconds=10, max_weight=10, weigh=len)
+
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("a", "xxx")  # replacing an entry re-weighs it
+    assert cache.weight == 7
+    cache.set("c", "xxxxx")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "xxx"
+    assert cache.stats()["weight"] == 8
+
+
+def test_disabled_cache_never_stores():
+    cache = cache_module.TTLCache(max_size=0, ttl_seconds=10)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_normalize_cache_text_folds_case_and_whitespace():
+    assert cache_module.normalize_cache_text("  My stomach\n HURTS ") == (
+        "my stomach hurts"
+    )
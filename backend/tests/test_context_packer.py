@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import context_packer
+
+MODEL = "test-model"
+
+
+class WordTokenizer:
+    def encode(self, text, add_special_tokens=True):
+        return text.split()
+
+
+@pytest.fixture
+def packer(fake_model, monkeypatch):
+    monkeypatch.setitem(context_packer._tokenizers, MODEL, WordTokenizer())
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGETS", {MODEL: 200})
+    monkeypatch.setattr(settings, "CONTEXT_MAX_DOC_TOKENS", 120)
+    monkeypatch.setattr(settings, "CONTEXT_PASSAGE_TOKENS", 10)
+
+    def encode(texts):
+        return fake_model.encode(texts, normalize_embeddings=True)
+
+    return encode
+
+
+def _doc(doc_id, text, score):
+    return {
+        "original_id": doc_id,
+        "source": "medlineplus.gov",
+        "text": text,
+        "score": score,
+    }
+
+
+def test_counts_with_the_model_tokenizer_or_falls_back_to_chars(monkeypatch):
+    monkeypatch.setitem(context_packer._tokenizers, MODEL, WordTokenizer())
+    monkeypatch.setitem(context_packer._tokenizers, "offline-model", None)
+
+    assert context_packer.count_tokens("three short words", MODEL) == 3
+    assert context_packer.count_tokens("three short words", "offline-model") == 5
+    # A tokenizer that was not preloaded is never fetched on the request path.
+    assert context_packer.count_tokens("three short words", "unloaded-model") == 5
+    assert "unloaded-model" not in context_packer._tokenizers
+
+
+def test_mmr_skips_near_duplicates():
+    vectors = np.array([[1.0, 0.0], [0.995, 0.0998], [0.0, 1.0]], dtype="float32")
+    relevance = np.array([1.0, 0.99, 0.8], dtype="float32")
+
+    assert context_packer.mmr_order(relevance, vectors, 2, lambda_=0.7) == [0, 2]
+    assert context_packer.mmr_order(relevance, vectors, 2, lambda_=1.0) == [0, 1]
+
+
+def test_pack_context_drops_redundant_docs(packer):
+    docs = [
+        _doc(1, "Flu: fever cough and aches.", 0.9),
+        _doc(2, "Influenza: fever cough and aches.", 0.89),
+        _doc(3, "Migraine: throbbing headache.", 0.6),
+    ]
+    vectors = packer([doc["text"] for doc in docs])
+
+    context = context_packer.pack_context(
+        docs, vectors, packer(["fever"])[0], 2, MODEL, packer
+    )
+
+    assert "DOCUMENT ID: 1" in context
+    assert "DOCUMENT ID: 3" in context
+    assert "DOCUMENT ID: 2" not in context
+
+
+def test_long_docs_are_trimmed_to_relevant_passages(packer):
+    filler = " ".join(
+        f"Unrelated sentence number {i} about nothing." for i in range(60)
+    )
+    text = f"Disease/Topic: Asthma. {filler} Wheezing and shortness of breath at night."
+    doc = _doc(1, text, 0.8)
+
+    context = context_packer.pack_context(
+        [doc],
+        packer([text]),
+        packer(["wheezing shortness of breath at night"])[0],
+        1,
+        MODEL,
+        packer,
+    )
+
+    assert context_packer.count_tokens(context, MODEL) < len(text.split())
+    assert "Disease/Topic: Asthma." in context
+    assert "Wheezing and shortness of breath at night." in context
+    assert "..." in context
+    assert context_packer.count_tokens(context, MODEL) <= 200
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.domain.models import ChatMessage
+from app.services import context_packer, conversation_retrieval, rag_service
+from app.services.conversation_retrieval import ConversationRetrieval
+from app.services.doc_store import DocStore, write_doc_store
+from app.services.vector_index import build_index
+
+MODEL = "test-model"
+
+DOCS = [
+    {"original_id": 1, "text": "headache pain head migraine"},
+    {"original_id": 2, "text": "fever temperature chills"},
+    {"original_id": 3, "text": "stomach pain belly nausea"},
+    {"original_id": 4, "text": "rash skin itchy red"},
+]
+
+
+class WordTokenizer:
+    def encode(self, text, add_special_tokens=True):
+        return text.split()
+
+
+@pytest.fixture
+def rag(fake_model, tmp_path):
+    docs = [{**doc, "source": "medlineplus.gov"} for doc in DOCS]
+    ids = [doc["original_id"] for doc in docs]
+    index, params = build_index(
+        fake_model.encode([d["text"] for d in docs], normalize_embeddings=True),
+        "flat",
+        ids=ids,
+    )
+    paths = [tmp_path / "docs.bin", tmp_path / "offsets.npy", tmp_path / "ids.npy"]
+    write_doc_store(docs, ids, *paths)
+
+    service = rag_service.RAG()
+    service.index = index
+    service.index_params = params
+    service.docs = DocStore(*paths).open()
+    yield service
+    service.docs.close()
+
+
+@pytest.fixture
+def conversation_rag(rag, monkeypatch):
+    monkeypatch.setitem(context_packer._tokenizers, MODEL, WordTokenizer())
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGETS", {MODEL: 200})
+    monkeypatch.setattr(settings, "CONTEXT_PASSAGE_TOKENS", 2)
+    monkeypatch.setattr(settings, "RAG_MIN_SIMILARITY", -1.0)
+    monkeypatch.setattr(settings, "RAG_MAX_SCORE_GAP", 2.0)
+    monkeypatch.setattr(conversation_retrieval, "get_rag_service", lambda: rag)
+
+    searches = []
+    query = rag.query
+
+    def counting_query(text, k, **kwargs):
+        searches.append(text)
+        return query(text, k, **kwargs)
+
+    monkeypatch.setattr(rag, "query", counting_query)
+    return searches
+
+
+def test_short_replies_reuse_the_previous_context(conversation_rag):
+    conversation = ConversationRetrieval()
+
+    first = conversation.retrieve("My head hurts, migraine headache", 2, MODEL)
+    vector = conversation.vector.copy()
+    second = conversation.retrieve("no", 2, MODEL)
+    assert (conversation.vector == vector).all()
+    third = conversation.retrieve("yes", 2, MODEL)
+
+    assert "DOCUMENT ID: 1" in first
+    assert second == first
+    assert third == first
+    assert conversation_rag == ["My head hurts, migraine headache"]
+
+
+def test_a_new_symptom_searches_again_and_keeps_earlier_docs_first(
+    conversation_rag,
+):
+    conversation = ConversationRetrieval()
+
+    conversation.retrieve("migraine headache head pain", 2, MODEL)
+    first_ids = list(conversation.doc_ids)
+    context = conversation.retrieve("also an itchy red skin rash", 2, MODEL)
+
+    assert len(conversation_rag) == 2
+    assert "migraine" in conversation_rag[1] and "rash" in conversation_rag[1]
+    assert 4 in conversation.doc_ids
+    kept = [doc_id for doc_id in conversation.doc_ids if doc_id in first_ids]
+    assert conversation.doc_ids[: len(kept)] == kept
+    assert context.index("DOCUMENT ID: 4") > 0
+
+
+def test_state_round_trips_through_json(conversation_rag):
+    conversation = ConversationRetrieval.from_history(
+        [
+            ChatMessage(role="user", content="migraine headache head pain"),
+            ChatMessage(role="assistant", content="How long has it hurt?"),
+        ]
+    )
+    context = conversation.retrieve("two days", 2, MODEL)
+    state = conversation.to_dict()
+
+    # Ids and float16 vectors only; the context text is rebuilt from the ids.
+    assert "context" not in state
+    assert isinstance(state["vector"], str)
+    assert len(json.dumps(state)) < 1500
+    restored = ConversationRetrieval.from_dict(json.loads(json.dumps(state)))
+
+    assert restored.retrieve("no", 2, MODEL) == context
+    assert restored.retrieve("no", 3, MODEL) != ""
+    assert len(conversation_rag) == 2  # a different k needs a new context
+
+
+def test_only_the_last_turns_of_posted_history_are_replayed(monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_QUERY_MESSAGES", 2)
+    history = [ChatMessage(role="user", content=f"turn {i}") for i in range(10)]
+
+    conversation = ConversationRetrieval.from_history(history)
+
+    assert conversation._pending == ["turn 8", "turn 9"]
@@ -0,0 +1,24 @@
+import numpy as np
+
+from app.services.doc_store import DocStore, write_doc_store
+
+
+def test_doc_store_round_trip(tmp_path):
+    docs = [
+        {"original_id": np.int64(7), "title": "Zawroty głowy", "text": "ü" * 1000},
+        {"original_id": 8, "title": "Fever", "text": ""},
+    ]
+    paths = [tmp_path / "docs.bin", tmp_path / "docs_offsets.npy", tmp_path / "ids.npy"]
+
+    assert write_doc_store(docs, [70, 8], *paths) == 2
+    assert all(path.exists() for path in paths)
+
+    store = DocStore(*paths).open()
+    try:
+        assert len(store) == 2
+        assert store.get(0) == {"original_id": 8, "title": "Fever", "text": ""}
+        assert store.get_by_id(70)["title"] == "Zawroty głowy"
+        assert store.get_by_id(70)["original_id"] == 7
+        assert store.get_by_id(9) is None
+    finally:
+        store.close()
@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import hashlib
+import io
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+from PIL import ExifTags, Image
+
+from app import main
+from app.core.config import settings
+from app.core.exceptions import ImageTooLarge
+from app.services import image_pipeline
+
+
+def _image_bytes(size, format="JPEG", mode="RGB", orientation=None):
+    image = Image.effect_noise(size, 64).convert(mode)
+    if mode == "RGBA":
+        image.putalpha(128)
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[ExifTags.Base.Orientation] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, exif=exif, quality=95)
+    return buffer.getvalue()
+
+
+def _prepare(content):
+    return image_pipeline.prepare_image(content, hashlib.sha256(content).hexdigest())
+
+
+def _decode(result):
+    return Image.open(io.BytesIO(base64.b64decode(result["data"])))
+
+
+@pytest.fixture(autouse=True)
+def image_settings(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_MAX_DIMENSION", 256)
+    monkeypatch.setattr(settings, "IMAGE_FORMAT", "JPEG")
+    monkeypatch.setattr(settings, "IMAGE_QUALITY", 80)
+    monkeypatch.setattr(image_pipeline, "_image_cache", image_pipeline.TTLCache(16, 60))
+
+
+def test_large_images_are_downscaled_and_reencoded():
+    content = _image_bytes((1200, 900))
+
+    result = _prepare(content)
+
+    image = _decode(result)
+    assert result["mime"] == "image/jpeg"
+    assert image.size == (256, 192)
+    assert len(base64.b64decode(result["data"])) < len(content) / 4
+
+
+def test_exif_orientation_is_applied():
+    content = _image_bytes((300, 100), orientation=6)  # rotate 90 degrees
+
+    image = _decode(_prepare(content))
+
+    assert image.size == (85, 256)
+    assert image.getexif().get(ExifTags.Base.Orientation, 1) == 1
+
+
+def test_transparent_png_becomes_jpeg_or_webp(monkeypatch):
+    content = _image_bytes((400, 400), format="PNG", mode="RGBA")
+
+    assert _prepare(content)["mime"] == "image/jpeg"
+
+    monkeypatch.setattr(settings, "IMAGE_FORMAT", "webp")
+    result = _prepare(content)
+    assert result["mime"] == "image/webp"
+    assert _decode(result).mode == "RGBA"
+
+
+def test_small_upright_images_are_forwarded_unchanged():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 40, 40)).save(buffer, format="PNG")
+    content = buffer.getvalue()
+
+    result = _prepare(content)
+
+    assert result == {
+        "data": base64.b64encode(content).decode("utf-8"),
+        "mime": "image/png",
+    }
+
+
+def test_resent_images_are_served_from_the_cache(monkeypatch):
+    content = _image_bytes((800, 600))
+    first = _prepare(content)
+
+    def fail(*args):
+        raise AssertionError("image processed twice")
+
+    monkeypatch.setattr(image_pipeline, "_transcode", fail)
+
+    assert _prepare(content) == first
+    assert image_pipeline._image_cache.stats()["hits"] == 1
+
+
+def test_read_upload_stops_at_the_size_limit(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_READ_CHUNK_BYTES", 1024)
+    content = b"x" * 10_000
+
+    data, digest = asyncio.run(
+        image_pipeline.read_upload(UploadFile(io.BytesIO(content)), 10_000)
+    )
+    assert data == content
+    assert digest == hashlib.sha256(content).hexdigest()
+
+    upload = UploadFile(io.BytesIO(content))
+    with pytest.raises(ImageTooLarge):
+        asyncio.run(image_pipeline.read_upload(upload, 4096))
+    assert upload.file.tell() <= 4096 + 1024
+
+
+def test_ask_rejects_oversized_and_invalid_images(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_MAX_UPLOAD_BYTES", 1024)
+    monkeypatch.setattr(main, "guard_input", lambda message, embedding=None: None)
+
+    async def fake_retrieve(*args, **kwargs):
+        return "context"
+
+    monkeypatch.setattr(main, "retrieve_context", fake_retrieve)
+    client = TestClient(main.app)
+
+    too_large = client.post(
+        "/ask",
+        data={"message": "Look at this"},
+        files={"images": ("rash.jpg", b"x" * 4096, "image/jpeg")},
+    )
+    not_an_image = client.post(
+        "/ask",
+        data={"message": "Look at this"},
+        files={"images": ("rash.jpg", b"not an image", "image/jpeg")},
+    )
+
+    assert too_large.status_code == 413
+    assert not_an_image.status_code == 422
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import llm_service
+from tests.fake_provider import PROVIDER_JITTER, PROVIDER_LATENCY
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONCURRENT_INTERVIEWS = 100
+ARRIVAL_INTERVAL = 0.002
+# Longest the event loop may stall while the interviews are in flight.
+MAX_LOOP_LAG = 0.1
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def provider_url():
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "tests.fake_provider:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BACKEND_DIR,
+    )
+
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{url}/docs", timeout=0.5)
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+    yield url
+
+    server.terminate()
+    server.wait(timeout=5)
+
+
+@pytest.fixture
+def async_client(provider_url, monkeypatch):
+    monkeypatch.setattr(settings, "GROQ_BASE_URL", provider_url)
+    monkeypatch.setattr(llm_service, "_groq_client", None)
+    monkeypatch.setattr(llm_service, "_get_rag_context", lambda *args: "")
+    yield
+    llm_service._groq_client = None
+
+
+async def _measure_loop_lag(stop: asyncio.Event, interval: float = 0.01):
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - start - interval)
+    return max_lag
+
+
+async def _interviews():
+    async def interview(i: int):
+        # Patients arrive a couple of ms apart rather than in one tick; the
+        # whole burst still lands within one provider round-trip, so all
+        # interviews are in flight at once.
+        await asyncio.sleep(i * ARRIVAL_INTERVAL)
+        return await llm_service.chat_once(f"Headache number {i}", history=[])
+
+    return await asyncio.gather(*[interview(i) for i in range(CONCURRENT_INTERVIEWS)])
+
+
+async def _run_interviews():
+    # The first burst builds the client and opens the pooled connections;
+    # the measured one is what a warmed-up server sees.
+    await _interviews()
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_loop_lag(stop))
+
+    start = time.perf_counter()
+    results = await _interviews()
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    max_lag = await lag_task
+    await llm_service.close_groq_client()
+    return results, elapsed, max_lag
+
+
+def test_chat_once_does_not_block_event_loop(async_client):
+    results, elapsed, max_lag = asyncio.run(_run_interviews())
+
+    assert len(results) == CONCURRENT_INTERVIEWS
+    assert all(
+        (r["type"], r["message"]) == ("chat", "How long have you had it?")
+        for r in results
+    )
+
+    # A blocking client would serialise the calls (~100 round-trips) and
+    # stall the loop for a full round-trip per interview.
+    assert CONCURRENT_INTERVIEWS * ARRIVAL_INTERVAL < PROVIDER_LATENCY - PROVIDER_JITTER
+    assert elapsed < PROVIDER_LATENCY * 4
+    assert max_lag < MAX_LOOP_LAG
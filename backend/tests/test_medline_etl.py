@@ -0,0 +1,101 @@
+import json
+
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from scripts import medline_data_rag as etl
+
+FIXTURE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<health-topics total="3">
+  <health-topic id="1" title="Headache" url="https://medlineplus.gov/headache.html">
+    <also-called>Cephalalgia</also-called>
+    <full-summary>&lt;p&gt;Pain in the &lt;b&gt;head&lt;/b&gt;.&lt;/p&gt;</full-summary>
+  </health-topic>
+  <health-topic id="2" title="Dolor de cabeza" url="https://medlineplus.gov/spanish/headache.html">
+    <full-summary>&lt;p&gt;Dolor.&lt;/p&gt;</full-summary>
+  </health-topic>
+  <health-topic id="3" title="Fever" url="https://medlineplus.gov/fever.html">
+  </health-topic>
+</health-topics>
+"""
+
+URL = "https://example.org/mplus_topics.xml"
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start : start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fixture_xml(knowledge_base):
+    path = knowledge_base / "fixture.xml"
+    path.write_text(FIXTURE_XML, encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_processes_fixture_xml_offline(fixture_xml, monkeypatch, workers):
+    monkeypatch.setattr(settings, "ETL_WORKERS", workers)
+    monkeypatch.setattr(settings, "ETL_CHUNK_SIZE", 1)
+    monkeypatch.setattr(etl.requests, "get", pytest.fail)
+
+    count = etl.download_and_process(xml_path=str(fixture_xml))
+
+    df = pd.read_csv(settings.RAG_DATA_PATH).fillna("")
+    assert count == 2
+    assert df["id"].tolist() == [1, 3]
+    assert df["description"].tolist() == ["Pain in the head .", ""]
+    assert set(df["source_name"]) == {"MedlinePlus"}
+
+
+def test_revalidates_cache_with_etag(knowledge_base, monkeypatch):
+    cache = str(knowledge_base / "cache.xml")
+    meta = str(knowledge_base / "cache.json")
+    requests_seen = []
+
+    def fake_get(url, headers, **kwargs):
+        requests_seen.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304)
+        return FakeResponse(
+            200, FIXTURE_XML.encode("utf-8"), {"ETag": '"v1"', "Last-Modified": "x"}
+        )
+
+    monkeypatch.setattr(etl.requests, "get", fake_get)
+
+    assert etl.fetch_xml(URL, cache, meta) == cache
+    assert etl.fetch_xml(URL, cache, meta) == cache
+
+    assert requests_seen[0] == {}
+    assert requests_seen[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "x"}
+    with open(meta, encoding="utf-8") as f:
+        assert json.load(f)["etag"] == '"v1"'
+    with open(cache, encoding="utf-8") as f:
+        assert f.read() == FIXTURE_XML
+
+
+def test_falls_back_to_cache_when_download_fails(knowledge_base, monkeypatch):
+    cache = knowledge_base / "cache.xml"
+    cache.write_text(FIXTURE_XML, encoding="utf-8")
+
+    def failing_get(*args, **kwargs):
+        raise etl.requests.ConnectionError("offline")
+
+    monkeypatch.setattr(etl.requests, "get", failing_get)
+
+    assert etl.fetch_xml(URL, str(cache), str(knowledge_base / "m.json")) == str(cache)
+    assert etl.fetch_xml(URL, str(knowledge_base / "none.xml"), "m.json") is None
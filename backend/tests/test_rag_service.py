@@ -0,0 +1,219 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import rag_service
+from app.services.doc_store import DocStore, write_doc_store
+from app.services.sparse_index import BM25Index, build_bm25_index
+from app.services.vector_index import build_index
+
+DOCS = [
+    {"original_id": 1, "title": "Headache", "text": "headache pain head migraine"},
+    {"original_id": 2, "title": "Fever", "text": "fever temperature chills"},
+    {"original_id": 3, "title": "Stomach ache", "text": "stomach pain belly nausea"},
+    {"original_id": 4, "title": "Rash", "text": "rash skin itchy red"},
+]
+
+
+@pytest.fixture
+def rag(fake_model, tmp_path):
+    ids = [doc["original_id"] for doc in DOCS]
+    index, params = build_index(
+        fake_model.encode([d["text"] for d in DOCS], normalize_embeddings=True),
+        "flat",
+        ids=ids,
+    )
+    paths = [tmp_path / "docs.bin", tmp_path / "offsets.npy", tmp_path / "ids.npy"]
+    write_doc_store(DOCS, ids, *paths)
+
+    service = rag_service.RAG()
+    service.index = index
+    service.index_params = params
+    service.docs = DocStore(*paths).open()
+    yield service
+    service.docs.close()
+
+
+def test_query_returns_cosine_scores_best_first(rag):
+    results = rag.query("migraine headache", k=4, min_score=-1.0, max_score_gap=2.0)
+
+    assert results[0]["original_id"] == 1
+    assert results[0]["score"] == pytest.approx(np.sqrt(2) / 2, abs=1e-5)
+    scores = [doc["score"] for doc in results]
+    assert scores == sorted(scores, reverse=True)
+    assert "score" not in DOCS[0]
+
+
+def test_query_drops_documents_below_similarity_floor(rag, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_MIN_SIMILARITY", 0.3)
+    monkeypatch.setattr(settings, "RAG_MAX_SCORE_GAP", 2.0)
+
+    results = rag.query("itchy skin", k=4)
+
+    assert [doc["original_id"] for doc in results] == [4]
+
+
+def test_query_applies_score_gap_relative_to_best_hit(rag):
+    results = rag.query("stomach pain", k=4, min_score=0.0, max_score_gap=0.2)
+
+    assert [doc["original_id"] for doc in results] == [3]
+
+
+def test_embedding_context_encodes_once(fake_model, rag):
+    embedding = rag_service.EmbeddingContext("fever and chills")
+
+    rag.query(embedding.text, k=2, embedding=embedding)
+    rag.query(embedding.text, k=2, embedding=embedding)
+
+    assert fake_model.calls == 2  # one for building the index, one for the query
+
+
+def test_repeated_queries_hit_the_caches(fake_model, rag, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_PASSAGE_FETCH_FACTOR", 1)
+    searches = []
+    search = rag.index.search
+    monkeypatch.setattr(
+        rag.index, "search", lambda *a: searches.append(a) or search(*a), raising=False
+    )
+
+    first = rag.query("Fever and chills", k=2)
+    again = rag.query("  fever AND chills ", k=2)
+    rag.query("fever and chills", k=3)
+
+    assert again == first
+    assert len(searches) == 2  # k=3 is a separate retrieval entry
+    assert fake_model.calls == 2  # the query vector itself was encoded once
+    assert rag._retrieval_cache.hits == 1
+
+
+def test_hybrid_query_fuses_dense_and_bm25_hits(rag, tmp_path):
+    build_bm25_index(
+        [f"{doc['title']} {doc['text']}" for doc in DOCS],
+        [doc["original_id"] for doc in DOCS],
+        str(tmp_path / "bm25"),
+    )
+    rag.bm25 = BM25Index(str(tmp_path / "bm25")).open()
+
+    dense = rag.query("belly nausea", k=2, mode="dense")
+    hybrid = rag.query("belly nausea", k=2, mode="hybrid")
+
+    assert [doc["original_id"] for doc in hybrid][0] == 3
+    assert hybrid[0]["bm25_score"] > 0
+    assert hybrid[0]["dense_score"] == pytest.approx(dense[0]["score"])
+    assert hybrid[0]["score"] == pytest.approx(2 / 61)
+
+    # A strong lexical-only match still surfaces when the dense floor drops it.
+    lexical = rag.query("itchy red rash", k=2, min_score=0.99, mode="hybrid")
+    assert [doc["original_id"] for doc in lexical] == [4]
+    assert "dense_score" not in lexical[0]
+
+    # Sharing one word of the query is below the BM25 floor: nothing leaks in.
+    weak = rag.query(
+        "itchy since yesterday morning", k=2, min_score=0.99, mode="hybrid"
+    )
+    assert weak == []
+
+
+def test_embedding_batcher_coalesces_concurrent_callers(fake_model):
+    from concurrent.futures import ThreadPoolExecutor
+
+    batcher = rag_service.EmbeddingBatcher(max_batch=64, max_wait_ms=50)
+    texts = [f"symptom number {i}" for i in range(32)]
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        vectors = list(pool.map(batcher.encode, texts))
+
+    expected = fake_model.encode(texts, normalize_embeddings=True)
+    for row, vector in enumerate(vectors):
+        assert vector.shape == (1, expected.shape[1])
+        np.testing.assert_allclose(vector[0], expected[row])
+    assert batcher.encoded == 32
+    assert batcher.batches < 8
+
+
+def test_embedding_batcher_propagates_errors(monkeypatch):
+    def broken_encode(texts):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr(rag_service, "_encode_batch", broken_encode)
+    batcher = rag_service.EmbeddingBatcher(max_batch=8, max_wait_ms=1)
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        batcher.encode("headache")
+
+
+def test_doc_vectors_are_read_back_from_the_index(fake_model, rag):
+    docs = rag_service.group_passages([DOCS[2], DOCS[0]], k=2)
+
+    vectors = rag.doc_vectors(docs)
+
+    expected = fake_model.encode([d["text"] for d in docs], normalize_embeddings=True)
+    np.testing.assert_allclose(vectors, expected, atol=1e-6)
+
+
+def test_doc_vectors_are_read_back_from_an_ivf_index(fake_model, rag, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_IVF_NLIST", 1)
+    ids = [doc["original_id"] for doc in DOCS]
+    rag.index, rag.index_params = build_index(
+        fake_model.encode([d["text"] for d in DOCS], normalize_embeddings=True),
+        "ivf_flat",
+        ids=ids,
+    )
+    monkeypatch.setattr(rag, "encode", None)  # no re-encoding fallback
+    docs = rag_service.group_passages([DOCS[3], DOCS[1]], k=2)
+
+    vectors = rag.doc_vectors(docs)
+
+    expected = fake_model.encode([d["text"] for d in docs], normalize_embeddings=True)
+    np.testing.assert_allclose(vectors, expected, atol=1e-6)
+
+
+def test_query_reranks_candidates_and_keeps_the_top_few(rag, monkeypatch):
+    from app.services import reranker
+    from tests.test_reranker import FakeCrossEncoder
+
+    model = FakeCrossEncoder()
+    monkeypatch.setattr(reranker, "_reranker", reranker.Reranker(model, 1000, 100, 60))
+    monkeypatch.setattr(settings, "RERANK_CANDIDATES", 4)
+    monkeypatch.setattr(settings, "RERANK_TOP_K", 2)
+
+    results = rag.query(
+        "red itchy skin pain", k=4, min_score=-1.0, max_score_gap=2.0, rerank=True
+    )
+
+    assert model.pairs == [4]
+    assert [doc["original_id"] for doc in results] == [4, 1]
+    assert results[0]["score"] == 3.0
+
+
+def test_passages_are_grouped_per_topic_without_overlap():
+    def passage(number, text, body_start=0, topic=7):
+        return {
+            "original_id": topic,
+            "passage_id": rag_service.passage_id(topic, number),
+            "passage": number,
+            "body_start": body_start,
+            "title": "Asthma",
+            "source": "u",
+            "text": text,
+            "score": 1.0 - number / 10,
+        }
+
+    ranked = [
+        passage(2, "wheezing at night and coughing", body_start=3),
+        passage(0, "Asthma is a lung disease"),
+        passage(0, "Fever is a high temperature", topic=8),
+        passage(1, "lung disease that causes wheezing at night", body_start=2),
+        passage(5, "inhalers help", body_start=2),
+    ]
+
+    topics = rag_service.group_passages(ranked, k=2)
+
+    assert [t["original_id"] for t in topics] == [7, 8]
+    assert topics[0]["score"] == pytest.approx(0.8)
+    assert topics[0]["passage_ids"] == [7002, 7000, 7001]
+    assert topics[0]["text"] == (
+        "Disease/Topic: Asthma\nDescription: Asthma is a lung disease "
+        "that causes wheezing at night and coughing\nSource: u"
+    )
+    assert "passage" not in topics[0]
@@ -0,0 +1,86 @@
+import re
+import time
+
+import pytest
+
+from app.services import reranker as reranker_module
+from app.services.reranker import Reranker
+
+DOCS = [
+    {"original_id": 1, "text": "Fever and chills", "score": 0.9},
+    {"original_id": 2, "text": "Migraine headache with aura", "score": 0.8},
+    {"original_id": 3, "text": "Headache after a head injury", "score": 0.7},
+    {"original_id": 4, "text": "Rash on the skin", "score": 0.6},
+]
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the number of query words found in the document."""
+
+    def __init__(self, seconds_per_pair=0.0):
+        self.seconds_per_pair = seconds_per_pair
+        self.pairs = []
+
+    def predict(self, pairs, batch_size=32, **_):
+        self.pairs.append(len(pairs))
+        time.sleep(self.seconds_per_pair * len(pairs))
+        return [
+            float(len(set(re.findall(r"\w+", q.lower())) & set(d.lower().split())))
+            for q, d in pairs
+        ]
+
+
+def test_rerank_orders_by_cross_encoder_score_in_one_batch():
+    model = FakeCrossEncoder()
+    reranker = Reranker(model, budget_ms=1000, cache_size=100, ttl_seconds=60)
+
+    ranked = reranker.rerank("migraine headache aura", DOCS)
+
+    assert [doc["original_id"] for doc in ranked][:2] == [2, 3]
+    assert ranked[0]["score"] == 3.0
+    assert ranked[0]["retrieval_score"] == 0.8
+    assert model.pairs == [4]
+
+
+def test_scores_are_cached_per_query_and_doc():
+    model = FakeCrossEncoder()
+    reranker = Reranker(model, budget_ms=1000, cache_size=100, ttl_seconds=60)
+
+    reranker.rerank("Headache", DOCS[:2])
+    reranker.rerank("  headache ", DOCS)
+
+    assert model.pairs == [2, 2]  # only docs 3 and 4 were new
+    assert reranker.stats()["score_cache"]["hits"] == 2
+
+
+def test_index_reload_drops_cached_scores(monkeypatch):
+    model = FakeCrossEncoder()
+    reranker = Reranker(model, budget_ms=1000, cache_size=100, ttl_seconds=60)
+    monkeypatch.setattr(reranker_module, "_reranker", reranker)
+
+    reranker.rerank("headache", DOCS[:2])
+    reranker_module.clear_rerank_cache()  # what RAG.load_index calls
+    reranker.rerank("headache", DOCS[:2])
+
+    assert model.pairs == [2, 2]
+
+
+def test_budget_limits_scored_docs_and_skips_when_too_few_fit():
+    model = FakeCrossEncoder(seconds_per_pair=0.02)
+    reranker = Reranker(model, budget_ms=50, cache_size=100, ttl_seconds=60)
+    reranker.warm_up()
+    assert reranker.stats()["ms_per_pair"] == pytest.approx(20, rel=0.5)
+
+    ranked = reranker.rerank("rash skin", DOCS, min_docs=2)
+
+    assert model.pairs[-1] == 2  # ~20ms per pair, 50ms budget
+    assert [doc["original_id"] for doc in ranked] == [1, 2, 3, 4]
+    # The unscored tail keeps its cosine as retrieval_score but never outranks
+    # the re-ranked head on "score" (both head docs scored 0 for this query).
+    assert [doc["score"] for doc in ranked] == [0.0, 0.0, 0.0, 0.0]
+    assert [doc["retrieval_score"] for doc in ranked[2:]] == [0.7, 0.6]
+
+    # Cached pairs are free: the two remaining docs now fit as well.
+    assert len(reranker.rerank("rash skin", DOCS, min_docs=4)) == 4
+    assert reranker.rerank("chills", DOCS, min_docs=4) is None
+    assert reranker.stats()["skipped"] == 1
@@ -0,0 +1,108 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.domain.models import ChatMessage
+from app.services import llm_service, response_cache
+from app.services.response_cache import SemanticResponseCache
+
+FOLLOW_UP = {
+    "type": "chat",
+    "message": "How long have you had the headache?",
+    "source": "provide_response",
+}
+
+
+def _vector(*values):
+    return np.array([values], dtype="float32")
+
+
+def test_lookup_hits_near_duplicates_only():
+    cache = SemanticResponseCache(threshold=0.9, max_size=10, ttl_seconds=60)
+    cache.store(_vector(1, 0, 0), "k5", FOLLOW_UP)
+
+    assert cache.lookup(_vector(1, 0.1, 0), "k5") == FOLLOW_UP
+    assert cache.lookup(_vector(1, 1, 0), "k5") is None  # cos 0.71
+    assert cache.lookup(_vector(1, 0, 0), "k3") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_entries_expire_and_lru_is_evicted(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticResponseCache(threshold=0.9, max_size=2, ttl_seconds=10)
+
+    cache.store(_vector(1, 0, 0), None, {"message": "a"})
+    cache.store(_vector(0, 1, 0), None, {"message": "b"})
+    assert cache.lookup(_vector(1, 0, 0), None) == {"message": "a"}
+    cache.store(_vector(0, 0, 1), None, {"message": "c"})
+
+    assert cache.lookup(_vector(0, 1, 0), None) is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] = 11.0
+    assert cache.lookup(_vector(1, 0, 0), None) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 1
+
+
+@pytest.fixture
+def cached_chat(fake_model, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_THRESHOLD", 0.9)
+    monkeypatch.setattr(response_cache, "_response_cache", None)
+
+    calls = []
+
+    async def fake_retry_chat(current_message, **kwargs):
+        calls.append(current_message)
+        return dict(results.pop(0))
+
+    results = []
+    monkeypatch.setattr(llm_service, "run_with_retry_chat", fake_retry_chat)
+    return calls, results
+
+
+def _ask(message, history=()):
+    return asyncio.run(
+        llm_service.run_with_response_cache(message, history=list(history))
+    )
+
+
+def test_first_turn_follow_up_is_served_from_cache(cached_chat):
+    calls, results = cached_chat
+    results.append(FOLLOW_UP)
+
+    assert _ask("I have a headache") == FOLLOW_UP
+    assert _ask("i have a  HEADACHE") == FOLLOW_UP
+    assert calls == ["I have a headache"]
+
+
+def test_reports_and_later_turns_are_not_cached(cached_chat):
+    calls, results = cached_chat
+    report = {"type": "report", "data": {"diagnosis": "Migraine"}}
+    history = [ChatMessage(role="user", content="hi")]
+    results.extend([report, report, FOLLOW_UP, FOLLOW_UP])
+
+    _ask("I have a headache")
+    _ask("I have a headache")
+    _ask("I have a headache", history)
+    _ask("I have a headache", history)
+
+    assert len(calls) == 4
+    assert response_cache.get_response_cache().stats()["stores"] == 0
+
+
+@pytest.mark.parametrize("message", [None, "", {"text": "How long?"}, 42])
+def test_invalid_follow_ups_are_not_cached(cached_chat, message):
+    calls, results = cached_chat
+    invalid = {**FOLLOW_UP, "message": message}
+    results.extend([invalid, FOLLOW_UP])
+
+    assert _ask("I have a headache") == invalid
+    assert _ask("I have a headache") == FOLLOW_UP
+    assert len(calls) == 2
+    assert response_cache.get_response_cache().stats()["stores"] == 1
@@ -0,0 +1,163 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.domain.models import ChatMessage
+from app.services import session_store
+from app.services.session_store import InMemorySessionStore, RedisSessionStore
+from tests.fake_redis import FakeRedis
+
+
+def _turn(text):
+    return [
+        ChatMessage(role="user", content=text),
+        ChatMessage(role="assistant", content=f"re: {text}"),
+    ]
+
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    store = InMemorySessionStore(max_sessions=100, ttl_seconds=60, max_messages=50)
+    monkeypatch.setattr(session_store, "_session_store", store)
+    return store
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    histories = []
+
+    monkeypatch.setattr(main, "guard_input", lambda message, embedding=None: None)
+
+    async def fake_retrieve(*args, **kwargs):
+        return "context"
+
+    async def fake_run(**kwargs):
+        histories.append([message.content for message in kwargs["history"]])
+        return {"type": "chat", "message": f"reply {len(histories)}"}
+
+    monkeypatch.setattr(main, "retrieve_context", fake_retrieve)
+    monkeypatch.setattr(main, "run_with_response_cache", fake_run)
+    return histories
+
+
+def test_memory_store_appends_and_caps_messages():
+    store = InMemorySessionStore(max_sessions=10, ttl_seconds=60, max_messages=3)
+
+    session_id = store.create(_turn("first"))
+    store.append(session_id, _turn("second"))
+
+    assert [m.content for m in store.get(session_id)] == [
+        "re: first",
+        "second",
+        "re: second",
+    ]
+    assert store.get("unknown") is None
+
+
+def test_memory_store_expires_and_evicts_sessions():
+    store = InMemorySessionStore(max_sessions=2, ttl_seconds=0.05, max_messages=10)
+
+    first = store.create(_turn("a"))
+    second = store.create(_turn("b"))
+    third = store.create(_turn("c"))
+
+    assert store.get(first) is None  # evicted, least recently used
+    assert store.get(second) is not None
+    time.sleep(0.1)
+    assert store.get(third) is None
+
+
+def test_redis_store_round_trips_and_trims():
+    client = FakeRedis()
+    store = RedisSessionStore(client, ttl_seconds=30, max_messages=3)
+
+    session_id = store.create(_turn("first"))
+    store.append(session_id, _turn("second"))
+
+    messages = store.get(session_id)
+    assert all(isinstance(message, ChatMessage) for message in messages)
+    assert [m.content for m in messages] == ["re: first", "second", "re: second"]
+    assert client.ttls[f"session:{session_id}"] == 30
+    assert store.get("unknown") is None
+
+    store.set_state(session_id, {"doc_ids": [1, 2]})
+    assert store.get_state(session_id) == {"doc_ids": [1, 2]}
+    assert client.ttls[f"session:{session_id}:state"] == 30
+    assert store.get_state("unknown") is None
+
+
+def test_ask_continues_a_session_without_resending_history(memory_store, fake_llm):
+    client = TestClient(main.app)
+
+    first = client.post(
+        "/ask", data={"message": "My head hurts", "new_session": "true"}
+    ).json()
+    second = client.post(
+        "/ask",
+        data={
+            "message": "Since yesterday",
+            "session_id": first["session_id"],
+            "history": "not even json",
+        },
+    ).json()
+
+    assert second["session_id"] == first["session_id"]
+    assert fake_llm == [[], ["My head hurts", "reply 1"]]
+    assert [m.content for m in memory_store.get(first["session_id"])] == [
+        "My head hurts",
+        "reply 1",
+        "Since yesterday",
+        "reply 2",
+    ]
+
+
+def test_ask_without_new_session_keeps_nothing(memory_store, fake_llm):
+    response = TestClient(main.app).post("/ask", data={"message": "My head hurts"})
+
+    assert "session_id" not in response.json()
+    assert memory_store.stats()["size"] == 0
+
+
+def test_ask_caps_session_history_like_posted_history(
+    monkeypatch, memory_store, fake_llm
+):
+    monkeypatch.setattr(main, "MAX_HISTORY_LENGTH", 25)
+    session_id = memory_store.create(
+        [
+            ChatMessage(role="user", content="a" * 20),
+            ChatMessage(role="assistant", content="b" * 10),
+            ChatMessage(role="user", content="c" * 10),
+        ]
+    )
+
+    TestClient(main.app).post(
+        "/ask", data={"message": "And now?", "session_id": session_id}
+    )
+
+    assert fake_llm == [["b" * 10, "c" * 10]]
+    assert len(memory_store.get(session_id)) == 5
+
+
+def test_memory_store_evicts_past_its_byte_budget():
+    store = InMemorySessionStore(
+        max_sessions=100, ttl_seconds=60, max_messages=10, max_bytes=100
+    )
+
+    first = store.create([ChatMessage(role="user", content="x" * 60)])
+    store.set_state(first, {"doc_ids": [1]})
+    second = store.create([ChatMessage(role="user", content="y" * 60)])
+
+    assert store.get(first) is None
+    assert store.get(second) is not None
+    assert store.stats()["weight"] == 60
+
+
+def test_ask_with_unknown_session_returns_404(memory_store, fake_llm):
+    response = TestClient(main.app).post(
+        "/ask", data={"message": "Hello", "session_id": "expired"}
+    )
+
+    assert response.status_code == 404
+    assert fake_llm == []
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services.sparse_index import (
+    BM25Index,
+    build_bm25_index,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+TEXTS = [
+    "Headache: pain in the head. Migraine is a common headache.",
+    "Fever: high body temperature and chills.",
+    "Metformin is a drug used to treat type 2 diabetes.",
+    "Stomach ache and nausea after eating.",
+]
+IDS = [10, 20, 30, 40]
+
+
+@pytest.fixture
+def bm25(tmp_path):
+    path = tmp_path / "bm25"
+    build_bm25_index(TEXTS, IDS, str(path))
+    return BM25Index(str(path)).open()
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("What is the Metformin dose, 500mg?") == [
+        "metformin",
+        "dose",
+        "500mg",
+    ]
+
+
+def test_search_ranks_exact_terms_and_skips_non_matches(bm25):
+    scores, ids = bm25.search("metformin side effects", k=3)
+
+    assert ids.tolist() == [30]
+    assert scores[0] > 0
+
+    scores, ids = bm25.search("headache and fever", k=4)
+    assert set(ids.tolist()) == {10, 20}
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_term_frequency_and_rarity_raise_the_score(bm25):
+    _, ids = bm25.search("headache pain", k=4)
+    assert ids.tolist()[0] == 10
+
+    assert bm25.search("unknownword", k=4)[1].size == 0
+    assert bm25.search("", k=4)[1].size == 0
+
+
+def test_max_score_bounds_scores_and_counts_unknown_words(bm25):
+    scores, _ = bm25.search("metformin diabetes", k=1)
+    assert scores[0] == pytest.approx(bm25.max_score("metformin diabetes"))
+
+    scores, _ = bm25.search("metformin since yesterday", k=1)
+    assert scores[0] / bm25.max_score("metformin since yesterday") < 0.5
+
+
+def test_arrays_are_memory_mapped(bm25):
+    assert isinstance(bm25._postings, np.memmap)
+    assert isinstance(bm25._weights, np.memmap)
+    assert len(bm25) == len(TEXTS)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4]], k=3, rrf_k=60)
+
+    assert [doc_id for doc_id, _ in fused] == [3, 1, 2]
+    assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
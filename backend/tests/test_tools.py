@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from groq.types.chat import ChatCompletionMessageToolCall
+from pydantic import BaseModel
+
+from app.services import llm_service
+from app.utils import tools
+
+
+class EchoArgs(BaseModel):
+    text: str
+
+
+@pytest.fixture
+def register_tool(monkeypatch):
+    monkeypatch.setattr(tools, "tool_metrics", tools.ToolMetrics())
+
+    def register(name, implementation, timeout=1.0):
+        monkeypatch.setitem(
+            tools.TOOLS,
+            name,
+            {
+                "args_schema": EchoArgs,
+                "implementation": implementation,
+                "timeout": timeout,
+            },
+        )
+
+    return register
+
+
+def test_tool_runs_exactly_once_on_the_shared_executor(register_tool):
+    calls = []
+
+    def echo(text):
+        calls.append(threading.current_thread().name)
+        return text.upper()
+
+    register_tool("echo", echo)
+
+    result = asyncio.run(tools.execute_tool("echo", {"text": "hi"}))
+
+    assert result == {"ok": True, "result": "HI"}
+    assert len(calls) == 1
+    assert calls[0].startswith("tool")
+    assert tools.get_tool_executor() is tools.get_tool_executor()
+    assert tools.tool_metrics.snapshot()["echo"]["calls"] == 1
+
+
+def test_slow_tool_times_out_using_registry_timeout(register_tool):
+    register_tool("slow", lambda text: time.sleep(1.0), timeout=0.05)
+
+    start = time.perf_counter()
+    result = asyncio.run(tools.execute_tool("slow", {"text": "hi"}))
+    elapsed = time.perf_counter() - start
+
+    assert result == {"error": "timeout"}
+    assert elapsed < 0.5
+    stats = tools.tool_metrics.snapshot()["slow"]
+    assert stats["timeouts"] == 1
+    assert stats["errors"] == 0
+
+
+def test_failing_and_unknown_tools_report_errors(register_tool):
+    def broken(text):
+        raise RuntimeError("boom")
+
+    register_tool("broken", broken)
+
+    result = asyncio.run(tools.execute_tool("broken", {"text": "hi"}))
+    assert result == {"error": "tool_failed", "details": "boom"}
+    assert tools.tool_metrics.snapshot()["broken"]["errors"] == 1
+
+    assert asyncio.run(tools.execute_tool("missing", {})) == {
+        "error": "tool_not_allowed"
+    }
+
+
+def _tool_call(call_id, name, arguments='{"text": "hi"}'):
+    return ChatCompletionMessageToolCall(
+        id=call_id,
+        type="function",
+        function={"name": name, "arguments": arguments},
+    )
+
+
+def test_tool_calls_in_one_turn_run_concurrently_in_order(register_tool):
+    def sleepy(seconds):
+        def implementation(text):
+            time.sleep(seconds)
+            return f"slept {seconds}"
+
+        return implementation
+
+    register_tool("slow_a", sleepy(0.3))
+    register_tool("slow_b", sleepy(0.2))
+    register_tool("slow_c", sleepy(0.1))
+    calls = [
+        _tool_call("1", "slow_a"),
+        _tool_call("2", "slow_b"),
+        _tool_call("3", "slow_c"),
+    ]
+    messages = []
+
+    start = time.perf_counter()
+    final = asyncio.run(llm_service._execute_tool_calls(calls, messages))
+    elapsed = time.perf_counter() - start
+
+    assert final is None
+    assert elapsed < 0.5  # max(tool) = 0.3s, sum(tool) = 0.6s
+    assert [m["tool_call_id"] for m in messages] == ["1", "2", "3"]
+    assert all(m["role"] == "tool" for m in messages)
+
+
+def test_provide_response_short_circuits_later_tool_calls(register_tool):
+    ran = []
+    register_tool("lookup", lambda text: ran.append("lookup"))
+    register_tool("after", lambda text: ran.append("after"))
+    calls = [
+        _tool_call("1", "lookup"),
+        _tool_call(
+            "2",
+            "provide_response",
+            '{"action": "message", "message_to_patient": "How long?"}',
+        ),
+        _tool_call("3", "after"),
+    ]
+    messages = []
+
+    final = asyncio.run(llm_service._execute_tool_calls(calls, messages))
+
+    assert final == {"action": "message", "message_to_patient": "How long?"}
+    assert ran == ["lookup"]
+    assert [m["tool_call_id"] for m in messages] == ["1"]
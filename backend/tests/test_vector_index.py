@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.vector_index import (
+    INDEX_TYPES,
+    add_vectors,
+    build_index,
+    load_index,
+    remove_id_ranges,
+    save_index,
+)
+
+
+@pytest.fixture(scope="module")
+def embeddings():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(2000, 32)).astype("float32")
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_index_round_trip_keeps_search_params(
+    index_type, embeddings, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "RAG_PQ_M", 8)
+    monkeypatch.setattr(settings, "RAG_PQ_NBITS", 4)
+
+    index, params = build_index(embeddings, index_type)
+    index_path = tmp_path / "test.index"
+    params_path = tmp_path / "test.json"
+
+    save_index(index, params, index_path, params_path)
+    loaded, loaded_params = load_index(index_path, params_path)
+
+    assert loaded.ntotal == len(embeddings)
+    assert loaded_params == params
+
+    _, expected = index.search(embeddings[:5], 3)
+    _, found = loaded.search(embeddings[:5], 3)
+    np.testing.assert_array_equal(found, expected)
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "ivf_pq"])
+def test_ivf_indexes_reconstruct_by_sparse_id(
+    index_type, embeddings, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "RAG_PQ_M", 8)
+    monkeypatch.setattr(settings, "RAG_PQ_NBITS", 4)
+    ids = np.arange(1000) * 1000 + 7  # passage ids are topic * 1000 + n
+
+    index, params = build_index(embeddings[:1000], index_type, ids=ids)
+    save_index(index, params, tmp_path / "test.index", tmp_path / "test.json")
+    index, _ = load_index(tmp_path / "test.index", tmp_path / "test.json")
+
+    add_vectors(index, embeddings[1000:1001], np.array([5_000_000]))
+    removed = remove_id_ranges(index, [(0, 1000), (2000, 4000)])
+
+    assert removed == 3
+    assert index.ntotal == 998
+    assert index.reconstruct(5_000_000).shape == (32,)
+    expected = embeddings[4] / np.linalg.norm(embeddings[4])
+    assert float(index.reconstruct(4007) @ expected) > 0.8
+    with pytest.raises(RuntimeError):
+        index.reconstruct(7)
+
+
+def test_unknown_index_type_is_rejected(embeddings):
+    with pytest.raises(ValueError):
+        build_index(embeddings, "annoy")
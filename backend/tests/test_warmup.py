@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.core.config import settings
+from app.services import context_packer, rag_service, warmup
+from app.services.doc_store import write_doc_store
+from app.services.vector_index import build_index, save_index
+from app.utils import guardrails
+
+DOCS = [
+    {"original_id": 1, "title": "Headache", "text": "headache pain head"},
+    {"original_id": 2, "title": "Fever", "text": "fever temperature chills"},
+]
+
+
+@pytest.fixture
+def cold_start(knowledge_base, fake_model, monkeypatch):
+    import transformers
+
+    def offline(name, *args, **kwargs):
+        raise OSError(f"{name} is not cached and the hub is unreachable")
+
+    monkeypatch.setattr(transformers.AutoTokenizer, "from_pretrained", offline)
+    monkeypatch.setattr(context_packer, "_tokenizers", {})
+    monkeypatch.setattr(rag_service, "_rag_instance", None)
+    monkeypatch.setattr(guardrails, "_jailbreak_bank", None)
+    monkeypatch.setattr(warmup, "readiness", warmup.Readiness())
+    monkeypatch.setattr(main, "readiness", warmup.readiness)
+    return fake_model
+
+
+def _write_knowledge_base(model):
+    ids = [doc["original_id"] for doc in DOCS]
+    embeddings = model.encode([doc["text"] for doc in DOCS])
+    index, params = build_index(embeddings, "flat", ids=ids)
+    save_index(index, params, settings.RAG_INDEX_PATH, settings.RAG_INDEX_PARAMS_PATH)
+    write_doc_store(
+        DOCS,
+        ids,
+        settings.RAG_DOCSTORE_PATH,
+        settings.RAG_DOCSTORE_OFFSETS_PATH,
+        settings.RAG_DOCSTORE_IDS_PATH,
+    )
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_preload_warms_every_component(cold_start, parallel):
+    _write_knowledge_base(cold_start)
+
+    report = warmup.preload_components(parallel=parallel)
+
+    assert report["ready"] is True
+    assert set(report["components"]) == {
+        "embedding_model",
+        "context_tokenizer",
+        "rag_index",
+        "jailbreak_index",
+    }
+    for component in report["components"].values():
+        assert component["status"] == "ready"
+        assert component["load_seconds"] >= 0
+    assert rag_service._rag_instance.index.ntotal == 2
+    assert guardrails._jailbreak_bank.index.ntotal == len(guardrails.KNOWN_JAILBREAKS)
+    # The offline tokenizer was settled once at startup: counts use chars / 4.
+    assert context_packer._tokenizers == {settings.MODEL_NAME: None}
+
+    response = TestClient(main.app).get("/ready")
+    assert response.status_code == 200
+
+
+def test_ready_reports_failed_and_pending_components(cold_start):
+    warmup.readiness.reset(warmup.preload_component_names())
+    response = TestClient(main.app).get("/ready")
+    assert response.status_code == 503
+    assert response.json()["components"]["rag_index"]["status"] == "pending"
+
+    warmup.preload_components()  # no index was built
+
+    response = TestClient(main.app).get("/ready")
+    body = response.json()
+    assert response.status_code == 503
+    assert body["components"]["rag_index"]["status"] == "failed"
+    assert "ETL" in body["components"]["rag_index"]["error"]
+    assert body["components"]["embedding_model"]["status"] == "ready"
@@ -28,6 +28,7 @@ export function useChatLogic() {
   const [isInterviewComplete, setIsInterviewComplete] = useState(false);
   const [selectedFiles, setSelectedFiles] = useState<File[]>([]);
   const [aiReport, setAiReport] = useState<AiReportData | null>(null);
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
 
   const loadSession = useCallback(() => {
@@ -38,6 +39,7 @@ export function useChatLogic() {
       setChatMessages(parsed.messages || []);
       setAiReport(parsed.report || null);
       setIsInterviewComplete(parsed.isComplete || false);
+      setSessionId(parsed.sessionId || null);
     } catch (error) {
       logError("Error parsing chat session history", error, "useChatLogic::loadSession");
     }
@@ -48,10 +50,11 @@ export function useChatLogic() {
     const sessionData = {
       messages: chatMessages,
       report: aiReport,
-      isComplete: isInterviewComplete
+      isComplete: isInterviewComplete,
+      sessionId: sessionId
     };
     sessionStorage.setItem("chatSession", JSON.stringify(sessionData));
-  }, [chatMessages, aiReport, isInterviewComplete]);
+  }, [chatMessages, aiReport, isInterviewComplete, sessionId]);
 
   useEffect(() => { loadSession(); }, [loadSession]);
   useEffect(() => { saveSession(); }, [saveSession]);
@@ -73,6 +76,7 @@ export function useChatLogic() {
     setChatMessages([]);
     setAiReport(null);
     setIsInterviewComplete(false);
+    setSessionId(null);
   };
 
 
@@ -91,8 +95,20 @@ export function useChatLogic() {
     return payloadToSend;
   };
 
-  const handleAiSuccess = (data: ApiResponse) => {
+  const handleAiToken = (placeholder: ChatMessage, token: string) => {
+    setChatMessages((prev) => {
+      if (!prev.some((msg) => msg.id === placeholder.id)) {
+        return [...prev, { ...placeholder, text: token }];
+      }
+      return prev.map((msg) =>
+        msg.id === placeholder.id ? { ...msg, text: msg.text + token } : msg
+      );
+    });
+  };
+
+  const handleAiSuccess = (data: ApiResponse, placeholderId: string) => {
     const aiText = data.message || "No response";
+    setSessionId(data.session_id || null);
 
     if (data.status === "complete" && data.report) {
       setAiReport(data.report);
@@ -102,13 +118,13 @@ export function useChatLogic() {
     const aiMessage = createMessage("assistant", aiText);
     if (data.report) aiMessage.reportData = data.report;
 
-    setChatMessages((prev) => [...prev, aiMessage]);
+    setChatMessages((prev) => [...prev.filter((msg) => msg.id !== placeholderId), aiMessage]);
   };
 
-  const handleAiError = (error: unknown) => {
+  const handleAiError = (error: unknown, placeholderId: string) => {
     logError("Chat interaction interrupted", error, "useChatLogic::sendMessage");
     const errorMsg = createMessage("assistant", "I apologize, but the message failed to send. Please try again.");
-    setChatMessages((prev) => [...prev, errorMsg]);
+    setChatMessages((prev) => [...prev.filter((msg) => msg.id !== placeholderId), errorMsg]);
   };
 
 
@@ -120,11 +136,16 @@ export function useChatLogic() {
     const { text, files } = handleUserMessage();
     setIsResponding(true);
 
+    const placeholder = createMessage("assistant", "");
+    placeholder.id = `${placeholder.id}-stream`;
+
     try {
-      const data = await fetchChatResponse(text, chatMessages, files);
-      handleAiSuccess(data);
+      const data = await fetchChatStream(text, chatMessages, sessionId, files, (token) =>
+        handleAiToken(placeholder, token)
+      );
+      handleAiSuccess(data, placeholder.id);
     } catch (error) {
-      handleAiError(error)
+      handleAiError(error, placeholder.id)
     } finally {
       setIsResponding(false);
     }
@@ -147,7 +168,12 @@ export function useChatLogic() {
   };
 }
 
-async function fetchChatResponse(message: string, history: ChatMessage[], files: File[]): Promise<ApiResponse> {
+function buildChatFormData(
+  message: string,
+  history: ChatMessage[],
+  sessionId: string | null,
+  files: File[]
+): FormData {
   let messageToSend = message;
 
   if (!message.trim() && files.length > 0)
@@ -155,23 +181,84 @@ async function fetchChatResponse(message: string, history: ChatMessage[], files:
 
   const formData = new FormData();
   formData.append("message", messageToSend);
-  formData.append("history", JSON.stringify(
-    history.map((msg) => ({
-      role: msg.author === "user" ? "user" : "assistant",
-      content: msg.text,
-    }))
-  ));
+  // The server keeps the history of a live session; only send it without one,
+  // and ask for a session to be started from it.
+  if (sessionId) {
+    formData.append("session_id", sessionId);
+  } else {
+    formData.append("history", JSON.stringify(
+      history.map((msg) => ({
+        role: msg.author === "user" ? "user" : "assistant",
+        content: msg.text,
+      }))
+    ));
+    formData.append("new_session", "true");
+  }
   formData.append("k", "5");
   formData.append("mode", "api");
   formData.append("use_functions", "true");
   files.forEach((file) => formData.append("images", file));
 
-  const response = await fetch(API_URL, { method: "POST", body: formData });
+  return formData;
+}
+
+type StreamEvent = { name: string; data: Record<string, unknown> };
+
+function parseStreamEvent(block: string): StreamEvent | null {
+  let name = "message";
+  let data = "";
+
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event: ")) name = line.slice(7);
+    else if (line.startsWith("data: ")) data += line.slice(6);
+  }
+
+  if (!data) return null;
+  return { name, data: JSON.parse(data) };
+}
 
-  if (!response.ok) {
-    logError(`API Error: ${response.statusText}`, undefined, "useChetLogic::fetchChatResponse");
+async function fetchChatStream(
+  message: string,
+  history: ChatMessage[],
+  sessionId: string | null,
+  files: File[],
+  onToken: (token: string) => void
+): Promise<ApiResponse> {
+  const formData = buildChatFormData(message, history, sessionId, files);
+
+  const response = await fetch(`${API_URL}/stream`, { method: "POST", body: formData });
+
+  // Expired or unknown session (e.g. after a server restart): resend the full history.
+  if (response.status === 404 && sessionId)
+    return fetchChatStream(message, history, null, files, onToken);
+
+  if (!response.ok || !response.body) {
+    logError(`API Error: ${response.statusText}`, undefined, "useChatLogic::fetchChatStream");
     throw new Error(`API Error: ${response.statusText}`);
   }
 
-  return await response.json();
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const event = parseStreamEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      if (!event) continue;
+      if (event.name === "token") onToken(String(event.data.text ?? ""));
+      if (event.name === "result") return event.data as ApiResponse;
+      if (event.name === "error") throw new Error(`API Error: ${event.data.detail}`);
+    }
+  }
+
+  throw new Error("API Error: stream ended without a result");
 }
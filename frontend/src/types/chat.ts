@@ -13,4 +13,5 @@ export type ApiResponse = {
   status: "chat" | "complete";
   message?: string;
   report?: AiReportData;
+  session_id?: string | null;
 };
\ No newline at end of file